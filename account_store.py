@@ -0,0 +1,122 @@
+import glob
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Версия схемы базы (PRAGMA user_version): с 1 старые JSON-файлы уже перенесены
+JSON_IMPORTED_VERSION = 1
+
+
+class AccountStore:
+    """Хранилище аккаунтов в SQLite с индексом логинов в памяти"""
+
+    def __init__(self, accounts_path: str, db_name: str = 'accounts.db'):
+        self.accounts_path = accounts_path
+        os.makedirs(accounts_path, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(os.path.join(accounts_path, db_name), check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS accounts (username TEXT PRIMARY KEY, password TEXT NOT NULL)'
+        )
+        # Старые файлы читаются только при первом запуске на новой базе
+        if self._connection.execute('PRAGMA user_version').fetchone()[0] < JSON_IMPORTED_VERSION:
+            self._import_json_accounts()
+
+        # Весь индекс логин -> хеш пароля держим в памяти, проверки не трогают диск
+        self._passwords: Dict[str, str] = dict(
+            self._connection.execute('SELECT username, password FROM accounts')
+        )
+        logger.info(f"Загружено аккаунтов: {len(self._passwords)}")
+
+    def _import_json_accounts(self):
+        """Переносит аккаунты из старых файлов Accounts/<username>.json"""
+        rows = []
+        for user_file_path in glob.glob(os.path.join(self.accounts_path, '*.json')):
+            try:
+                with open(user_file_path, 'r', encoding='utf-8') as file:
+                    user_data = json.load(file)
+                rows.append((user_data['username'], user_data['password']))
+            except Exception as e:
+                logger.error(f"Ошибка при загрузке пользователя из {user_file_path}: {e}")
+
+        with self._connection:
+            self._connection.executemany('INSERT OR IGNORE INTO accounts VALUES (?, ?)', rows)
+            self._connection.execute(f'PRAGMA user_version = {JSON_IMPORTED_VERSION}')
+
+    def add(self, username: str, encrypted_password: str) -> bool:
+        """Добавляет пользователя, возвращает False, если логин занят"""
+        with self._lock:
+            if username in self._passwords:
+                return False
+
+            with self._connection:
+                self._connection.execute('INSERT INTO accounts VALUES (?, ?)', (username, encrypted_password))
+            self._passwords[username] = encrypted_password
+            return True
+
+    def check(self, username: str, encrypted_password: str) -> bool:
+        """Проверяет пару логин/хеш пароля"""
+        # Данные приходят со страницы: не строка - просто неверный пароль, а не исключение
+        if not isinstance(username, str) or not isinstance(encrypted_password, str):
+            return False
+        stored = self._passwords.get(username)
+        return stored is not None and secrets.compare_digest(stored.encode('utf-8'),
+                                                             encrypted_password.encode('utf-8'))
+
+
+class SessionCache:
+    """Серверные сессии в памяти с истечением по времени"""
+
+    def __init__(self, ttl: float = 12 * 60 * 60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # token -> (username, время истечения); порядок совпадает с порядком истечения
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def _evict_expired(self, now: float):
+        """Удаляет истёкшие сессии с начала очереди"""
+        while self._sessions:
+            token, (_, expires_at) = next(iter(self._sessions.items()))
+            if expires_at > now:
+                break
+            del self._sessions[token]
+
+    def create(self, username: str) -> str:
+        """Создаёт сессию и возвращает её токен"""
+        token = secrets.token_urlsafe(32)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            self._sessions[token] = (username, now + self.ttl)
+        return token
+
+    def get_user(self, token: Optional[str]) -> Optional[str]:
+        """Возвращает логин владельца сессии и продлевает её"""
+        if not token:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            session = self._sessions.get(token)
+            if session is None:
+                return None
+
+            username = session[0]
+            self._sessions[token] = (username, now + self.ttl)
+            self._sessions.move_to_end(token)
+            return username
+
+    def remove(self, token: Optional[str]):
+        """Завершает сессию"""
+        with self._lock:
+            self._sessions.pop(token, None)
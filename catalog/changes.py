@@ -0,0 +1,175 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHANGES_FILE = 'changes.db'
+INSERT, UPDATE, DELETE = 'insert', 'update', 'delete'
+# Поля, изменения которых записываются отдельно: старое и новое значение
+DIFF_FIELDS = ('price', 'date')
+# Сколько последних поколений хранится в журнале полностью; более старые записи сжимаются
+HISTORY_GENERATIONS = 20
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    generation TEXT NOT NULL,
+    key TEXT NOT NULL,
+    op TEXT NOT NULL,
+    diff TEXT,
+    event TEXT,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS changes_key ON changes (key, seq);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+'''
+
+# Изменение события: операция, ключ '<source>/<папка события>', разница полей, событие после изменения
+Change = Tuple[str, str, Optional[Dict], Optional[Dict]]
+
+
+def field_diff(old: Dict, new: Dict, fields: Tuple[str, ...] = DIFF_FIELDS) -> Dict[str, Dict]:
+    """Изменившиеся поля из fields: имя -> {'old': ..., 'new': ...}"""
+    return {field: {'old': old.get(field), 'new': new.get(field)}
+            for field in fields if old.get(field) != new.get(field)}
+
+
+def _read_event(generation_dir: str, key: str) -> Optional[Dict]:
+    """event_details.json события поколения по ключу манифеста"""
+    try:
+        with open(os.path.join(generation_dir, key, 'event_details.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def generation_changes(old_dir: Optional[str], new_dir: str, diff: Dict[str, List[str]]) -> List[Change]:
+    """Изменения событий между поколениями по разнице их манифестов"""
+    changes: List[Change] = []
+    for key in diff['added']:
+        changes.append((INSERT, key, None, _read_event(new_dir, key)))
+    for key in diff['changed']:
+        old = _read_event(old_dir, key) if old_dir else None
+        new = _read_event(new_dir, key)
+        changes.append((UPDATE, key, field_diff(old or {}, new or {}), new))
+    for key in diff['removed']:
+        changes.append((DELETE, key, None, None))
+    return changes
+
+
+class ChangeFeed:
+    """Журнал изменений каталога: записи с номерами по порядку, клиент забирает всё после своего номера"""
+
+    def __init__(self, root: str):
+        self.path = os.path.join(root, CHANGES_FILE)
+        os.makedirs(root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(SCHEMA)
+
+    def _meta(self, name: str) -> int:
+        row = self._connection.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else 0
+
+    def last_seq(self) -> int:
+        """Номер последней записи (0 - журнал пуст)"""
+        with self._lock:
+            row = self._connection.execute('SELECT MAX(seq) FROM changes').fetchone()
+            # После сжатия последней записи может не остаться, но номера не переиспользуются
+            return max(row[0] or 0, self._meta('floor'))
+
+    def append(self, generation: str, changes: List[Change]) -> int:
+        """Дописывает изменения поколения одной транзакцией и возвращает номер последней записи"""
+        now = time.time()
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                self._connection.executemany(
+                    'INSERT INTO changes (generation, key, op, diff, event, recorded_at) VALUES (?, ?, ?, ?, ?, ?)',
+                    [(generation, key, op,
+                      json.dumps(diff, ensure_ascii=False) if diff else None,
+                      json.dumps(event, ensure_ascii=False) if event is not None else None,
+                      now) for op, key, diff, event in changes]
+                )
+                self._connection.execute('COMMIT')
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+        return self.last_seq()
+
+    def since(self, seq: int = 0, limit: Optional[int] = None) -> Dict:
+        """Изменения после номера seq; reset=True - часть истории сжата, клиенту нужно перечитать каталог"""
+        with self._lock:
+            floor = self._meta('floor')
+            rows = self._connection.execute(
+                'SELECT seq, generation, key, op, diff, event FROM changes WHERE seq > ? ORDER BY seq LIMIT ?',
+                (seq, -1 if limit is None else limit)
+            ).fetchall()
+        changes = [{
+            'seq': row[0],
+            'generation': row[1],
+            'key': row[2],
+            'op': row[3],
+            'diff': json.loads(row[4]) if row[4] else {},
+            'event': json.loads(row[5]) if row[5] else None,
+        } for row in rows]
+        return {
+            'changes': changes,
+            'last_seq': changes[-1]['seq'] if changes else max(seq, self.last_seq()),
+            # Удаления до floor выброшены при сжатии: клиент, отставший сильнее, их не увидит
+            'reset': seq < floor,
+        }
+
+    def compact(self, keep_generations: int = HISTORY_GENERATIONS) -> int:
+        """Сжимает записи старше keep_generations поколений: по событию остаётся только последняя запись"""
+        with self._lock:
+            generations = self._connection.execute(
+                'SELECT generation, MIN(seq) FROM changes GROUP BY generation ORDER BY MIN(seq) DESC LIMIT ?',
+                (keep_generations,)
+            ).fetchall()
+            if len(generations) < keep_generations:
+                return 0
+            boundary = generations[-1][1]
+
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                # Перекрытые более поздними записи того же события не нужны для восстановления каталога;
+                # изменение, оставшееся последним, содержит событие целиком и применяется как вставка
+                superseded = self._connection.execute(
+                    'DELETE FROM changes WHERE seq < ? AND EXISTS '
+                    '(SELECT 1 FROM changes AS later WHERE later.key = changes.key AND later.seq > changes.seq)',
+                    (boundary,)
+                ).rowcount
+                # Старые удаления больше не нужны тем, кто идёт вровень; отставшие получат reset
+                row = self._connection.execute(
+                    'SELECT MAX(seq) FROM changes WHERE seq < ? AND op = ?', (boundary, DELETE)
+                ).fetchone()
+                deletes = 0
+                if row[0] is not None:
+                    deletes = self._connection.execute(
+                        'DELETE FROM changes WHERE seq < ? AND op = ?', (boundary, DELETE)
+                    ).rowcount
+                    self._connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                                             ('floor', max(row[0], self._meta('floor'))))
+                self._connection.execute('COMMIT')
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+
+        removed = superseded + deletes
+        if removed:
+            logger.info(f"Журнал изменений сжат: удалено записей {removed}")
+        return removed
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,248 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+from typing import Dict, List, Optional, Tuple
+import logging
+from catalog.fields import SOURCE_NAMES, parse_age, parse_date_range, parse_price
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = 'snapshot.bin'
+# Полные данные событий (JSON по строке на событие), читаются только по запросу страницы события
+DETAILS_FILE = 'details.jsonl'
+MAGIC = b'VKRCAT01'
+# Магия, длина JSON-заголовка
+PREAMBLE = struct.Struct('<8sI')
+ALIGNMENT = 8
+UNKNOWN = -1
+
+# Колонки фиксированной ширины: имя -> код типа array
+NUMERIC_COLUMNS = {
+    'start_ts': 'q',
+    'end_ts': 'q',
+    'price_min': 'q',
+    'price_max': 'q',
+    'age': 'b',
+    'source_id': 'B',
+    'venue_id': 'I',
+}
+# Строковые колонки: по строке на событие
+STRING_COLUMNS = ['title', 'folder', 'date', 'price', 'age_limit', 'tags']
+TAGS_SEPARATOR = '\x1f'
+
+
+def _read_generation_events(generation_dir: str) -> List[Tuple[str, str, Dict]]:
+    """Читает event_details.json всех событий поколения"""
+    events = []
+    for source in sorted(os.listdir(generation_dir)):
+        source_dir = os.path.join(generation_dir, source)
+        if source not in SOURCE_NAMES or not os.path.isdir(source_dir):
+            continue
+        for folder in sorted(os.listdir(source_dir)):
+            json_path = os.path.join(source_dir, folder, 'event_details.json')
+            if not os.path.isfile(json_path):
+                continue
+            with open(json_path, 'r', encoding='utf-8') as f:
+                event = json.load(f)
+            events.append((source, folder, event))
+    return events
+
+
+def _string_table(values: List[str]) -> Tuple[array, bytes]:
+    """Собирает таблицу строк: смещения (n + 1) и общий UTF-8 буфер"""
+    offsets = array('I', [0])
+    data = bytearray()
+    for value in values:
+        data += (value or '').encode('utf-8')
+        offsets.append(len(data))
+    return offsets, bytes(data)
+
+
+def _append(column: array, value: Optional[int]):
+    """Дописывает значение в колонку; неизвестное или не помещающееся в её тип - UNKNOWN"""
+    try:
+        column.append(UNKNOWN if value is None else value)
+    except OverflowError:
+        column.append(UNKNOWN)
+
+
+def write_snapshot(generation_dir: str) -> str:
+    """Строит колоночный снимок поколения и атомарно записывает его рядом с событиями"""
+    events = _read_generation_events(generation_dir)
+    sources = sorted(SOURCE_NAMES)
+    venues: Dict[str, int] = {}
+
+    numeric = {name: array(typecode) for name, typecode in NUMERIC_COLUMNS.items()}
+    strings: Dict[str, List[str]] = {name: [] for name in STRING_COLUMNS}
+    details_offsets = array('q', [0])
+    details = bytearray()
+
+    for source, folder, event in events:
+        start, end = parse_date_range(event.get('date'))
+        price_min, price_max = parse_price(event.get('price'))
+        age = parse_age(event.get('age_limit'))
+        venue = event.get('place_name') or ''
+
+        _append(numeric['start_ts'], int(start.timestamp()) if start else None)
+        _append(numeric['end_ts'], int(end.timestamp()) if end else None)
+        _append(numeric['price_min'], price_min)
+        _append(numeric['price_max'], price_max)
+        _append(numeric['age'], age)
+        numeric['source_id'].append(sources.index(source))
+        numeric['venue_id'].append(venues.setdefault(venue, len(venues)))
+
+        for name in STRING_COLUMNS:
+            value = folder if name == 'folder' else event.get(name)
+            strings[name].append(TAGS_SEPARATOR.join(value) if name == 'tags' and value else value)
+
+        details += json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n'
+        details_offsets.append(len(details))
+
+    details_path = os.path.join(generation_dir, DETAILS_FILE)
+    with open(f"{details_path}.tmp", 'wb') as f:
+        f.write(details)
+    os.replace(f"{details_path}.tmp", details_path)
+
+    sections = {name: column for name, column in numeric.items()}
+    sections['details.offsets'] = details_offsets
+    for name, values in list(strings.items()) + [('venues', list(venues))]:
+        offsets, data = _string_table(values)
+        sections[f'{name}.offsets'] = offsets
+        sections[f'{name}.data'] = array('B', data)
+
+    # Заголовок хранит смещения секций; данные выровнены, чтобы их можно было читать прямо из mmap
+    layout = {}
+    position = 0
+    for name, column in sections.items():
+        layout[name] = [column.typecode, position, len(column)]
+        position += -(-len(column) * column.itemsize // ALIGNMENT) * ALIGNMENT
+
+    header = json.dumps({
+        'count': len(events),
+        'byteorder': sys.byteorder,
+        'sources': sources,
+        'sections': layout,
+    }, ensure_ascii=False).encode('utf-8')
+    header += b' ' * (-(PREAMBLE.size + len(header)) % ALIGNMENT)
+
+    snapshot_path = os.path.join(generation_dir, SNAPSHOT_FILE)
+    tmp_path = f"{snapshot_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(PREAMBLE.pack(MAGIC, len(header)))
+        f.write(header)
+        for column in sections.values():
+            data = column.tobytes()
+            f.write(data)
+            f.write(b'\0' * (-len(data) % ALIGNMENT))
+    os.replace(tmp_path, snapshot_path)
+
+    logger.info(f"Колоночный снимок записан: {snapshot_path}, событий {len(events)}")
+    return snapshot_path
+
+
+class ColumnarSnapshot(Sequence):
+    """Колоночный снимок каталога, отображённый в память: страницы общие для всех процессов"""
+
+    def __init__(self, path: str, path_prefix: str = ''):
+        self.path = path
+        self.path_prefix = path_prefix
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self._details: Optional[mmap.mmap] = None
+        self._path_index: Optional[Dict[str, int]] = None
+
+        magic, header_size = PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Неизвестный формат снимка: {path}")
+
+        header = json.loads(bytes(self._view[PREAMBLE.size:PREAMBLE.size + header_size]))
+        if header['byteorder'] != sys.byteorder:
+            self.close()
+            raise ValueError(f"Снимок записан с другим порядком байт: {path}")
+
+        self.count: int = header['count']
+        self.sources: List[str] = header['sources']
+        data_start = PREAMBLE.size + header_size
+
+        # Колонки - представления поверх mmap, без копирования
+        self.columns: Dict[str, memoryview] = {}
+        for name, (typecode, offset, length) in header['sections'].items():
+            start = data_start + offset
+            size = length * array(typecode).itemsize
+            self.columns[name] = self._view[start:start + size].cast(typecode)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def string(self, name: str, index: int) -> str:
+        """Строка index из таблицы name"""
+        offsets = self.columns[f'{name}.offsets']
+        return str(self.columns[f'{name}.data'][offsets[index]:offsets[index + 1]], 'utf-8')
+
+    def number(self, name: str, index: int) -> Optional[int]:
+        """Значение числовой колонки (None, если неизвестно)"""
+        value = self.columns[name][index]
+        return None if value == UNKNOWN else value
+
+    def __getitem__(self, index: int) -> Dict:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+
+        source = self.sources[self.columns['source_id'][index]]
+        path = os.path.join(self.path_prefix, source, self.string('folder', index))
+        tags = self.string('tags', index)
+        return {
+            'id': index,
+            'title': self.string('title', index),
+            'date': self.string('date', index) or None,
+            'price': self.string('price', index) or None,
+            'age_limit': self.string('age_limit', index) or None,
+            'place_name': self.string('venues', self.columns['venue_id'][index]) or None,
+            'tags': tags.split(TAGS_SEPARATOR) if tags else [],
+            'source': SOURCE_NAMES.get(source, 'Неизвестный источник'),
+            'source_slug': source,
+            'main_image': os.path.join(path, 'main_image.jpg'),
+            'path': path,
+            'start_ts': self.number('start_ts', index),
+            'end_ts': self.number('end_ts', index),
+            'price_min': self.number('price_min', index),
+            'price_max': self.number('price_max', index),
+            'age': self.number('age', index),
+        }
+
+    def index_of(self, path: str) -> Optional[int]:
+        """Номер события по его пути (индекс строится при первом обращении)"""
+        if self._path_index is None:
+            self._path_index = {
+                os.path.normpath(os.path.join(self.path_prefix, self.sources[self.columns['source_id'][index]],
+                                              self.string('folder', index))): index
+                for index in range(self.count)
+            }
+        return self._path_index.get(os.path.normpath(path))
+
+    def details(self, index: int) -> Dict:
+        """Полные данные события из файла деталей"""
+        if self._details is None:
+            with open(os.path.join(os.path.dirname(self.path), DETAILS_FILE), 'rb') as f:
+                self._details = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        offsets = self.columns['details.offsets']
+        return json.loads(self._details[offsets[index]:offsets[index + 1]])
+
+    def close(self):
+        """Освобождает отображение файла"""
+        for column in getattr(self, 'columns', {}).values():
+            column.release()
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+        if self._details is not None:
+            self._details.close()
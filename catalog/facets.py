@@ -0,0 +1,111 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence
+import logging
+from catalog.fields import parse_age, parse_price
+
+logger = logging.getLogger(__name__)
+
+FACETS = ('source', 'venue', 'tags', 'age', 'price')
+
+# Ценовые корзины: (подпись, нижняя граница включительно, верхняя граница не включительно)
+PRICE_BUCKETS = [
+    ('Бесплатно', 0, 1),
+    ('до 500 ₽', 1, 500),
+    ('500–1000 ₽', 500, 1000),
+    ('1000–2000 ₽', 1000, 2000),
+    ('от 2000 ₽', 2000, None),
+]
+
+
+def price_bucket(price_min: Optional[int]) -> Optional[str]:
+    """Ценовая корзина по минимальной цене"""
+    if price_min is None:
+        return None
+    for label, low, high in PRICE_BUCKETS:
+        if price_min >= low and (high is None or price_min < high):
+            return label
+    return None
+
+
+def facet_values(event: Dict) -> Dict[str, List[str]]:
+    """Значения всех фасетов одного события"""
+    age = event['age'] if 'age' in event else parse_age(event.get('age_limit'))
+    price_min = event['price_min'] if 'price_min' in event else parse_price(event.get('price'))[0]
+    bucket = price_bucket(price_min)
+    return {
+        'source': [event.get('source_slug')] if event.get('source_slug') else [],
+        'venue': [event.get('place_name')] if event.get('place_name') else [],
+        'tags': list(event.get('tags') or []),
+        'age': [f"{age}+"] if age is not None else [],
+        'price': [bucket] if bucket else [],
+    }
+
+
+def _bits(mask: int) -> List[int]:
+    """Номера установленных битов по возрастанию"""
+    ids = []
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+    for byte_index, byte in enumerate(data):
+        while byte:
+            low = byte & -byte
+            ids.append(byte_index * 8 + low.bit_length() - 1)
+            byte ^= low
+    return ids
+
+
+class FacetIndex:
+    """Битовые индексы фасетов: бит i значения установлен, если событие i обладает этим значением"""
+
+    def __init__(self, events: Sequence[Dict]):
+        self.count = len(events)
+        self.all = (1 << self.count) - 1
+
+        positions: Dict[str, Dict[str, List[int]]] = {facet: defaultdict(list) for facet in FACETS}
+        for index, event in enumerate(events):
+            for facet, values in facet_values(event).items():
+                for value in values:
+                    positions[facet][value].append(index)
+
+        self.bitmaps: Dict[str, Dict[str, int]] = {
+            facet: {value: self._bitmap(indexes) for value, indexes in values.items()}
+            for facet, values in positions.items()
+        }
+
+    def _bitmap(self, indexes: Iterable[int]) -> int:
+        """Собирает битовую маску через bytearray, без сложения больших чисел"""
+        data = bytearray((self.count + 7) // 8)
+        for index in indexes:
+            data[index >> 3] |= 1 << (index & 7)
+        return int.from_bytes(data, 'little')
+
+    def _facet_mask(self, facet: str, values: List[str]) -> int:
+        """Значения внутри фасета объединяются через ИЛИ"""
+        mask = 0
+        for value in values:
+            mask |= self.bitmaps[facet].get(value, 0)
+        return mask
+
+    def query(self, selection: Optional[Dict[str, List[str]]] = None) -> Dict:
+        """Возвращает номера подходящих событий и число событий для каждого значения каждого фасета"""
+        selection = {facet: values for facet, values in (selection or {}).items()
+                     if facet in self.bitmaps and values}
+        masks = {facet: self._facet_mask(facet, values) for facet, values in selection.items()}
+
+        matched = self.all
+        for mask in masks.values():
+            matched &= mask
+
+        counts = {}
+        for facet, bitmaps in self.bitmaps.items():
+            # Счётчики фасета считаются без его собственного условия, чтобы было видно альтернативы
+            base = self.all
+            for other, mask in masks.items():
+                if other != facet:
+                    base &= mask
+            counts[facet] = {value: (bitmap & base).bit_count() for value, bitmap in bitmaps.items()}
+
+        return {
+            'ids': _bits(matched),
+            'total': matched.bit_count(),
+            'counts': counts,
+        }
@@ -0,0 +1,103 @@
+import re
+from datetime import datetime
+from typing import Optional, Tuple
+
+# Человекочитаемые названия источников
+SOURCE_NAMES = {
+    'afisha': 'Афиша города',
+    'culture': 'Культура.рф',
+    'mts': 'МТС'
+}
+
+MONTHS = {
+    "января": 1, "февраля": 2, "марта": 3, "апреля": 4,
+    "мая": 5, "июня": 6, "июля": 7, "августа": 8,
+    "сентября": 9, "октября": 10, "ноября": 11, "декабря": 12
+}
+
+# "11.10.2025 00:00" - формат, в который приводит даты парсер Афиши города
+NUMERIC_DATE_RE = re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{4})(?:\s+(\d{1,2}):(\d{2}))?')
+# "7 апреля 2025", "12 апреля, 19:00", "20 января"
+TEXT_DATE_RE = re.compile(r'(\d{1,2})\s+([а-яё]+)(?:\s+(\d{4}))?(?:,?\s+(\d{1,2}):(\d{2}))?')
+# Число цены: "1 500" - одно число с разделителем тысяч, "500 1000 2000" - три разных цены
+PRICE_NUMBER_RE = re.compile(r'\d{1,3}(?:[ \xa0\u202f]\d{3})+(?!\d)|\d+')
+AGE_RE = re.compile(r'(\d{1,2})\s*\+')
+
+
+def _parse_single_date(text: str, default_year: Optional[int] = None) -> Optional[datetime]:
+    """Разбирает одну дату в числовом или текстовом формате"""
+    match = NUMERIC_DATE_RE.search(text)
+    if match:
+        day, month, year, hours, minutes = match.groups()
+        try:
+            return datetime(int(year), int(month), int(day), int(hours or 0), int(minutes or 0))
+        except ValueError:
+            return None
+
+    match = TEXT_DATE_RE.search(text.lower())
+    if not match:
+        return None
+
+    day, month_name, year, hours, minutes = match.groups()
+    month = MONTHS.get(month_name)
+    if not month:
+        return None
+
+    try:
+        if year or default_year:
+            return datetime(int(year or default_year), month, int(day), int(hours or 0), int(minutes or 0))
+
+        # Год не указан (карточки МТС) - берём ближайшую будущую дату, как парсер Афиши
+        now = datetime.now()
+        date = datetime(now.year, month, int(day), int(hours or 0), int(minutes or 0))
+        if date < now.replace(hour=0, minute=0, second=0, microsecond=0):
+            date = date.replace(year=now.year + 1)
+        return date
+    except ValueError:
+        return None
+
+
+def parse_date_range(date_text: Optional[str]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Возвращает начало и конец события; для разового события они совпадают"""
+    if not date_text:
+        return None, None
+
+    text = ' '.join(date_text.replace('\xa0', ' ').split())
+    lowered = text.lower()
+
+    # "С 20 января по 3 апреля 2025" или "20 января - 3 апреля 2025"
+    if lowered.startswith('с ') and ' по ' in lowered:
+        start_text, end_text = text[2:].split(' по ', 1)
+    elif ' - ' in text:
+        start_text, end_text = text.split(' - ', 1)
+    else:
+        start = _parse_single_date(text)
+        return start, start
+
+    end = _parse_single_date(end_text)
+    start = _parse_single_date(start_text, default_year=end.year if end else None)
+    if start and end and start > end:
+        # "С 15 декабря по 4 апреля 2025" - начало в предыдущем году
+        start = start.replace(year=start.year - 1)
+    return start or end, end or start
+
+
+def parse_price(price: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """Возвращает минимальную и максимальную цену в рублях"""
+    if not price:
+        return None, None
+    if 'бесплатно' in price.lower():
+        return 0, 0
+
+    numbers = [int(re.sub(r'\D', '', number)) for number in PRICE_NUMBER_RE.findall(price)]
+    if not numbers:
+        return None, None
+    return min(numbers), max(numbers)
+
+
+def parse_age(age_limit: Optional[str]) -> Optional[int]:
+    """Возвращает возрастное ограничение числом: '16+' -> 16"""
+    if not age_limit:
+        return None
+    match = AGE_RE.search(age_limit)
+    return int(match.group(1)) if match else None
@@ -0,0 +1,272 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+import logging
+from catalog.changes import ChangeFeed, generation_changes
+from catalog.columnar import write_snapshot
+from catalog.similar import write_similar
+
+logger = logging.getLogger(__name__)
+
+GENERATIONS_DIR = 'generations'
+STAGING_DIR = 'staging'
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+# Поколения, открытые читателями: файл на читателя со списком поколений, их нельзя удалять
+HOLDS_DIR = 'holds'
+# Права и код состояния для проверки процесса читателя на Windows
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+STILL_ACTIVE = 259
+
+
+def link_or_copy(src: str, dst: str):
+    """Создаёт жёсткую ссылку на файл, а если ФС не умеет - копирует его"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def write_atomic(path: str, data: str):
+    """Записывает файл через временный файл и os.replace"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _process_alive(pid: int) -> bool:
+    """Проверяет, работает ли процесс с данным pid"""
+    if os.name == 'nt':
+        # os.kill на Windows завершает процесс, поэтому состояние читается через WinAPI
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        try:
+            exit_code = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))) and \
+                exit_code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Процесс есть, но принадлежит другому пользователю
+        return True
+    return True
+
+
+class CatalogGenerations:
+    """Поколения каталога: обход собирает новое поколение в staging и публикует его подменой указателя"""
+
+    def __init__(self, root: str, keep: int = 5):
+        self.root = root
+        self.keep = keep
+        self.generations_path = os.path.join(root, GENERATIONS_DIR)
+        self.staging_path = os.path.join(root, STAGING_DIR)
+        self.current_path = os.path.join(root, CURRENT_FILE)
+        self.holds_path = os.path.join(root, HOLDS_DIR)
+
+    def current(self) -> Optional[str]:
+        """Идентификатор опубликованного поколения"""
+        try:
+            with open(self.current_path, 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def generation_dir(self, generation: str) -> str:
+        """Папка опубликованного поколения"""
+        return os.path.join(self.generations_path, generation)
+
+    def current_dir(self) -> str:
+        """Папка текущего поколения (до первой публикации - старая раскладка spectacles/<source>)"""
+        generation = self.current()
+        return self.generation_dir(generation) if generation else self.root
+
+    def list_generations(self) -> List[str]:
+        """Опубликованные поколения от старых к новым"""
+        if not os.path.isdir(self.generations_path):
+            return []
+        return sorted(name for name in os.listdir(self.generations_path)
+                      if os.path.isdir(os.path.join(self.generations_path, name)))
+
+    def begin(self) -> str:
+        """Создаёт пустую папку для нового поколения и возвращает путь к ней"""
+        generation = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        staging_dir = os.path.join(self.staging_path, generation)
+        os.makedirs(staging_dir)
+        return staging_dir
+
+    def discard(self, staging_dir: str):
+        """Удаляет незавершённое поколение"""
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def publish(self, staging_dir: str, carry_over: List[str] = ()) -> str:
+        """Публикует поколение; источники из carry_over берутся из текущего поколения без изменений"""
+        previous = self.current()
+        previous_dir = self.current_dir()
+        for source in carry_over:
+            source_dir = os.path.join(staging_dir, source)
+            # Недообойдённый источник целиком заменяется прошлой версией
+            shutil.rmtree(source_dir, ignore_errors=True)
+            previous_source_dir = os.path.join(previous_dir, source)
+            if os.path.isdir(previous_source_dir):
+                shutil.copytree(previous_source_dir, source_dir, copy_function=link_or_copy)
+
+        manifest = self._build_manifest(staging_dir)
+        write_atomic(os.path.join(staging_dir, MANIFEST_FILE), json.dumps(manifest, ensure_ascii=False, indent=4))
+        write_snapshot(staging_dir)
+        try:
+            write_similar(staging_dir)
+        except ImportError as e:
+            # Без NumPy/SciPy поколение публикуется без рекомендаций
+            logger.warning(f"Похожие события не посчитаны: {e}")
+
+        generation = os.path.basename(staging_dir)
+        os.makedirs(self.generations_path, exist_ok=True)
+        os.rename(staging_dir, self.generation_dir(generation))
+        self._switch(generation)
+        self._record_changes(previous, generation)
+        self._prune()
+
+        logger.info(f"Опубликовано поколение каталога {generation}, событий: {len(manifest)}")
+        return generation
+
+    def rollback(self, generation: Optional[str] = None) -> Optional[str]:
+        """Возвращает указатель на заданное (по умолчанию предыдущее) поколение"""
+        generations = self.list_generations()
+        if generation is None:
+            current = self.current()
+            older = [name for name in generations if current is None or name < current]
+            generation = older[-1] if older else None
+
+        if generation not in generations:
+            logger.error(f"Поколение для отката не найдено: {generation}")
+            return None
+
+        previous = self.current()
+        self._switch(generation)
+        self._record_changes(previous, generation)
+        logger.info(f"Каталог откачен к поколению {generation}")
+        return generation
+
+    def manifest(self, generation: str) -> Dict[str, str]:
+        """Манифест поколения: '<source>/<папка события>' -> хеш event_details.json"""
+        try:
+            with open(os.path.join(self.generation_dir(generation), MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return self._build_manifest(self.generation_dir(generation))
+
+    def diff(self, old: str, new: str) -> Dict[str, List[str]]:
+        """Сравнивает два поколения по манифестам, не читая сами события"""
+        old_manifest = self.manifest(old)
+        new_manifest = self.manifest(new)
+        return {
+            'added': sorted(new_manifest.keys() - old_manifest.keys()),
+            'removed': sorted(old_manifest.keys() - new_manifest.keys()),
+            'changed': sorted(key for key in new_manifest.keys() & old_manifest.keys()
+                              if new_manifest[key] != old_manifest[key]),
+        }
+
+    def changes_since(self, seq: int = 0, limit: Optional[int] = None) -> Dict:
+        """Изменения каталога после номера seq из журнала изменений"""
+        feed = ChangeFeed(self.root)
+        try:
+            return feed.since(seq, limit)
+        finally:
+            feed.close()
+
+    def _record_changes(self, old: Optional[str], new: str):
+        """Дописывает в журнал изменений разницу поколений; ошибка журнала не отменяет публикацию"""
+        if old == new:
+            return
+        # Первое поколение целиком состоит из вставок
+        diff = self.diff(old, new) if old else {'added': sorted(self.manifest(new)), 'removed': [], 'changed': []}
+        changes = generation_changes(self.generation_dir(old) if old else None, self.generation_dir(new), diff)
+        try:
+            feed = ChangeFeed(self.root)
+            try:
+                seq = feed.append(new, changes)
+                feed.compact()
+            finally:
+                feed.close()
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Не удалось записать изменения поколения {new} в журнал: {e}")
+            return
+        logger.info(f"Журнал изменений: записей поколения {new} {len(changes)}, последний номер {seq}")
+
+    def hold(self, owner: str, generations: Iterable[str]):
+        """Запоминает поколения, которые читатель owner держит открытыми (пустой список - отпускает все)"""
+        generations = sorted(set(generations))
+        path = os.path.join(self.holds_path, owner)
+        if not generations:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return
+        os.makedirs(self.holds_path, exist_ok=True)
+        # Процесс читателя записывается вместе с поколениями: отметки упавшего процесса снимаются
+        write_atomic(path, json.dumps({'pid': os.getpid(), 'generations': generations}))
+
+    def held(self) -> Set[str]:
+        """Поколения, открытые хотя бы одним живым читателем (в том числе в других процессах)"""
+        result = set()
+        if not os.path.isdir(self.holds_path):
+            return result
+        for owner in os.listdir(self.holds_path):
+            path = os.path.join(self.holds_path, owner)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    hold = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not _process_alive(hold['pid']):
+                logger.info(f"Снята отметка завершившегося читателя {owner}: {', '.join(hold['generations'])}")
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            result.update(hold['generations'])
+        return result
+
+    def _switch(self, generation: str):
+        """Атомарно переключает указатель CURRENT"""
+        write_atomic(self.current_path, generation)
+
+    def _prune(self):
+        """Оставляет только последние keep поколений; открытые читателями удаляются в следующий раз"""
+        # Файлы поколения, отображённого в память приложением, на Windows удалить нельзя
+        keep = {self.current()} | self.held()
+        for generation in self.list_generations()[:-self.keep]:
+            if generation not in keep:
+                shutil.rmtree(self.generation_dir(generation), ignore_errors=True)
+
+    @staticmethod
+    def _build_manifest(generation_dir: str) -> Dict[str, str]:
+        """Считает хеши event_details.json всех событий поколения"""
+        manifest = {}
+        if not os.path.isdir(generation_dir):
+            return manifest
+
+        for source in sorted(os.listdir(generation_dir)):
+            source_dir = os.path.join(generation_dir, source)
+            if not os.path.isdir(source_dir) or source in (GENERATIONS_DIR, STAGING_DIR):
+                continue
+            for event_dir in os.listdir(source_dir):
+                json_path = os.path.join(source_dir, event_dir, 'event_details.json')
+                if os.path.isfile(json_path):
+                    with open(json_path, 'rb') as f:
+                        manifest[f"{source}/{event_dir}"] = hashlib.sha1(f.read()).hexdigest()
+        return manifest
@@ -0,0 +1,95 @@
+from array import array
+from bisect import bisect_left
+from datetime import datetime, time, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+from catalog.fields import parse_date_range
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 60 * 60
+# Длинные периоды ("С 15 декабря по 4 апреля") разворачиваются по дням только в окне
+# [построение индекса - 1 день, построение индекса + MAX_EXPANDED_DAYS дней]
+MAX_EXPANDED_DAYS = 366
+
+
+def _event_bounds(event: Dict) -> Tuple[Optional[int], Optional[int]]:
+    """Начало и конец события в секундах Unix"""
+    if 'start_ts' in event:
+        return event['start_ts'], event['end_ts']
+    start, end = parse_date_range(event.get('date'))
+    return (int(start.timestamp()) if start else None,
+            int(end.timestamp()) if end else None)
+
+
+def expand_sessions(start_ts: int, end_ts: int, now: Optional[datetime] = None) -> List[int]:
+    """Разворачивает событие в показы: разовое - один показ, период - по показу на каждый календарный день"""
+    if end_ts <= start_ts:
+        return [start_ts]
+
+    today = (now or datetime.now()).date()
+    # Дни считаются по календарю, а не по длительности: показ 20:00 - 10:00 через день занимает три дня
+    first_day = max(datetime.fromtimestamp(start_ts).date() + timedelta(days=1), today - timedelta(days=1))
+    last_day = min(datetime.fromtimestamp(end_ts).date(), today + timedelta(days=MAX_EXPANDED_DAYS))
+    days = (last_day - first_day).days + 1
+    return [start_ts] + [int(datetime.combine(first_day + timedelta(days=offset), time()).timestamp())
+                         for offset in range(max(days, 0))]
+
+
+class TimeIndex:
+    """Отсортированный массив показов: запрос по интервалу - бинарный поиск и O(k) на результат"""
+
+    def __init__(self, events: Sequence[Dict], now: Optional[datetime] = None):
+        now = now or datetime.now()
+        sessions = []
+        for index, event in enumerate(events):
+            start_ts, end_ts = _event_bounds(event)
+            if start_ts is None:
+                continue
+            sessions.extend((ts, index) for ts in expand_sessions(start_ts, end_ts or start_ts, now))
+
+        sessions.sort()
+        self.timestamps = array('q', (ts for ts, _ in sessions))
+        self.event_ids = array('I', (index for _, index in sessions))
+        logger.info(f"Индекс показов построен: показов {len(sessions)}")
+
+    def sessions(self, start_ts: int, end_ts: int) -> List[Tuple[int, int]]:
+        """Показы в интервале [start_ts, end_ts): пары (время, номер события)"""
+        low = bisect_left(self.timestamps, start_ts)
+        high = bisect_left(self.timestamps, end_ts, lo=low)
+        return list(zip(self.timestamps[low:high], self.event_ids[low:high]))
+
+    def event_ids_between(self, start_ts: int, end_ts: int) -> List[int]:
+        """Номера событий, у которых есть показ в интервале, в порядке ближайшего показа"""
+        seen = set()
+        ids = []
+        for _, index in self.sessions(start_ts, end_ts):
+            if index not in seen:
+                seen.add(index)
+                ids.append(index)
+        return ids
+
+
+def period_bounds(period: str, now: Optional[datetime] = None) -> Tuple[int, int]:
+    """Границы именованного периода: 'today', 'tomorrow', 'weekend', 'week' (7 дней), 'month' (30 дней)"""
+    now = now or datetime.now()
+    # Периоды по дням начинаются с полуночи: показы длящегося события отмечены 00:00 каждого дня,
+    # и с границей now событие пропадало бы из "сегодня" и текущих выходных
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if period == 'today':
+        start, end = today, today + timedelta(days=1)
+    elif period == 'tomorrow':
+        start, end = today + timedelta(days=1), today + timedelta(days=2)
+    elif period == 'weekend':
+        # Ближайшие суббота и воскресенье (текущие, если уже выходные)
+        saturday = today + timedelta(days=5 - today.weekday())
+        start, end = saturday, saturday + timedelta(days=2)
+    elif period == 'week':
+        start, end = today, today + timedelta(days=7)
+    elif period == 'month':
+        start, end = today, today + timedelta(days=30)
+    else:
+        raise ValueError(f"Неизвестный период: {period}")
+
+    return int(start.timestamp()), int(end.timestamp())
@@ -0,0 +1,148 @@
+import json
+import mmap
+import os
+import re
+import struct
+import zlib
+from typing import Dict, List, Optional
+import logging
+from catalog.columnar import DETAILS_FILE
+
+logger = logging.getLogger(__name__)
+
+SIMILAR_FILE = 'similar.bin'
+SIMILAR_MAGIC = b'VKRSIM01'
+# Магия, число событий, число соседей на событие
+PREAMBLE = struct.Struct('<8sII')
+NO_NEIGHBOUR = -1
+
+TOP_K = 12
+# Размер хешированного словаря n-грамм: 2^18 признаков
+HASH_BITS = 18
+# Строк матрицы на один блок произведения: блок x n оценок float32 в памяти
+BLOCK_SIZE = 256
+# Соседи с меньшим косинусом не считаются похожими
+MIN_SCORE = 0.05
+# Вес n-грамм каждого поля: совпадение в названии и тегах важнее, чем в описании
+FIELD_WEIGHTS = {'title': 3.0, 'tags': 2.0, 'full_description': 1.0}
+WORD_RE = re.compile(r'\w{2,}')
+
+
+def _ngrams(text: str) -> List[str]:
+    """Слова и пары соседних слов"""
+    words = WORD_RE.findall(text.lower())
+    return words + [f'{first} {second}' for first, second in zip(words, words[1:])]
+
+
+def _event_features(event: Dict) -> Dict[int, float]:
+    """Хешированные n-граммы события с весами полей"""
+    features: Dict[int, float] = {}
+    mask = (1 << HASH_BITS) - 1
+    for field, weight in FIELD_WEIGHTS.items():
+        value = event.get(field)
+        text = ' '.join(value) if isinstance(value, list) else value
+        for gram in _ngrams(text or ''):
+            # crc32 стабилен между запусками, в отличие от встроенного hash()
+            feature = zlib.crc32(gram.encode('utf-8')) & mask
+            features[feature] = features.get(feature, 0.0) + weight
+    return features
+
+
+def _read_details(generation_dir: str) -> List[Dict]:
+    """События поколения в порядке колоночного снимка"""
+    with open(os.path.join(generation_dir, DETAILS_FILE), 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_similar(generation_dir: str, top_k: int = TOP_K) -> str:
+    """Строит TF-IDF по хешированным n-граммам и заранее считает k ближайших соседей каждого события"""
+    # NumPy и SciPy нужны только обходу, чтению рекомендаций они не нужны
+    import numpy as np
+    from scipy import sparse
+
+    events = _read_details(generation_dir)
+    count = len(events)
+    top_k = max(0, min(top_k, count - 1))
+
+    rows, columns, values = [], [], []
+    for row, event in enumerate(events):
+        for feature, weight in _event_features(event).items():
+            rows.append(row)
+            columns.append(feature)
+            values.append(weight)
+
+    matrix = sparse.csr_matrix((np.array(values, dtype=np.float32), (rows, columns)),
+                               shape=(count, 1 << HASH_BITS))
+    # Сублинейная частота и IDF со сглаживанием
+    matrix.data = np.log1p(matrix.data)
+    document_frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    idf = (np.log((1 + count) / (1 + document_frequency)) + 1).astype(np.float32)
+    matrix = matrix.multiply(idf).tocsr()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = sparse.diags((1 / norms).astype(np.float32)) @ matrix
+
+    neighbours = np.full((count, top_k), NO_NEIGHBOUR, dtype=np.int32)
+    transposed = matrix.T.tocsr()
+    for start in range(0, count if top_k else 0, BLOCK_SIZE):
+        stop = min(start + BLOCK_SIZE, count)
+        # Косинусы блока строк со всеми событиями: плотный блок BLOCK_SIZE x n
+        scores = (matrix[start:stop] @ transposed).toarray()
+        scores[np.arange(stop - start), np.arange(start, stop)] = -1
+
+        candidates = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        candidates = np.take_along_axis(candidates, order, axis=1)
+        candidate_scores = np.take_along_axis(candidate_scores, order, axis=1)
+        candidates[candidate_scores < MIN_SCORE] = NO_NEIGHBOUR
+        neighbours[start:stop] = candidates
+
+    similar_path = os.path.join(generation_dir, SIMILAR_FILE)
+    tmp_path = f"{similar_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(PREAMBLE.pack(SIMILAR_MAGIC, count, top_k))
+        f.write(neighbours.astype('<i4').tobytes())
+    os.replace(tmp_path, similar_path)
+
+    logger.info(f"Похожие события посчитаны: {similar_path}, событий {count}, соседей {top_k}")
+    return similar_path
+
+
+class SimilarIndex:
+    """Заранее посчитанные соседи, отображённые в память: выдача рекомендаций - чтение одной строки"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.count, self.top_k = PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != SIMILAR_MAGIC:
+            self._mmap.close()
+            raise ValueError(f"Неизвестный формат рекомендаций: {path}")
+        self._row = struct.Struct(f'<{self.top_k}i')
+
+    @classmethod
+    def open(cls, generation_dir: str, count: int) -> Optional['SimilarIndex']:
+        """Рекомендации поколения, если они посчитаны для того же числа событий"""
+        path = os.path.join(generation_dir, SIMILAR_FILE)
+        if not os.path.exists(path):
+            return None
+        index = cls(path)
+        if index.count != count:
+            logger.warning(f"Рекомендации не совпадают со снимком: {path}")
+            index.close()
+            return None
+        return index
+
+    def neighbours(self, index: int, limit: Optional[int] = None) -> List[int]:
+        """Номера похожих событий по убыванию сходства"""
+        if not 0 <= index < self.count:
+            return []
+        row = self._row.unpack_from(self._mmap, PREAMBLE.size + index * self._row.size)
+        return [neighbour for neighbour in row[:limit] if neighbour != NO_NEIGHBOUR]
+
+    def close(self):
+        """Освобождает отображение файла"""
+        self._mmap.close()
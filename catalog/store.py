@@ -0,0 +1,267 @@
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+from catalog.columnar import SNAPSHOT_FILE, ColumnarSnapshot
+from catalog.facets import FacetIndex
+from catalog.schedule import TimeIndex
+from catalog.similar import SimilarIndex
+from catalog.fields import SOURCE_NAMES
+from catalog.generations import CatalogGenerations
+
+logger = logging.getLogger(__name__)
+
+# Номера хранилищ каталога в процессе для имён их отметок
+_store_ids = itertools.count(1)
+# Сколько секунд прежний снимок остаётся открытым после подмены: читатели, взявшие его до подмены, успевают закончить
+SNAPSHOT_GRACE = 60.0
+
+# Поля, которые нужны спискам событий; описание и галерея загружаются отдельно через load_event
+SUMMARY_FIELDS = ('id', 'title', 'main_image', 'date', 'place_name', 'price', 'age_limit',
+                  'path', 'source', 'source_slug')
+
+
+def summarize(event: Dict) -> Dict:
+    """Краткая проекция события для списков"""
+    return {field: event.get(field) for field in SUMMARY_FIELDS}
+
+
+def read_events(base_dir: str, folders: List[str]) -> List[Dict]:
+    """Читает все event_details.json из папок источников"""
+    events = []
+
+    for folder in folders:
+        spectacle_path = os.path.join(base_dir, folder)
+
+        if not os.path.exists(spectacle_path):
+            continue
+
+        # Получаем название источника из пути
+        source = os.path.basename(folder)
+        source_name = SOURCE_NAMES.get(source, 'Неизвестный источник')
+
+        for root, dirs, files in os.walk(spectacle_path):
+            for dir_name in dirs:
+                event_path = os.path.join(root, dir_name)
+                event_details_path = os.path.join(event_path, 'event_details.json')
+
+                if os.path.exists(event_details_path):
+                    with open(event_details_path, 'r', encoding='utf-8') as file:
+                        event_data = json.load(file)
+
+                    # Добавляем информацию об источнике
+                    event_data['source'] = source_name
+                    event_data['source_slug'] = source  # сохраняем и slug для возможного использования
+
+                    event_data['main_image'] = os.path.join(folder, dir_name, 'main_image.jpg')
+
+                    gallery_images = []
+                    for file_name in os.listdir(event_path):
+                        if file_name.startswith('gallery_image') and file_name.endswith('.jpg'):
+                            gallery_images.append(os.path.join(folder, dir_name, file_name))
+
+                    event_data['gallery_images'] = gallery_images
+                    event_data['path'] = os.path.join(folder, dir_name)
+                    event_data['id'] = len(events)
+
+                    events.append(event_data)
+
+            break
+
+    return events
+
+
+class CatalogStore:
+    """Каталог событий в памяти, который целиком подменяется после каждого обхода"""
+
+    def __init__(self, base_dir: str, generations: CatalogGenerations, sources: List[str],
+                 owner: Optional[str] = None):
+        self.base_dir = os.path.abspath(base_dir)
+        # Имя читателя в отметках открытых поколений: загруженное поколение не удаляется обходом.
+        # У каждого хранилища своё имя, иначе процессы приложения перезаписывали бы отметки друг друга
+        self.owner = owner or f"catalog-store-{os.getpid()}-{next(_store_ids)}"
+        self.generations = generations
+        self.sources = sources
+        self.version = 0
+        self.generation: Optional[str] = None
+        self._events: Sequence[Dict] = ()
+        # Загрузки снимка идут по одной: первая загрузка выполняется один раз, даже если прогрев и
+        # первый запрос страницы пришли одновременно. Снимок строится вне _reload_lock
+        self._load_lock = threading.Lock()
+        # Под _reload_lock только подмена снимка и кэша индексов: eel работает на gevent без monkey-patching,
+        # и гринлет, ждущий блокировку, занятую потоком, останавливает весь интерфейс
+        self._reload_lock = threading.Lock()
+        # Индексы, построенные по текущему снимку: имя -> (версия каталога, индекс)
+        self._indexes: Dict[str, tuple] = {}
+        # Подменённые отображения в память: (когда закрыть, поколение, объект с close())
+        self._retired: List[Tuple[float, Optional[str], Any]] = []
+
+    @property
+    def events(self) -> Sequence[Dict]:
+        """Текущий снимок каталога (при первом обращении читается с диска)"""
+        return self.snapshot()[1]
+
+    def reload(self) -> int:
+        """Перечитывает каталог и атомарно подменяет снимок, возвращает новую версию"""
+        with self._load_lock:
+            return self._load()
+
+    def _load(self) -> int:
+        """Строит снимок опубликованного поколения и подменяет им текущий (вызывается под _load_lock)"""
+        # Читаем только опубликованное поколение - оно больше не меняется
+        generation = self.generations.current()
+        current_dir = self.generations.current_dir()
+        generation_dir = os.path.relpath(current_dir, self.base_dir)
+
+        snapshot_path = os.path.join(current_dir, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            # Колоночный снимок только отображается в память, события не разбираются
+            events = ColumnarSnapshot(snapshot_path, path_prefix=generation_dir)
+        else:
+            # Новый снимок собирается целиком, читатели до подмены видят старый
+            folders = [os.path.join(generation_dir, source) for source in self.sources]
+            events = tuple(read_events(self.base_dir, folders))
+
+        with self._reload_lock:
+            self._retire(self._events, self.generation)
+            similar = self._indexes.pop('similar', None)
+            if similar is not None:
+                self._retire(similar[1], self.generation)
+            self._events = events
+            self.generation = generation
+            self.version += 1
+            version = self.version
+            self._update_holds()
+
+        logger.info(f"Каталог обновлён: поколение {generation}, версия {version}, событий {len(events)}")
+        return version
+
+    def _retire(self, resource: Any, generation: Optional[str]):
+        """Закрывает отображённый в память ресурс прежнего поколения через SNAPSHOT_GRACE секунд"""
+        if not hasattr(resource, 'close'):
+            return
+        self._retired.append((time.monotonic() + SNAPSHOT_GRACE, generation, resource))
+        timer = threading.Timer(SNAPSHOT_GRACE, self.close_retired)
+        timer.daemon = True
+        timer.start()
+
+    def close_retired(self, force: bool = False) -> int:
+        """Закрывает подменённые снимки, чей срок вышел (force - все сразу); возвращает число закрытых"""
+        now = time.monotonic()
+        with self._reload_lock:
+            expired = [item for item in self._retired if force or item[0] <= now]
+            self._retired = [item for item in self._retired if item not in expired]
+            for _, generation, resource in expired:
+                try:
+                    resource.close()
+                except Exception as e:
+                    logger.warning(f"Не удалось закрыть снимок поколения {generation}: {e}")
+            if expired:
+                self._update_holds()
+        return len(expired)
+
+    def _update_holds(self):
+        """Отмечает открытые поколения (текущее и ещё не закрытые прежние), чтобы обход их не удалял"""
+        held = {generation for _, generation, _ in self._retired if generation}
+        if self.generation:
+            held.add(self.generation)
+        try:
+            self.generations.hold(self.owner, held)
+        except OSError as e:
+            logger.warning(f"Не удалось отметить открытые поколения каталога: {e}")
+
+    def snapshot(self) -> Tuple[int, Sequence[Dict]]:
+        """Версия и снимок каталога, взятые согласованно: номера событий действительны только в этой версии"""
+        if self.version == 0:
+            with self._load_lock:
+                if self.version == 0:
+                    self._load()
+        with self._reload_lock:
+            return self.version, self._events
+
+    def _versioned_index(self, name: str, builder) -> Tuple[int, Sequence[Dict], Any]:
+        """Версия, снимок и построенный по нему индекс: номера событий из индекса действительны в этом снимке"""
+        version, events = self.snapshot()
+        with self._reload_lock:
+            cached = self._indexes.get(name)
+        if cached is not None and cached[0] == version:
+            return version, events, cached[1]
+
+        # Индекс строится вне блокировки; в кэш попадает, только если каталог за это время не подменили
+        index = builder(events)
+        with self._reload_lock:
+            if version == self.version:
+                self._indexes[name] = (version, index)
+            elif index is not None:
+                self._retire(index, None)
+        return version, events, index
+
+    def _index(self, name: str, builder):
+        """Индекс текущего снимка, который строится один раз на версию каталога"""
+        return self._versioned_index(name, builder)[2]
+
+    def facets(self) -> FacetIndex:
+        """Битовые индексы фасетов текущего снимка"""
+        return self._index('facets', FacetIndex)
+
+    def query_facets(self, selection: Optional[Dict[str, List[str]]] = None) -> Dict:
+        """Результат запроса фасетов с версией каталога, к которой относятся номера событий"""
+        version, _, index = self._versioned_index('facets', FacetIndex)
+        result = index.query(selection)
+        result['version'] = version
+        return result
+
+    def time_index(self) -> TimeIndex:
+        """Отсортированный индекс показов текущего снимка"""
+        return self._index('time', TimeIndex)
+
+    def query_time_range(self, start_ts: int, end_ts: int) -> List[Dict]:
+        """Краткие проекции событий с показами в [start_ts, end_ts), по ближайшему показу"""
+        _, events, index = self._versioned_index('time', TimeIndex)
+        return [summarize(events[position]) for position in index.event_ids_between(start_ts, end_ts)]
+
+    @staticmethod
+    def _open_similar(events: Sequence[Dict]) -> Optional[SimilarIndex]:
+        """Соседи событий из поколения снимка (только для колоночного снимка)"""
+        if not isinstance(events, ColumnarSnapshot):
+            return None
+        return SimilarIndex.open(os.path.dirname(events.path), len(events))
+
+    def similar_index(self) -> Optional[SimilarIndex]:
+        """Заранее посчитанные соседи текущего поколения (только для колоночного снимка)"""
+        return self._index('similar', self._open_similar)
+
+    def similar(self, event_path: str, limit: int = 6) -> List[Dict]:
+        """Краткие проекции событий, похожих на данное"""
+        # Номера соседей действительны только в снимке, по поколению которого открыт индекс
+        _, events, index = self._versioned_index('similar', self._open_similar)
+        if index is None:
+            return []
+
+        position = events.index_of(event_path)
+        if position is None:
+            return []
+        return [summarize(events[neighbour]) for neighbour in index.neighbours(position, limit)]
+
+    def summaries(self) -> List[Dict]:
+        """Краткие проекции всех событий каталога"""
+        return [summarize(event) for event in self.events]
+
+    def details(self, event_path: str) -> Optional[Dict]:
+        """Полные данные события из хранилища деталей текущего поколения"""
+        events = self.events
+        if not isinstance(events, ColumnarSnapshot):
+            return None
+
+        index = events.index_of(event_path)
+        return events.details(index) if index is not None else None
+
+    def reload_if_published(self) -> bool:
+        """Перечитывает каталог, если с момента загрузки опубликовано другое поколение"""
+        if self.version and self.generations.current() != self.generation:
+            self.reload()
+            return True
+        return False
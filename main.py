@@ -1,74 +1,126 @@
 import eel
+import argparse
+import asyncio
 import json
+import logging
 import os
 import shutil
-
-# Инициализация Eel
-eel.init('web')
+import threading
+import time
+from contextlib import contextmanager
+from gevent import get_hub
+from account_store import AccountStore, SessionCache
+from catalog.generations import CatalogGenerations
+from catalog.schedule import period_bounds
+from catalog.store import CatalogStore, summarize
+from parsers.cities import CITIES, city_root, get_city
+
+logger = logging.getLogger(__name__)
 
 # Путь к папке с избранными
 FAVOURITES_PATH = os.path.join(os.path.dirname(__file__), 'favourites')
 
-# Создаем папку favourites, если её нет
-if not os.path.exists(FAVOURITES_PATH):
-    os.makedirs(FAVOURITES_PATH)
+# Папка каталога и источники событий внутри поколения
+SPECTACLES_PATH = os.path.join(os.path.dirname(__file__), 'spectacles')
+SPECTACLE_SOURCES = ['afisha', 'culture', 'mts']
+
+
+# Каталог событий в памяти: load_events отдаёт готовый снимок, а не читает диск
+city = get_city()
+generations = CatalogGenerations(city_root(SPECTACLES_PATH, city))
+catalog = CatalogStore(os.path.dirname(__file__), generations, SPECTACLE_SOURCES)
+
 
-# Список папок со спектаклями
-SPECTACLE_FOLDERS = [
-    'spectacles/afisha',
-    'spectacles/culture',
-    'spectacles/mts'
-]
+def select_city(slug):
+    """Переключает приложение на каталог другого города; у каждого города свои поколения и индексы"""
+    global city, generations, catalog
+    city = get_city(slug)
+    generations = CatalogGenerations(city_root(SPECTACLES_PATH, city))
+    catalog = CatalogStore(os.path.dirname(__file__), generations, SPECTACLE_SOURCES)
 
 
 @eel.expose
 def load_events():
-    events = []
-    source_names = {
-        'afisha': 'Афиша города',
-        'culture': 'Культура.рф',
-        'mts': 'МТС'
-    }
+    # Спискам нужна только краткая проекция, описание грузится через load_event
+    return catalog.summaries()
 
-    for folder in SPECTACLE_FOLDERS:
-        spectacle_path = os.path.join(os.path.dirname(__file__), folder)
 
-        if not os.path.exists(spectacle_path):
-            continue
+# Размер первой порции - примерно один экран карточек, дальше порции крупнее
+STREAM_FIRST_CHUNK = 24
+STREAM_CHUNK = 200
 
-        # Получаем название источника из пути
-        source = folder.split('/')[-1]
-        source_name = source_names.get(source, 'Неизвестный источник')
 
-        for root, dirs, files in os.walk(spectacle_path):
-            for dir_name in dirs:
-                event_path = os.path.join(root, dir_name)
-                event_details_path = os.path.join(event_path, 'event_details.json')
+def _stream_events(request_id):
+    # Версия уходит с каждой порцией: номера событий сверяются с ней в query_facets
+    version, events = catalog.snapshot()
+    chunk = []
+    chunk_size = STREAM_FIRST_CHUNK
+    for event in events:
+        chunk.append(summarize(event))
+        if len(chunk) >= chunk_size:
+            eel.receive_events_chunk(request_id, chunk, False, version)
+            chunk = []
+            chunk_size = STREAM_CHUNK
+            eel.sleep(0)  # Даём отправить порцию, не дожидаясь остальных
 
-                if os.path.exists(event_details_path):
-                    with open(event_details_path, 'r', encoding='utf-8') as file:
-                        event_data = json.load(file)
+    eel.receive_events_chunk(request_id, chunk, True, version)
 
-                    # Добавляем информацию об источнике
-                    event_data['source'] = source_name
-                    event_data['source_slug'] = source  # сохраняем и slug для возможного использования
 
-                    # Остальные поля как раньше...
-                    event_data['main_image'] = os.path.join(folder, dir_name, 'main_image.jpg')
+@eel.expose
+def stream_events(request_id):
+    # События отправляются порциями через receive_events_chunk в index.js
+    eel.spawn(_stream_events, request_id)
+    return True
 
-                    gallery_images = []
-                    for file_name in os.listdir(event_path):
-                        if file_name.startswith('gallery_image') and file_name.endswith('.jpg'):
-                            gallery_images.append(os.path.join(folder, dir_name, file_name))
 
-                    event_data['gallery_images'] = gallery_images
-                    event_data['path'] = os.path.join(folder, dir_name)
+@eel.expose
+def query_facets(selection=None):
+    # selection: {'source': [...], 'venue': [...], 'tags': [...], 'age': [...], 'price': [...]}
+    # ids - номера событий в версии каталога version; при другой версии клиент перечитывает список
+    return catalog.query_facets(selection)
 
-                    events.append(event_data)
 
-            break
+@eel.expose
+def query_time_range(start_ts, end_ts):
+    # Краткие проекции событий с показами в [start_ts, end_ts), по ближайшему показу
+    return catalog.query_time_range(start_ts, end_ts)
 
-    return events
+
+@eel.expose
+def query_whats_on(period):
+    # period: 'today', 'tomorrow', 'weekend', 'week' или 'month'
+    return query_time_range(*period_bounds(period))
+
+
+@eel.expose
+def list_generations():
+    return generations.list_generations()
+
+
+@eel.expose
+def diff_generations(old_generation, new_generation):
+    return generations.diff(old_generation, new_generation)
+
+
+@eel.expose
+def changes_since(seq=0, limit=None):
+    # Клиент хранит last_seq и забирает только новые изменения; reset - перечитать каталог целиком
+    return generations.changes_since(seq, limit)
+
+
+# Имена папок избранного в памяти, чтобы check_if_favourite не обращался к диску
+_favourite_names = None
+_favourites_lock = threading.Lock()
+
+
+def favourite_names():
+    global _favourite_names
+    with _favourites_lock:
+        if _favourite_names is None:
+            # Создаем папку favourites, если её нет
+            os.makedirs(FAVOURITES_PATH, exist_ok=True)
+            _favourite_names = {entry.name for entry in os.scandir(FAVOURITES_PATH) if entry.is_dir()}
+        return _favourite_names
 
 
 @eel.expose
@@ -126,6 +178,7 @@ def add_to_favourites(event_path):
 
     if not os.path.exists(destination_path):
         shutil.copytree(source_path, destination_path)
+        favourite_names().add(event_name)
         return True
     return False
 
@@ -134,7 +187,7 @@ def add_to_favourites(event_path):
 def check_if_favourite(event_path):
     # Берем только имя папки события (последнюю часть пути)
     event_name = os.path.basename(event_path.replace('/', os.sep).replace('\\', os.sep))
-    return os.path.exists(os.path.join(FAVOURITES_PATH, event_name))
+    return event_name in favourite_names()
 
 @eel.expose
 def remove_from_favourites(event_path):
@@ -143,6 +196,7 @@ def remove_from_favourites(event_path):
     destination_path = os.path.join(FAVOURITES_PATH, event_name)
     if os.path.exists(destination_path):
         shutil.rmtree(destination_path)
+        favourite_names().discard(event_name)
         return True
     return False
 
@@ -152,12 +206,16 @@ def load_event(event_path):
     # Полный путь к папке с событием
     event_path_full = os.path.join(os.path.dirname(__file__), event_path)
 
+    # Сначала ищем событие в хранилище деталей текущего поколения
+    event_data = catalog.details(event_path)
+
     # Проверяем, есть ли файл event_details.json
     event_details_path = os.path.join(event_path_full, 'event_details.json')
-    if os.path.exists(event_details_path):
+    if event_data is None and os.path.exists(event_details_path):
         with open(event_details_path, 'r', encoding='utf-8') as file:
             event_data = json.load(file)
 
+    if event_data is not None:
         # Удаляем поля со значением null
         event_data = {k: v for k, v in event_data.items() if v is not None}
 
@@ -166,7 +224,7 @@ def load_event(event_path):
 
         # Добавляем галерею изображений, если она есть
         gallery_images = []
-        for file_name in os.listdir(event_path_full):
+        for file_name in (os.listdir(event_path_full) if os.path.isdir(event_path_full) else []):
             if file_name.startswith('gallery_image') and file_name.endswith('.jpg'):
                 gallery_images.append(os.path.join(event_path, file_name))
 
@@ -177,39 +235,37 @@ def load_event(event_path):
     return None
 
 
+@eel.expose
+def load_similar_events(event_path, limit=6):
+    # Соседи посчитаны при публикации поколения, здесь только чтение строки
+    return catalog.similar(event_path, limit)
+
+
 # Путь к папке с аккаунтами
 ACCOUNTS_PATH = os.path.join(os.path.dirname(__file__), 'Accounts')
 
-# Создаем папку Accounts, если её нет
-if not os.path.exists(ACCOUNTS_PATH):
-    os.makedirs(ACCOUNTS_PATH)
-    print(f"Папка {ACCOUNTS_PATH} создана.")
-else:
-    print(f"Папка {ACCOUNTS_PATH} уже существует.")
+# Аккаунты: SQLite с индексом в памяти (открывается при прогреве) и серверные сессии
+_accounts = None
+_accounts_lock = threading.Lock()
+sessions = SessionCache()
+
+
+def get_accounts():
+    global _accounts
+    with _accounts_lock:
+        if _accounts is None:
+            # AccountStore сам создаёт папку Accounts, если её нет
+            _accounts = AccountStore(ACCOUNTS_PATH)
+        return _accounts
 
 
-# main.py
 @eel.expose
 def add_user(username, encrypted_password):
-    # print(f"Получены данные: username={username}, password={encrypted_password}")
-    # Путь к файлу пользователя
-    user_file_path = os.path.join(ACCOUNTS_PATH, f"{username}.json")
-
-    # Проверяем, существует ли пользователь
-    if os.path.exists(user_file_path):
-        print(f"Пользователь {username} уже существует.")
-        return False  # Пользователь уже существует
-
-    # Создаем данные пользователя
-    user_data = {
-        "username": username,
-        "password": encrypted_password
-    }
-
-    # Сохраняем данные пользователя в файл
     try:
-        with open(user_file_path, 'w', encoding='utf-8') as file:
-            json.dump(user_data, file, ensure_ascii=False, indent=4)
+        if not get_accounts().add(username, encrypted_password):
+            print(f"Пользователь {username} уже существует.")
+            return False  # Пользователь уже существует
+
         print(f"Пользователь {username} успешно добавлен.")
         return True  # Пользователь успешно добавлен
     except Exception as e:
@@ -219,23 +275,118 @@ def add_user(username, encrypted_password):
 
 @eel.expose
 def check_user(username, encrypted_password):
-    # Путь к файлу пользователя
-    user_file_path = os.path.join(ACCOUNTS_PATH, f"{username}.json")
+    return get_accounts().check(username, encrypted_password)
 
-    # Проверяем, существует ли файл пользователя
-    if not os.path.exists(user_file_path):
-        return False  # Пользователь не найден
 
-    # Загружаем данные пользователя
-    try:
-        with open(user_file_path, 'r', encoding='utf-8') as file:
-            user_data = json.load(file)
-        # Проверяем пароль
-        return user_data["password"] == encrypted_password
-    except Exception as e:
-        print(f"Ошибка при загрузке пользователя: {e}")
-        return False  # Ошибка при загрузке
+@eel.expose
+def login_user(username, encrypted_password):
+    # Возвращаем токен сессии, чтобы страницы не передавали пароль повторно
+    if not get_accounts().check(username, encrypted_password):
+        return None
+    return sessions.create(username)
+
+
+@eel.expose
+def check_session(token):
+    return sessions.get_user(token)
+
+
+@eel.expose
+def logout_user(token):
+    sessions.remove(token)
+    return True
+
+
+def run_crawl_daemon():
+    """Фоновый обход источников: после каждого обхода каталог перечитывается целиком"""
+    from parsers.registry import get_specs
+    from run_parsers import crawl_loop
+
+    def on_crawl_done(results):
+        # Снимок и индексы новой версии строятся в этом потоке, интерфейс получает их готовыми
+        catalog.reload()
+        build_indexes()
+
+    asyncio.run(crawl_loop(get_specs(), on_crawl_done=on_crawl_done, cities=[city]))
+
+
+def notify_catalog_updates():
+    """Сообщает открытым страницам о новой версии каталога"""
+    notified_version = catalog.version
+    while True:
+        eel.sleep(1.0)
+        # Поколение могли опубликовать и отдельным запуском run_parsers.py; перечитывание идёт
+        # в пуле потоков gevent, чтобы гринлеты интерфейса не ждали загрузки снимка
+        if get_hub().threadpool.apply(catalog.reload_if_published):
+            get_hub().threadpool.apply(build_indexes)
+        if catalog.version == notified_version:
+            continue
+
+        # Первая загрузка каталога - не обновление, страницы и так получат свежие данные
+        if notified_version:
+            try:
+                eel.on_catalog_updated(catalog.version)
+            except Exception as e:
+                print(f"Не удалось уведомить страницы об обновлении каталога: {e}")
+        notified_version = catalog.version
+
+
+@contextmanager
+def timed_phase(name):
+    """Замеряет и логирует длительность этапа запуска"""
+    started = time.perf_counter()
+    yield
+    logger.info(f"Запуск: {name} - {(time.perf_counter() - started) * 1000:.1f} мс")
+
+
+def build_indexes():
+    """Строит индексы текущей версии каталога, чтобы запросы интерфейса их не ждали"""
+    with timed_phase("прогрев: фасеты"):
+        catalog.facets()
+    with timed_phase("прогрев: индекс показов"):
+        catalog.time_index()
+
+
+def warm_up():
+    """Прогрев в фоне, параллельно с открытием браузера"""
+    with timed_phase("прогрев: каталог"):
+        len(catalog.events)
+    build_indexes()
+    with timed_phase("прогрев: избранное"):
+        favourite_names()
+    with timed_phase("прогрев: аккаунты"):
+        get_accounts()
+
+
+def main():
+    started = time.perf_counter()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    arg_parser = argparse.ArgumentParser(description="Театральная афиша")
+    arg_parser.add_argument('--daemon', action='store_true',
+                            help="Обновлять события в фоне, не перезапуская приложение")
+    arg_parser.add_argument('--city', choices=sorted(CITIES), default=city.slug,
+                            help="Город, афишу которого показывает приложение")
+    args, _ = arg_parser.parse_known_args()
+    if args.city != city.slug:
+        select_city(args.city)
+
+    # Прогрев стартует сразу, до инициализации Eel и запуска Chrome
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+    # Инициализация Eel
+    with timed_phase("eel.init"):
+        eel.init('web')
+
+    if args.daemon:
+        threading.Thread(target=run_crawl_daemon, name='crawl-daemon', daemon=True).start()
+        eel.spawn(notify_catalog_updates)
+
+    logger.info(f"Запуск: до открытия окна - {(time.perf_counter() - started) * 1000:.1f} мс")
+
+    # Запуск приложения
+    eel.start('login.html', mode='chrome', position=(0, 0), size=(1920, 1080))
 
 
-# Запуск приложения
-eel.start('login.html', mode='chrome', position=(0, 0), size=(1920, 1080))
\ No newline at end of file
+if __name__ == "__main__":
+    main()
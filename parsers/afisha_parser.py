@@ -1,5 +1,4 @@
 import os
-import aiohttp
 from bs4 import BeautifulSoup
 import json
 from urllib.parse import urljoin, unquote
@@ -7,7 +6,8 @@ import re
 import asyncio
 from typing import Dict, Optional, List
 import logging
-from parsers.base_parser import BaseParser, EventData
+from parsers.async_parser import AsyncHttpParser
+from parsers.base_parser import EventData, process_bounded
 from datetime import datetime
 
 # Настройка логирования
@@ -21,27 +21,31 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Сколько страниц списка одного раздела загружается одновременно
+PAGE_WINDOW = 4
+# Сколько изображений галереи сохраняется у события
+GALLERY_SIZE = 3
 
-class AsyncAfishaParser(BaseParser):
+
+class AsyncAfishaParser(AsyncHttpParser):
     """Асинхронный парсер событий с сайта Afisha Goroda"""
 
-    BASE_URL = 'https://tula.afishagoroda.ru'
+    BASE_URL = 'https://{city}.afishagoroda.ru'
     THEATER_URL = f'{BASE_URL}/events/teatr'
-    HEADERS = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-    }
-    CONCURRENCY_LIMIT = 10
-
-    def __init__(self):
-        self.session = None
-        self.semaphore = asyncio.Semaphore(self.CONCURRENCY_LIMIT)
-
-    async def __aenter__(self):
-        self.session = aiohttp.ClientSession(headers=self.HEADERS)
-        return self
-
-    async def __aexit__(self, exc_type, exc, tb):
-        await self.session.close()
+    SOURCE_NAME = 'afisha'
+    PAGINATED = True
+    CATEGORIES = {'theatre': 'teatr', 'concerts': 'kontserty', 'exhibitions': 'vystavki', 'children': 'detyam'}
+    DEFAULT_CATEGORIES = ('theatre',)
+    # Основной тег событий раздела
+    CATEGORY_TAGS = {'theatre': 'Театр', 'concerts': 'Концерт', 'exhibitions': 'Выставка', 'children': 'Детям'}
+    # Всё, что читает _parse_event_page. Галерея идёт последней: страница дочитывается до GALLERY_SIZE её
+    # изображений или до первого элемента после галереи, страница без галереи - до конца
+    STREAM_BLOCKS = (
+        ('h1', ''), ('div', 'info-line'), ('img', 'img'), ('div', 'date-start'), ('div', 'place'), ('div', 'price'),
+        ('a', 'btn target=_blank | js-yaticket-button target=_blank'),
+        ('div', 'redactor content'), ('div', 'redactor content-bottom'),
+        ('a', 'data-fancybox=events-gallery', GALLERY_SIZE),
+    )
 
     @staticmethod
     def _sanitize_filename(filename: str) -> str:
@@ -141,37 +145,27 @@ class AsyncAfishaParser(BaseParser):
             logger.error(f"Неожиданная ошибка при обработке даты {date_text}: {str(e)}")
             return None
 
-    async def _make_request(self, url: str) -> Optional[BeautifulSoup]:
-        """Выполняет асинхронный HTTP-запрос"""
-        async with self.semaphore:
-            try:
-                async with self.session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    response.raise_for_status()
-                    html = await response.text()
-                    return BeautifulSoup(html, 'html.parser')
-            except Exception as e:
-                logger.error(f"Ошибка при запросе {url}: {str(e)}")
-                return None
-
-    async def _parse_event_card(self, card: BeautifulSoup) -> Optional[Dict]:
+    async def _parse_event_card(self, card: BeautifulSoup, category: str) -> Optional[Dict]:
         """Парсит карточку события с главной страницы"""
         try:
             title_tag = card.find('a', class_='title')
-            event_url = urljoin(self.BASE_URL, title_tag['href']) if title_tag else None
+            event_url = urljoin(self.base_url, title_tag['href']) if title_tag else None
             title = title_tag.get_text(strip=True) if title_tag else None
 
             return {
                 'title': title,
-                'event_url': event_url
+                'event_url': event_url,
+                'category': category
             }
         except Exception as e:
             logger.error(f"Ошибка при парсинге карточки события: {str(e)}")
             return None
 
-    async def _parse_event_page(self, event_url: str) -> Optional[Dict]:
+    async def _parse_event_page(self, event_url: str, category: Optional[str] = None) -> Optional[Dict]:
         """Парсит страницу отдельного события"""
+        soup = None
         try:
-            soup = await self._make_request(event_url)
+            soup = await self._make_request(event_url, detail=True)
             if not soup:
                 return None
 
@@ -192,7 +186,7 @@ class AsyncAfishaParser(BaseParser):
 
             # Изображение
             image_tag = soup.find('img', class_='img')
-            event_data['image'] = urljoin(self.BASE_URL, image_tag['src']) if image_tag and image_tag.has_attr(
+            event_data['image'] = urljoin(self.base_url, image_tag['src']) if image_tag and image_tag.has_attr(
                 'src') else None
 
             # Дата и время
@@ -241,9 +235,9 @@ class AsyncAfishaParser(BaseParser):
             event_data['full_description'] = '\n\n'.join(full_desc) if full_desc else None
 
             # Галерея изображений
-            gallery = soup.find_all('a', {'data-fancybox': 'events-gallery'})[:3]
+            gallery = soup.find_all('a', {'data-fancybox': 'events-gallery'})[:GALLERY_SIZE]
             event_data['gallery_images'] = [
-                urljoin(self.BASE_URL, img['href'])
+                urljoin(self.base_url, img['href'])
                 for img in gallery
                 if not img['href'].startswith('https://')
             ]
@@ -251,7 +245,7 @@ class AsyncAfishaParser(BaseParser):
             # Генерация тегов
             event_data['tags'] = self._generate_tags(
                 age_limit=event_data.get('age_limit'),
-                event_url=event_url,
+                category=category,
                 price=event_data.get('price')
             )
 
@@ -259,11 +253,16 @@ class AsyncAfishaParser(BaseParser):
         except Exception as e:
             logger.error(f"Ошибка при парсинге страницы события {event_url}: {str(e)}")
             return None
+        finally:
+            # Дерево страницы больше не нужно: освобождаем его сразу, не дожидаясь сборщика мусора
+            if soup is not None:
+                soup.decompose()
 
-    @staticmethod
-    def _generate_tags(age_limit: Optional[str], event_url: str, price: Optional[str]) -> List[str]:
+    @classmethod
+    def _generate_tags(cls, age_limit: Optional[str], category: Optional[str], price: Optional[str]) -> List[str]:
         """Генерирует теги на основе данных о событии"""
-        tags = ['Театр', 'Культура']  # Базовые теги
+        # Базовые теги; у карточек, сохранённых до появления разделов, раздела нет - это театр
+        tags = [cls.CATEGORY_TAGS.get(category, 'Театр'), 'Культура']
 
         # На основе возрастного ограничения
         if age_limit:
@@ -283,49 +282,77 @@ class AsyncAfishaParser(BaseParser):
 
         return tags
 
-    async def _save_event(self, event: EventData) -> bool:
-        """Сохраняет данные о событии в JSON файл"""
-        try:
-            if not event.title:
-                return False
+    def listing_url(self, page: int = 1, category: Optional[str] = None) -> str:
+        """Адрес страницы списка раздела; первая страница - без номера, как в ссылках сайта"""
+        url = f"{self.base_url}/events/{self.CATEGORIES[category or self.DEFAULT_CATEGORIES[0]]}"
+        return url if page == 1 else f"{url}?page={page}"
 
-            safe_title = self._sanitize_filename(event.title)
-            folder_path = os.path.join('../spectacles', 'afisha', safe_title)
-            os.makedirs(folder_path, exist_ok=True)
+    async def parse_listing(self, page: int = 1, category: Optional[str] = None) -> Optional[List[Dict]]:
+        """Карточки событий со страницы списка раздела (None, если страницу не удалось загрузить)"""
+        category = category or self.DEFAULT_CATEGORIES[0]
+        cards = self._checkpointed_cards(page, category)
+        if cards is not None:
+            return cards
 
-            json_path = os.path.join(folder_path, 'event_details.json')
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(event.__dict__, f, ensure_ascii=False, indent=4)
+        soup = await self._make_request(self.listing_url(page, category))
+        if not soup:
+            return None
 
-            logger.info(f"Сохранено событие: {event.title}")
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении события {event.title}: {str(e)}")
-            return False
+        cards = []
+        for card in soup.find_all('div', class_='events-elem'):
+            card_data = await self._parse_event_card(card, category)
+            if card_data and card_data.get('event_url'):
+                cards.append(card_data)
+        soup.decompose()
+
+        self._checkpoint_cards(page, cards, category)
+        return cards
+
+    async def _parse_category(self, category: str) -> List[Dict]:
+        """Карточки всех страниц раздела: страницы загружаются окнами по PAGE_WINDOW одновременно"""
+        cards = []
+        seen = set()
+        page = 1
+        window = 1  # Первая страница отдельно: у небольших разделов она единственная
+        while not self._time_is_up():
+            pages = range(page, page + window)
+            results = await asyncio.gather(*(self.parse_listing(number, category) for number in pages))
+            for number, page_cards in zip(pages, results):
+                if page_cards is None:
+                    logger.warning(f"Раздел {category}: страница {number} не загрузилась, дальше раздел не читается")
+                    return cards
+                # За последней страницей сайт отдаёт пустой список или повторяет последнюю страницу
+                new_cards = [card for card in page_cards if card['event_url'] not in seen]
+                if not new_cards:
+                    logger.info(f"Раздел {category}: {len(cards)} событий на {number - 1} страницах")
+                    return cards
+                seen.update(card['event_url'] for card in new_cards)
+                cards.extend(new_cards)
+            page += window
+            window = PAGE_WINDOW
+        logger.warning(f"Раздел {category}: время вышло на странице {page}, найдено {len(cards)} событий")
+        return cards
 
     async def parse_events(self) -> List[EventData]:
         """Основной метод парсинга событий"""
-        logger.info("Начало парсинга событий")
-        soup = await self._make_request(self.THEATER_URL)
-        if not soup:
+        logger.info(f"Начало парсинга событий, разделы: {', '.join(self.categories)}")
+        listings = await asyncio.gather(*(self._parse_category(category) for category in self.categories))
+        # Событие из нескольких разделов загружается один раз - с первым разделом, где оно встретилось
+        cards = self._prioritized(self._new_cards([card for cards in listings for card in cards]))
+        if not cards:
             return []
 
-        event_cards = soup.find_all('div', class_='events-elem')
-        logger.info(f"Найдено {len(event_cards)} событий для парсинга")
-
-        tasks = []
-        for card in event_cards:
-            card_data = await self._parse_event_card(card)
-            if card_data and card_data.get('event_url'):
-                tasks.append(self._process_single_event(card_data))
-
-        results = await asyncio.gather(*tasks)
-        return [event for event in results if event]
+        logger.info(f"Найдено {len(cards)} событий для парсинга")
+        return await process_bounded(cards, self._process_single_event, self.concurrency)
 
     async def _process_single_event(self, card_data: Dict) -> Optional[EventData]:
         """Обрабатывает одно событие"""
         try:
-            page_data = await self._parse_event_page(card_data['event_url'])
+            handled, event = self._event_without_download(card_data)
+            if handled:
+                return event
+
+            page_data = await self._parse_event_page(card_data['event_url'], card_data.get('category'))
             if not page_data:
                 return None
 
@@ -343,8 +370,7 @@ class AsyncAfishaParser(BaseParser):
                 tags=page_data.get('tags', [])
             )
 
-            await self._save_event(event)
-            return event
+            return self._store_event(event, card_data)
         except Exception as e:
             logger.error(f"Ошибка при обработке события: {str(e)}")
             return None
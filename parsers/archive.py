@@ -0,0 +1,90 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+OBJECTS_DIR = 'objects'
+INDEX_FILE = 'index.db'
+COMPRESSION_LEVEL = 10
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS fetches (
+    url TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (url, fetched_at)
+);
+'''
+
+
+class HtmlArchive:
+    """Архив загруженных страниц: тело хранится один раз по SHA-256 в zstd, индекс - адрес и время загрузки"""
+
+    def __init__(self, root: str):
+        # zstandard нужен только архиву; без него обход работает, просто ничего не сохраняет
+        import zstandard
+        self._zstd = zstandard
+
+        self.root = root
+        self.objects_path = os.path.join(root, OBJECTS_DIR)
+        os.makedirs(self.objects_path, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(os.path.join(root, INDEX_FILE), timeout=30, isolation_level=None,
+                                           check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(SCHEMA)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_path, digest[:2], f'{digest[2:]}.zst')
+
+    def put(self, url: str, html: str, fetched_at: Optional[float] = None) -> str:
+        """Сохраняет страницу и возвращает хеш её содержимого"""
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(digest)
+
+        with self._lock:
+            # Одинаковое содержимое (страница не менялась между обходами) хранится один раз
+            if not os.path.exists(object_path):
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                tmp_path = f"{object_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(self._zstd.ZstdCompressor(level=COMPRESSION_LEVEL).compress(data))
+                os.replace(tmp_path, object_path)
+
+            self._connection.execute('INSERT OR REPLACE INTO fetches VALUES (?, ?, ?)',
+                                     (url, fetched_at or time.time(), digest))
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        """Содержимое страницы по хешу"""
+        try:
+            with open(self._object_path(digest), 'rb') as f:
+                return self._zstd.ZstdDecompressor().decompress(f.read()).decode('utf-8')
+        except OSError:
+            return None
+
+    def latest(self, url: str, before: Optional[float] = None) -> Optional[str]:
+        """Последняя сохранённая версия страницы (не позже before, если задано)"""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT digest FROM fetches WHERE url = ? AND fetched_at <= ? ORDER BY fetched_at DESC LIMIT 1',
+                (url, before if before is not None else float('inf'))
+            ).fetchone()
+        return self.get(row[0]) if row else None
+
+    def history(self, url: str) -> List[tuple]:
+        """Все загрузки страницы: (время, хеш) от старых к новым"""
+        with self._lock:
+            return self._connection.execute(
+                'SELECT fetched_at, digest FROM fetches WHERE url = ? ORDER BY fetched_at', (url,)
+            ).fetchall()
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,84 @@
+import asyncio
+import time
+from typing import Optional, Tuple
+import logging
+import aiohttp
+from bs4 import BeautifulSoup
+from parsers.base_parser import BaseParser
+from parsers.single_flight import AsyncSingleFlight
+from parsers.streaming import read_until_blocks
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncHttpParser(BaseParser):
+    """Базовый класс асинхронных парсеров: сессия aiohttp и общий путь загрузки страниц"""
+
+    CONCURRENCY_LIMIT = 10  # Ограничение одновременных запросов
+
+    def __init__(self, concurrency: Optional[int] = None, session: Optional[aiohttp.ClientSession] = None,
+                 **kwargs):
+        super().__init__(**kwargs)
+        # Общая сессия обхода нескольких городов принадлежит вызывающему и здесь не закрывается
+        self.session = session
+        self._owns_session = session is None
+        self.concurrency = concurrency or self.CONCURRENCY_LIMIT
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self._in_flight = AsyncSingleFlight()
+
+    async def __aenter__(self):
+        if self._owns_session:
+            self.session = aiohttp.ClientSession(headers=self.HEADERS)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._owns_session:
+            await self.session.close()
+
+    async def _fetch_html(self, url: str, detail: bool = False) -> Optional[str]:
+        """Загружает страницу; одновременные запросы одного адреса разделяют одну загрузку"""
+        if self.replay:
+            return self._replayed_html(url)
+        stream = detail and self.stream_details
+        return await self._in_flight.do(f"{url}#stream" if stream else url,
+                                        lambda: self._download(url, detail))
+
+    async def _download(self, url: str, detail: bool = False) -> Optional[str]:
+        """Загружает страницу из сети и сохраняет её в архив"""
+        async with self.semaphore:
+            try:
+                html, complete = await self.latency.fetch(
+                    url, lambda timeout: self._get_text(url, timeout, detail), self.hedge)
+                # Недочитанная страница в архив не попадает: повторный разбор по ней дал бы неполные события
+                if complete:
+                    self._archive_html(url, html)
+                return html
+            except Exception as e:
+                logger.error(f"Ошибка при запросе {url}: {str(e)}")
+                return None
+
+    async def _get_text(self, url: str, timeout: float, detail: bool = False) -> Tuple[str, bool]:
+        """Один HTTP-запрос страницы с заданным таймаутом: (HTML, прочитана ли страница целиком)"""
+        async with self.session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            response.raise_for_status()
+            if detail and self.stream_details:
+                html, size, stopped_early = await read_until_blocks(response, self.STREAM_BLOCKS)
+                self.page_stats.add_download(size, stopped_early)
+                return html, not stopped_early
+
+            body = await response.read()
+            if detail:
+                self.page_stats.add_download(len(body))
+            return await response.text(), True
+
+    async def _make_request(self, url: str, detail: bool = False) -> Optional[BeautifulSoup]:
+        """Загружает страницу и разбирает её в дерево BeautifulSoup"""
+        html = await self._fetch_html(url, detail)
+        if html is None:
+            return None
+
+        started = time.perf_counter()
+        soup = BeautifulSoup(html, 'html.parser')
+        if detail:
+            self.page_stats.add_parse(time.perf_counter() - started)
+        return soup
@@ -1,10 +1,21 @@
+import asyncio
+import hashlib
 import re
+import shutil
+import time
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
 import logging
 import os
 import json
 from urllib.parse import unquote
+from catalog.fields import parse_date_range
+from catalog.generations import link_or_copy
+from parsers.archive import HtmlArchive
+from parsers.checkpoint import CrawlCheckpoint
+from parsers.latency import LatencyTracker
+from parsers.streaming import Block, PageStats
+from parsers.cities import City, get_city
 
 
 @dataclass
@@ -23,11 +34,93 @@ class EventData:
     gallery_images: Optional[List[str]] = None
 
 
+# Очередь загрузки страниц событий при обходе по приоритету: ближайшие показы,
+# изменившиеся карточки, избранное, остальное
+PRIORITY_SOON, PRIORITY_CHANGED, PRIORITY_FAVOURITE, PRIORITY_REST = range(4)
+# Показы в ближайшие сутки-двое считаются "ближайшими", сек.
+SOON_WINDOW = 2 * 24 * 60 * 60
+
+
+async def process_bounded(items: Iterable[Any], worker: Callable[[Any], Awaitable[Any]], limit: int) -> List[Any]:
+    """Обрабатывает элементы, держа в работе не больше limit корутин; пустые результаты отбрасываются"""
+    # Следующий элемент берётся, только когда освобождается место: в памяти живёт
+    # не больше limit разобранных страниц, сколько бы карточек ни было в списке
+    results = []
+    in_flight = set()
+    for item in items:
+        if len(in_flight) >= limit:
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            results.extend(task.result() for task in done)
+        in_flight.add(asyncio.ensure_future(worker(item)))
+
+    if in_flight:
+        done, _ = await asyncio.wait(in_flight)
+        results.extend(task.result() for task in done)
+    return [result for result in results if result]
+
+
 class BaseParser:
     """Базовый класс для всех парсеров"""
 
-    def __init__(self):
+    SOURCE_NAME = ''  # Имя папки источника внутри OUTPUT_ROOT
+    OUTPUT_ROOT = 'spectacles'
+    # Шаблоны адресов: {city} заменяется обозначением города на этом источнике
+    BASE_URL = ''
+    THEATER_URL = ''
+    PAGINATED = False  # Список событий разбит на страницы ?page=N
+    # Разделы списка событий: имя -> часть адреса (пусто - у источника один список)
+    CATEGORIES: Dict[str, str] = {}
+    DEFAULT_CATEGORIES: Tuple[str, ...] = ()
+    # Все блоки страницы события, которые читает разбор: после них страницу можно не дочитывать
+    # (пусто - потоковое чтение не поддерживается)
+    STREAM_BLOCKS: Tuple[Block, ...] = ()
+    # Отпечаток карточки из списка и время последней загрузки страницы события
+    CARD_FILE = 'card.json'
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
+    }
+
+    def __init__(self, output_root: Optional[str] = None, detail_max_age: Optional[float] = None,
+                 previous_root: Optional[str] = None, city: Optional[City] = None):
         self.logger = logging.getLogger(__name__)
+        self.city = city or get_city()
+        if self.SOURCE_NAME and not self.city.supports(self.SOURCE_NAME):
+            raise ValueError(f"Источник {self.SOURCE_NAME} не поддерживает город {self.city.name}")
+        city_slug = self.city.source_slugs.get(self.SOURCE_NAME, '')
+        self.base_url = self.BASE_URL.format(city=city_slug)
+        self.theater_url = self.THEATER_URL.format(city=city_slug)
+        self.output_root = output_root or self.OUTPUT_ROOT
+        # Опубликованное поколение каталога, из которого берутся ещё актуальные события
+        self.previous_root = previous_root or self.output_root
+        # Сколько секунд сохранённая страница события считается актуальной (None - всегда перечитывать)
+        self.detail_max_age = detail_max_age
+        # Момент (time.monotonic), после которого парсер перестаёт брать новую работу
+        self.deadline: Optional[float] = None
+        # Прогресс обхода, с которого продолжается прерванный запуск (None - без контрольных точек)
+        self.checkpoint: Optional[CrawlCheckpoint] = None
+        # Архив загруженных страниц (None - страницы не сохраняются)
+        self.archive: Optional[HtmlArchive] = None
+        # Повторный разбор: страницы берутся из архива, сеть не используется
+        self.replay = False
+        # Время ответа хостов: из него берутся таймауты; общий трекер задаёт обход
+        self.latency = LatencyTracker()
+        # Дублировать запрос, не получивший ответа за p95 времени ответа хоста
+        self.hedge = False
+        # Читать страницы событий потоком и останавливаться, когда прочитаны все STREAM_BLOCKS
+        self.stream_details = False
+        self.page_stats = PageStats()
+        # Адреса событий, уже взятых в работу в этом запуске
+        self._seen_urls: Set[str] = set()
+        # Сколько событий перенесено без загрузки страницы: карточка не изменилась
+        self.unchanged_cards = 0
+        # Загружать страницы событий по приоритету, а не в порядке списка
+        self.prioritize = False
+        # Имена папок избранных событий (для приоритета)
+        self.favourites: Set[str] = set()
+        # Карточки, до которых не дошла очередь до истечения лимита времени
+        self.skipped: List[Dict] = []
+        # Обходимые разделы списка (из CATEGORIES)
+        self.categories: List[str] = list(self.DEFAULT_CATEGORIES)
 
     @staticmethod
     def _sanitize_filename(filename: str) -> str:
@@ -38,22 +131,279 @@ class BaseParser:
         filename = filename.replace('&nbsp;', ' ').replace('\xa0', ' ')
         return re.sub(r'[<>:"/\\|?*]', '', filename).strip()
 
-    def _save_event(self, event: EventData, source_name: str) -> bool:
+    def listing_url(self, page: int = 1, category: Optional[str] = None) -> str:
+        """Адрес страницы списка событий (category - раздел из CATEGORIES, если они есть у источника)"""
+        return self.theater_url
+
+    def select_categories(self, names: List[str]):
+        """Обходить указанные разделы; разделы, которых у источника нет, пропускаются"""
+        categories = [name for name in names if name in self.CATEGORIES]
+        if categories:
+            self.categories = categories
+
+    def _time_is_up(self) -> bool:
+        """Проверяет, истёк ли выделенный парсеру лимит времени"""
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def _new_cards(self, cards: List[Dict]) -> List[Dict]:
+        """Отбрасывает карточки событий, чьи страницы уже обработаны в этом запуске"""
+        # Одно событие бывает в списке дважды, а соседние страницы списка перекрываются при сдвиге событий
+        new_cards = []
+        for card_data in cards:
+            if card_data['event_url'] not in self._seen_urls:
+                self._seen_urls.add(card_data['event_url'])
+                new_cards.append(card_data)
+        if len(new_cards) < len(cards):
+            self.logger.info(f"Пропущено повторяющихся карточек: {len(cards) - len(new_cards)}")
+        return new_cards
+
+    def _replayed_html(self, url: str) -> Optional[str]:
+        """Последняя сохранённая в архиве версия страницы для повторного разбора"""
+        html = self.archive.latest(url) if self.archive is not None else None
+        if html is None:
+            self.logger.warning(f"Страницы нет в архиве: {url}")
+        return html
+
+    def _archive_html(self, url: str, html: str):
+        """Сохраняет загруженную страницу в архив; ошибка архива не прерывает обход"""
+        if self.archive is None or self.replay:
+            return
+        try:
+            self.archive.put(url, html)
+        except Exception as e:
+            self.logger.error(f"Ошибка при сохранении страницы {url} в архив: {str(e)}")
+
+    def _event_json_path(self, title: str, source_name: Optional[str] = None, root: Optional[str] = None) -> str:
+        """Возвращает путь к event_details.json события"""
+        safe_title = self._sanitize_filename(title)
+        return os.path.join(root or self.output_root, source_name or self.SOURCE_NAME, safe_title,
+                            'event_details.json')
+
+    def _listing_key(self, category: Optional[str] = None) -> str:
+        """Имя списка в контрольной точке: у каждого раздела своя нумерация страниц"""
+        return self.SOURCE_NAME if category is None else f"{self.SOURCE_NAME}/{category}"
+
+    def _checkpointed_cards(self, page: int, category: Optional[str] = None) -> Optional[List[Dict]]:
+        """Карточки страницы списка, загруженной прерванным обходом"""
+        if self.checkpoint is None:
+            return None
+        return self.checkpoint.page_cards(self.city.slug, self._listing_key(category), page)
+
+    def _checkpoint_cards(self, page: int, cards: List[Dict], category: Optional[str] = None):
+        """Запоминает карточки загруженной страницы списка"""
+        if self.checkpoint is not None:
+            self.checkpoint.mark_page(self.city.slug, self._listing_key(category), page, cards)
+
+    def _resume_event(self, card_data: Dict) -> Optional[EventData]:
+        """Событие, которое прерванный обход уже сохранил в это же поколение"""
+        if self.checkpoint is None or not self.checkpoint.detail_done(
+                self.city.slug, self.SOURCE_NAME, card_data['event_url']):
+            return None
+        try:
+            with open(self._event_json_path(card_data['title']), 'r', encoding='utf-8') as f:
+                return EventData(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _checkpoint_event(self, card_data: Dict):
+        """Отмечает событие карточки как сохранённое"""
+        if self.checkpoint is not None:
+            self.checkpoint.mark_detail(self.city.slug, self.SOURCE_NAME, card_data['event_url'])
+
+    @staticmethod
+    def _card_fingerprint(card_data: Dict) -> str:
+        """Отпечаток карточки события из списка: меняется вместе с любым её полем"""
+        data = json.dumps(card_data, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        return hashlib.sha1(data).hexdigest()
+
+    def _card_path(self, title: str, root: Optional[str] = None) -> str:
+        """Путь к отпечатку карточки события"""
+        return os.path.join(os.path.dirname(self._event_json_path(title, root=root)), self.CARD_FILE)
+
+    def _previous_card_state(self, title: str) -> Optional[Dict]:
+        """Отпечаток карточки и время загрузки события в опубликованном поколении"""
+        try:
+            with open(self._card_path(title, root=self.previous_root), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _carry_over_event(self, title: str) -> Optional[EventData]:
+        """Переносит событие из опубликованного поколения в новое как есть"""
+        previous_path = self._event_json_path(title, root=self.previous_root)
+        try:
+            with open(previous_path, 'r', encoding='utf-8') as f:
+                event = EventData(**json.load(f))
+
+            # Папка события переносится вместе с отпечатком и временем последней загрузки
+            output_dir = os.path.dirname(self._event_json_path(title))
+            if os.path.dirname(previous_path) != output_dir:
+                shutil.copytree(os.path.dirname(previous_path), output_dir,
+                                copy_function=link_or_copy, dirs_exist_ok=True)
+            return event
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _load_fresh_event(self, card_data: Dict) -> Optional[EventData]:
+        """Возвращает прежнее событие, если его карточка не изменилась, а страница моложе detail_max_age"""
+        title = card_data.get('title')
+        if not title or self.detail_max_age is None:
+            return None
+
+        card_state = self._previous_card_state(title)
+        # Событие без отпечатка (сохранено до его появления) перечитывается
+        if not isinstance(card_state, dict) or card_state.get('fingerprint') != self._card_fingerprint(card_data):
+            return None
+        if time.time() - card_state.get('fetched_at', 0) > self.detail_max_age:
+            return None
+
+        event = self._carry_over_event(title)
+        if event:
+            self.unchanged_cards += 1
+        return event
+
+    def _skip_event(self, card_data: Dict) -> Optional[EventData]:
+        """Лимит времени исчерпан: событие остаётся в прежней версии (если она есть) и попадает в отчёт"""
+        event = self._carry_over_event(card_data['title']) if card_data.get('title') else None
+        self.skipped.append({'title': card_data.get('title'), 'event_url': card_data.get('event_url'),
+                             'kept_previous': event is not None})
+        return event
+
+    def _event_without_download(self, card_data: Dict) -> Tuple[bool, Optional[EventData]]:
+        """Событие, страницу которого загружать не нужно: (True, событие или None); иначе (False, None)"""
+        # Событие уже сохранено прерванным обходом этого поколения
+        resumed_event = self._resume_event(card_data)
+        if resumed_event:
+            return True, resumed_event
+
+        # Карточка в списке не изменилась, а страница события перечитывалась недавно - запрос не нужен
+        fresh_event = self._load_fresh_event(card_data)
+        if fresh_event:
+            self._checkpoint_event(card_data)
+            return True, fresh_event
+
+        # Время вышло: в каталоге остаётся прежняя версия события
+        if self._time_is_up():
+            return True, self._skip_event(card_data)
+        return False, None
+
+    def _store_event(self, event: EventData, card_data: Dict) -> EventData:
+        """Сохраняет загруженное событие вместе с отпечатком карточки и отметкой в контрольной точке"""
+        if self._save_event(event):
+            self._remember_card(card_data)
+            self._checkpoint_event(card_data)
+        return event
+
+    def stopped_by_deadline(self) -> bool:
+        """Обход остановлен лимитом времени: часть списка могла остаться непрочитанной"""
+        return self._time_is_up()
+
+    def carry_over_unreached(self) -> List[EventData]:
+        """Переносит события прежнего поколения, до карточек которых обход не дошёл, и добавляет их в отчёт"""
+        # Страницы списка, не прочитанные до лимита времени, бросаются вместе с их событиями
+        previous_dir = os.path.join(self.previous_root, self.SOURCE_NAME)
+        output_dir = os.path.join(self.output_root, self.SOURCE_NAME)
+        if os.path.abspath(previous_dir) == os.path.abspath(output_dir) or not os.path.isdir(previous_dir):
+            return []
+
+        events = []
+        for entry in sorted(os.scandir(previous_dir), key=lambda entry: entry.name):
+            if not entry.is_dir() or os.path.exists(os.path.join(output_dir, entry.name)):
+                continue
+            try:
+                with open(os.path.join(entry.path, 'event_details.json'), 'r', encoding='utf-8') as f:
+                    event = EventData(**json.load(f))
+                shutil.copytree(entry.path, os.path.join(output_dir, entry.name), copy_function=link_or_copy)
+            except (OSError, ValueError, TypeError):
+                continue
+            try:
+                with open(os.path.join(entry.path, self.CARD_FILE), 'r', encoding='utf-8') as f:
+                    event_url = json.load(f).get('event_url')
+            except (OSError, ValueError, AttributeError):
+                event_url = None
+            self.skipped.append({'title': event.title, 'event_url': event_url, 'kept_previous': True})
+            events.append(event)
+        return events
+
+    def saved_events(self) -> List[EventData]:
+        """События источника, уже сохранённые в новое поколение"""
+        output_dir = os.path.join(self.output_root, self.SOURCE_NAME)
+        events = []
+        try:
+            entries = sorted(os.scandir(output_dir), key=lambda entry: entry.name)
+        except OSError:
+            return []
+        for entry in entries:
+            try:
+                with open(os.path.join(entry.path, 'event_details.json'), 'r', encoding='utf-8') as f:
+                    events.append(EventData(**json.load(f)))
+            except (OSError, ValueError, TypeError):
+                continue
+        return events
+
+    def _card_priority(self, card_data: Dict) -> Tuple[int, float]:
+        """Ключ очереди загрузки: группа приоритета, затем время ближайшего показа"""
+        title = card_data.get('title') or ''
+        date_text = card_data.get('date')
+        if not date_text:
+            # В карточках Афиши и Культуры даты нет - берётся дата из прошлой версии события
+            try:
+                with open(self._event_json_path(title, root=self.previous_root), 'r', encoding='utf-8') as f:
+                    date_text = json.load(f).get('date')
+            except (OSError, ValueError, AttributeError):
+                date_text = None
+
+        start, end = parse_date_range(date_text)
+        now = time.time()
+        # Идущее событие (выставка, спектакль в прокате) "показывается" уже сейчас
+        starts_at = max(start.timestamp(), now) if start and end and end.timestamp() >= now else float('inf')
+
+        card_state = self._previous_card_state(title)
+        if starts_at - now <= SOON_WINDOW:
+            group = PRIORITY_SOON
+        elif not isinstance(card_state, dict) or card_state.get('fingerprint') != self._card_fingerprint(card_data):
+            group = PRIORITY_CHANGED
+        elif self._sanitize_filename(title) in self.favourites:
+            group = PRIORITY_FAVOURITE
+        else:
+            group = PRIORITY_REST
+        return group, starts_at
+
+    def _prioritized(self, cards: List[Dict]) -> List[Dict]:
+        """Упорядочивает карточки по приоритету загрузки (в режиме prioritize)"""
+        if not self.prioritize:
+            return cards
+        return sorted(cards, key=self._card_priority)
+
+    def _remember_card(self, card_data: Dict):
+        """Записывает рядом с сохранённым событием отпечаток его карточки и время загрузки страницы"""
+        card_path = self._card_path(card_data['title'])
+        try:
+            tmp_path = f"{card_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'fingerprint': self._card_fingerprint(card_data), 'fetched_at': time.time(),
+                           'event_url': card_data.get('event_url')}, f, ensure_ascii=False)
+            os.replace(tmp_path, card_path)
+        except OSError as e:
+            self.logger.error(f"Ошибка при сохранении отпечатка карточки {card_data['title']}: {str(e)}")
+
+    def _save_event(self, event: EventData, source_name: Optional[str] = None) -> bool:
         """Сохраняет данные о событии в JSON файл"""
         try:
             if not event.title:
                 return False
 
-            safe_title = self._sanitize_filename(event.title)
-            folder_path = os.path.join('spectacles', source_name, safe_title)
-            os.makedirs(folder_path, exist_ok=True)
+            json_path = self._event_json_path(event.title, source_name)
+            os.makedirs(os.path.dirname(json_path), exist_ok=True)
 
-            json_path = os.path.join(folder_path, 'event_details.json')
-            with open(json_path, 'w', encoding='utf-8') as f:
+            # Пишем через временный файл: файлы поколений могут быть жёсткими ссылками
+            tmp_path = f"{json_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
                 json.dump(event.__dict__, f, ensure_ascii=False, indent=4)
+            os.replace(tmp_path, json_path)
 
             self.logger.info(f"Сохранено событие: {event.title}")
             return True
         except Exception as e:
             self.logger.error(f"Ошибка при сохранении события {event.title}: {str(e)}")
-            return False
\ No newline at end of file
+            return False
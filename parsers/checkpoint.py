@@ -0,0 +1,98 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    city TEXT PRIMARY KEY,
+    staging_dir TEXT NOT NULL,
+    started_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    city TEXT NOT NULL,
+    source TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    cards TEXT NOT NULL,
+    PRIMARY KEY (city, source, page)
+);
+CREATE TABLE IF NOT EXISTS details (
+    city TEXT NOT NULL,
+    source TEXT NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (city, source, url)
+);
+'''
+
+
+class CrawlCheckpoint:
+    """Прогресс незавершённого обхода: папка поколения, загруженные страницы списков и готовые события"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Каждая отметка фиксируется сразу: после падения процесса теряется не больше одной страницы
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(SCHEMA)
+
+    def staging_dir(self, city: str) -> Optional[str]:
+        """Папка прерванного обхода города, если она ещё на месте"""
+        with self._lock:
+            row = self._connection.execute('SELECT staging_dir FROM runs WHERE city = ?', (city,)).fetchone()
+        if row and os.path.isdir(row[0]):
+            return row[0]
+        if row:
+            # Папку удалили вручную - продолжать нечего
+            self.finish(city)
+        return None
+
+    def begin(self, city: str, staging_dir: str):
+        """Запоминает папку нового обхода города"""
+        with self._lock:
+            self._connection.execute('INSERT OR REPLACE INTO runs VALUES (?, ?, ?)', (city, staging_dir, time.time()))
+
+    def page_cards(self, city: str, source: str, page: int) -> Optional[List[Dict]]:
+        """Карточки уже загруженной страницы списка (None, если страница ещё не загружалась)"""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT cards FROM pages WHERE city = ? AND source = ? AND page = ?', (city, source, page)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def mark_page(self, city: str, source: str, page: int, cards: List[Dict]):
+        """Отмечает загруженную страницу списка вместе с её карточками"""
+        with self._lock:
+            self._connection.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)',
+                                     (city, source, page, json.dumps(cards, ensure_ascii=False)))
+
+    def detail_done(self, city: str, source: str, url: str) -> bool:
+        """Сохранено ли событие с этой страницы в текущем обходе"""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT 1 FROM details WHERE city = ? AND source = ? AND url = ?', (city, source, url)
+            ).fetchone()
+        return row is not None
+
+    def mark_detail(self, city: str, source: str, url: str):
+        """Отмечает сохранённое событие"""
+        with self._lock:
+            self._connection.execute('INSERT OR IGNORE INTO details VALUES (?, ?, ?)', (city, source, url))
+
+    def finish(self, city: str):
+        """Забывает прогресс города после публикации или отказа от поколения"""
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            for table in ('runs', 'pages', 'details'):
+                self._connection.execute(f'DELETE FROM {table} WHERE city = ?', (city,))
+            self._connection.execute('COMMIT')
+
+    def close(self):
+        self._connection.close()
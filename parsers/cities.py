@@ -0,0 +1,48 @@
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+
+@dataclass(frozen=True)
+class City:
+    """Город и его обозначения в адресах источников"""
+    slug: str
+    name: str
+    # Имя источника -> часть адреса с городом; источника нет - город на нём не обходится
+    source_slugs: Dict[str, str] = field(default_factory=dict, compare=False)
+
+    def supports(self, source_name: str) -> bool:
+        """Есть ли у источника афиша этого города"""
+        return source_name in self.source_slugs
+
+
+CITIES: Dict[str, City] = {
+    city.slug: city for city in (
+        City('tula', 'Тула', {'afisha': 'tula', 'culture': 'tulskaya-oblast-tula', 'mts': 'tula'}),
+        City('moscow', 'Москва', {'culture': 'moskva', 'mts': 'moscow'}),
+        City('spb', 'Санкт-Петербург', {'culture': 'sankt-peterburg', 'mts': 'sankt-peterburg'}),
+    )
+}
+DEFAULT_CITY = 'tula'
+# Каталоги остальных городов лежат в отдельных папках внутри корня каталога
+CITIES_DIR = 'cities'
+
+
+def get_city(slug: Optional[str] = None) -> City:
+    """Город по его обозначению (по умолчанию - основной город)"""
+    try:
+        return CITIES[slug or DEFAULT_CITY]
+    except KeyError:
+        raise ValueError(f"Неизвестный город: {slug}") from None
+
+
+def get_cities(slugs: Optional[List[str]] = None) -> List[City]:
+    """Города по обозначениям (основной город, если обозначения не заданы)"""
+    return [get_city(slug) for slug in (slugs or [DEFAULT_CITY])]
+
+
+def city_root(output_root: str, city: City) -> str:
+    """Корень каталога города: основной город - прямо в корне, как до разделения по городам"""
+    if city.slug == DEFAULT_CITY:
+        return output_root
+    return os.path.join(output_root, CITIES_DIR, city.slug)
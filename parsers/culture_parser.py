@@ -1,13 +1,16 @@
 import os
-import aiohttp
 from bs4 import BeautifulSoup
 import json
-from urllib.parse import urljoin, unquote
+from urllib.parse import parse_qs, unquote, urljoin, urlparse
 import re
 import asyncio
-from typing import Dict, Optional, List
+import time
+from typing import Any, Dict, Optional, List
 import logging
-from parsers.base_parser import BaseParser, EventData
+from parsers.async_parser import AsyncHttpParser
+from parsers.base_parser import EventData, process_bounded
+from parsers.next_data import (extract_next_data, first_value, format_date_range, iter_dicts, iter_lists, names,
+                               page_props, plain_text, to_datetime)
 
 
 # Настройка логирования
@@ -21,27 +24,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-
-class AsyncCultureParser(BaseParser):
+# Ключи полей события в данных Next.js: в разных разделах сайта поля называются по-разному
+TITLE_KEYS = ('title', 'name')
+URL_KEYS = ('url', 'link', 'href')
+DESCRIPTION_KEYS = ('description', 'text', 'fullDescription', 'shortDescription')
+START_KEYS = ('start', 'startDate', 'startAt', 'date')
+END_KEYS = ('end', 'endDate', 'endAt')
+AGE_KEYS = ('ageRestriction', 'ageLimit', 'age')
+PLACE_KEYS = ('places', 'place', 'venue')
+ADDRESS_KEYS = ('address', 'fullAddress')
+TAG_KEYS = ('tags', 'genres')
+IMAGE_KEYS = ('image', 'cover', 'thumbnail', 'poster')
+SALE_KEYS = ('saleLink', 'ticketsLink', 'ticketLink', 'buyLink')
+# Адреса страниц событий; ссылки на другие страницы в данных списка не считаются карточками
+EVENT_PATH = '/events/'
+# Сколько страниц подряд из одних уже встреченных карточек считаются концом списка: за последней страницей
+# сайт может отдавать её повтор или подборку рекомендаций
+REPEATED_PAGES_LIMIT = 3
+
+
+class AsyncCultureParser(AsyncHttpParser):
     """Асинхронный парсер событий с сайта Culture.ru"""
 
     BASE_URL = 'https://www.culture.ru'
-    THEATER_URL = f'{BASE_URL}/afisha/tulskaya-oblast-tula/instituteType-theater'
-    HEADERS = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-    }
-    CONCURRENCY_LIMIT = 10  # Ограничение одновременных запросов
-
-    def __init__(self):
-        self.session = None
-        self.semaphore = asyncio.Semaphore(self.CONCURRENCY_LIMIT)
-
-    async def __aenter__(self):
-        self.session = aiohttp.ClientSession(headers=self.HEADERS)
-        return self
-
-    async def __aexit__(self, exc_type, exc, tb):
-        await self.session.close()
+    THEATER_URL = f'{BASE_URL}/afisha/{{city}}/instituteType-theater'
+    SOURCE_NAME = 'culture'
+    PAGINATED = True
+    # Всё, что читает _event_from_dom; данные Next.js в конце страницы не читаются, и поля берутся из разметки
+    STREAM_BLOCKS = (('div', 'Jds71'), ('div', 'xZmPc'), ('button', '_7V9xp'), ('div', 'ciUqX'), ('img', 'KRQ9s'),
+                     ('div', 'Heq3A'), ('div', 'C3QPv'))
 
     @staticmethod
     def _sanitize_filename(filename: str) -> str:
@@ -52,25 +63,13 @@ class AsyncCultureParser(BaseParser):
         filename = filename.replace('&nbsp;', ' ').replace('\xa0', ' ')
         return re.sub(r'[<>:"/\\|?*]', '', filename).strip()
 
-    async def _make_request(self, url: str) -> Optional[BeautifulSoup]:
-        """Выполняет асинхронный HTTP-запрос и возвращает BeautifulSoup объект"""
-        async with self.semaphore:
-            try:
-                async with self.session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    response.raise_for_status()
-                    html = await response.text()
-                    return BeautifulSoup(html, 'html.parser')
-            except Exception as e:
-                logger.error(f"Ошибка при запросе {url}: {str(e)}")
-                return None
-
     async def _parse_event_card(self, card: BeautifulSoup) -> Optional[Dict]:
         """Парсит карточку события с главной страницы"""
         try:
             title_tag = card.find('div', class_='p1Gbz')
             link_tag = card.find('a')
 
-            event_url = urljoin(self.BASE_URL, link_tag['href']) if link_tag else None
+            event_url = urljoin(self.base_url, link_tag['href']) if link_tag else None
             title = title_tag.get_text(strip=True) if title_tag else None
 
             return {
@@ -81,55 +80,152 @@ class AsyncCultureParser(BaseParser):
             logger.error(f"Ошибка при парсинге карточки события: {str(e)}")
             return None
 
-    async def _parse_event_page(self, event_url: str) -> Optional[Dict]:
-        """Парсит страницу отдельного события"""
-        try:
-            soup = await self._make_request(event_url)
-            if not soup:
-                return None
+    @staticmethod
+    def _image_url(src: Optional[str]) -> Optional[str]:
+        """Адрес изображения; у оптимизированных Next.js картинок - исходный адрес из параметра url"""
+        if not isinstance(src, str) or not src:
+            return None
+        if src.startswith('/_next/image?'):
+            return parse_qs(urlparse(src).query).get('url', [None])[0]
+        return src
 
-            # Основные данные
-            info_block = soup.find('div', class_='Jds71')
-            desc_block = soup.find('div', class_='xZmPc')
-            ticket_button = soup.find('button', class_='_7V9xp')
-            tags_container = soup.find('div', class_='ciUqX')
-
-            # Изображение
-            image_tag = soup.find('img', class_='KRQ9s')
-            image_url = None
-            if image_tag and 'src' in image_tag.attrs:
-                src = image_tag['src']
-                if src.startswith('/_next/image?'):
-                    # Извлекаем URL из параметра url
-                    from urllib.parse import parse_qs, urlparse
-                    parsed = urlparse(src)
-                    params = parse_qs(parsed.query)
-                    image_url = params.get('url', [None])[0]
-                else:
-                    image_url = src
+    @staticmethod
+    def _looks_like_event(item: Any) -> bool:
+        """Словарь похож на событие: есть название и дата или описание"""
+        return (isinstance(item, dict) and isinstance(first_value(item, TITLE_KEYS), str)
+                and (first_value(item, START_KEYS) is not None or first_value(item, DESCRIPTION_KEYS) is not None))
+
+    def _next_event(self, data: Dict, event_url: str) -> Optional[Dict]:
+        """Событие страницы в данных Next.js: по id или адресу из пути страницы"""
+        segments = {segment for segment in urlparse(event_url).path.split('/') if segment}
+        candidates = [item for item in iter_dicts(page_props(data)) if self._looks_like_event(item)]
+        for item in candidates:
+            keys = {str(item.get(key)) for key in ('id', '_id', 'name', 'slug') if item.get(key) is not None}
+            if keys & segments:
+                return item
+        # Без совпадения подходит только единственное событие страницы: иначе можно взять соседнее из блока «похожие»
+        return candidates[0] if len(candidates) == 1 else None
 
-            # Место проведения и адрес
-            place_name = soup.find('div', class_='Heq3A')
-            place_address = soup.find('div', class_='C3QPv')
+    @staticmethod
+    def _next_price(item: Dict) -> Optional[str]:
+        """Цена в том же виде, что на странице: 'Бесплатно' или 'N ₽'"""
+        if item.get('isFree') is True:
+            return 'Бесплатно'
+        price = first_value(item, ('price', 'minPrice', 'priceMin'))
+        if isinstance(price, dict):
+            price = first_value(price, ('min', 'from', 'value'))
+        if isinstance(price, (int, float)) and not isinstance(price, bool):
+            return 'Бесплатно' if price == 0 else f"{round(price)} ₽"
+        return price if isinstance(price, str) and price.strip() else None
 
-            # Обработка информации
-            age_limit, event_date, price = self._parse_info_block(info_block)
+    @staticmethod
+    def _next_age(item: Dict) -> Optional[str]:
+        """Возрастное ограничение в виде '12+'"""
+        age = first_value(item, AGE_KEYS)
+        if isinstance(age, (int, float)) and not isinstance(age, bool):
+            return f"{int(age)}+"
+        if isinstance(age, str) and age.strip():
+            return age.strip() if age.strip().endswith('+') else f"{age.strip()}+"
+        return None
+
+    def _next_image(self, item: Dict) -> Optional[str]:
+        """Адрес обложки события"""
+        image = first_value(item, IMAGE_KEYS)
+        if isinstance(image, dict):
+            image = first_value(image, ('url', 'src', 'path'))
+        return self._image_url(image)
+
+    def _event_from_next_data(self, html: str, event_url: str) -> Optional[Dict]:
+        """Поля события из __NEXT_DATA__ (None - данных нет или схема не распознана, нужен разбор DOM)"""
+        data = extract_next_data(html)
+        if not data:
+            return None
+        item = self._next_event(data, event_url)
+        if item is None:
+            return None
 
-            return {
-                'age_limit': age_limit,
-                'date': event_date,
-                'price': price if price else 'Бесплатно' if 'Бесплатно' in str(info_block) else None,
-                'ticket_link': event_url if ticket_button else None,
-                'full_description': desc_block.get_text(separator=' ', strip=True) if desc_block else None,
-                'tags': [tag.text.strip() for tag in
-                         tags_container.find_all('a', class_='Bgm4p')] if tags_container else [],
-                'image': image_url,
-                'place_name': place_name,
-                'place_address': place_address
-            }
+        description = plain_text(first_value(item, DESCRIPTION_KEYS))
+        event_date = format_date_range(to_datetime(first_value(item, START_KEYS)),
+                                       to_datetime(first_value(item, END_KEYS)))
+        if not description and not event_date:
+            return None
+
+        places = first_value(item, PLACE_KEYS)
+        place = places[0] if isinstance(places, list) and places else places
+        place_name = names(place)[0] if names(place) else None
+        place_address = None
+        if isinstance(place, dict):
+            address = first_value(place, ADDRESS_KEYS)
+            place_address = first_value(address, ('fullAddress', 'street', 'value')) if isinstance(address, dict) \
+                else address
+
+        sale_link = first_value(item, SALE_KEYS)
+        return {
+            'age_limit': self._next_age(item),
+            'date': event_date,
+            'price': self._next_price(item),
+            'ticket_link': event_url if sale_link or item.get('isBuyable') else None,
+            'full_description': description,
+            'tags': names(first_value(item, TAG_KEYS)),
+            'image': self._next_image(item),
+            'place_name': place_name,
+            'place_address': place_address if isinstance(place_address, str) else None
+        }
+
+    def _event_from_dom(self, soup: BeautifulSoup, event_url: str) -> Dict:
+        """Поля события из разметки страницы"""
+        # Основные данные
+        info_block = soup.find('div', class_='Jds71')
+        desc_block = soup.find('div', class_='xZmPc')
+        ticket_button = soup.find('button', class_='_7V9xp')
+        tags_container = soup.find('div', class_='ciUqX')
+
+        # Изображение
+        image_tag = soup.find('img', class_='KRQ9s')
+        image_url = self._image_url(image_tag.get('src')) if image_tag else None
+
+        # Место проведения и адрес
+        place_name = soup.find('div', class_='Heq3A')
+        place_address = soup.find('div', class_='C3QPv')
+
+        # Обработка информации
+        age_limit, event_date, price = self._parse_info_block(info_block)
+
+        return {
+            'age_limit': age_limit,
+            'date': event_date,
+            'price': price if price else 'Бесплатно' if 'Бесплатно' in str(info_block) else None,
+            'ticket_link': event_url if ticket_button else None,
+            'full_description': desc_block.get_text(separator=' ', strip=True) if desc_block else None,
+            'tags': [tag.text.strip() for tag in
+                     tags_container.find_all('a', class_='Bgm4p')] if tags_container else [],
+            'image': image_url,
+            'place_name': place_name.get_text(strip=True) if place_name else None,
+            'place_address': place_address.get_text(strip=True) if place_address else None
+        }
+
+    async def _parse_event_page(self, event_url: str) -> Optional[Dict]:
+        """Парсит страницу отдельного события: сначала встроенные данные Next.js, при их отсутствии - разметку"""
+        html = await self._fetch_html(event_url, detail=True)
+        if html is None:
+            return None
+
+        soup = None
+        started = time.perf_counter()
+        try:
+            page_data = self._event_from_next_data(html, event_url)
+            if page_data is None:
+                soup = BeautifulSoup(html, 'html.parser')
+                page_data = self._event_from_dom(soup, event_url)
+            self.page_stats.add_parse(time.perf_counter() - started, fast_path=soup is None)
+            return page_data
         except Exception as e:
             logger.error(f"Ошибка при парсинге страницы события {event_url}: {str(e)}")
             return None
+        finally:
+            # Дерево страницы больше не нужно: освобождаем его сразу, не дожидаясь сборщика мусора
+            if soup is not None:
+                soup.decompose()
 
     @staticmethod
     def _parse_info_block(info_block: Optional[BeautifulSoup]) -> tuple:
@@ -181,29 +277,13 @@ class AsyncCultureParser(BaseParser):
 
         return age_limit, event_date, price
 
-    async def _save_event(self, event: EventData) -> bool:
-        """Асинхронно сохраняет данные о событии в JSON файл"""
-        try:
-            if not event.title:
-                return False
-
-            safe_title = self._sanitize_filename(event.title)
-            folder_path = os.path.join('../spectacles', 'culture', safe_title)
-            os.makedirs(folder_path, exist_ok=True)
-
-            json_path = os.path.join(folder_path, 'event_details.json')
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(event.__dict__, f, ensure_ascii=False, indent=4)
-
-            logger.info(f"Сохранено событие: {event.title}")
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении события {event.title}: {str(e)}")
-            return False
-
     async def _process_single_event(self, card_data: Dict) -> Optional[EventData]:
         """Асинхронно обрабатывает одно событие"""
         try:
+            handled, event = self._event_without_download(card_data)
+            if handled:
+                return event
+
             # Получаем данные со страницы события
             page_data = await self._parse_event_page(card_data['event_url'])
             if not page_data:
@@ -224,64 +304,133 @@ class AsyncCultureParser(BaseParser):
             )
 
             # Немедленно сохраняем событие
-            await self._save_event(event)
-            return event
+            return self._store_event(event, card_data)
         except Exception as e:
             logger.error(f"Ошибка при обработке события: {str(e)}")
             return None
 
-    async def parse_page_events(self, page: int) -> List[EventData]:
-        """Парсит события с одной страницы"""
-        url = f'{self.THEATER_URL}?page={page}'
-        soup = await self._make_request(url)
-        if not soup:
-            return []
-
-        # Проверка на последнюю страницу
-        no_events = soup.find('div', class_='Lhfwa')
-        if no_events and "К сожалению, событий по вашему запросу не найдено" in no_events.text:
-            return []
-
-        event_cards = soup.find_all('div', class_='CHPy6')
-        if not event_cards:
-            return []
-
-        # Создаем задачи для обработки карточек событий
-        tasks = []
-        for card in event_cards:
-            card_data = await self._parse_event_card(card)
-            if card_data and card_data.get('event_url'):
-                tasks.append(self._process_single_event(card_data))
-
-        # Ожидаем завершения всех задач
-        results = await asyncio.gather(*tasks)
-        return [event for event in results if event]
+    def listing_url(self, page: int = 1, category: Optional[str] = None) -> str:
+        """Адрес страницы списка событий"""
+        return f'{self.theater_url}?page={page}'
+
+    def _cards_from_next_data(self, html: str) -> Optional[List[Dict]]:
+        """Карточки списка из __NEXT_DATA__: самый длинный список событий со ссылками на их страницы"""
+        data = extract_next_data(html)
+        if not data:
+            return None
+
+        best: List[Dict] = []
+        for items in iter_lists(page_props(data)):
+            cards = []
+            for item in items:
+                if not isinstance(item, dict) or not isinstance(first_value(item, TITLE_KEYS), str):
+                    continue
+                url = first_value(item, URL_KEYS)
+                if isinstance(url, str) and EVENT_PATH in url:
+                    cards.append({'title': first_value(item, TITLE_KEYS).strip(),
+                                  'event_url': urljoin(self.base_url, url)})
+            if len(cards) > len(best):
+                best = cards
+
+        unique = {card['event_url']: card for card in best}
+        return list(unique.values()) or None
+
+    async def parse_listing(self, page: int = 1, category: Optional[str] = None) -> Optional[List[Dict]]:
+        """Карточки событий с одной страницы (None, если страницу не удалось загрузить)"""
+        cards = self._checkpointed_cards(page)
+        if cards is not None:
+            return cards
+
+        html = await self._fetch_html(self.listing_url(page))
+        if html is None:
+            return None
+
+        cards = self._cards_from_next_data(html)
+        if cards is None:
+            soup = BeautifulSoup(html, 'html.parser')
+
+            # Проверка на последнюю страницу
+            no_events = soup.find('div', class_='Lhfwa')
+            if no_events and "К сожалению, событий по вашему запросу не найдено" in no_events.text:
+                soup.decompose()
+                return []
+
+            cards = []
+            for card in soup.find_all('div', class_='CHPy6'):
+                card_data = await self._parse_event_card(card)
+                if card_data and card_data.get('event_url'):
+                    cards.append(card_data)
+            soup.decompose()
+
+        self._checkpoint_cards(page, cards)
+        return cards
+
+    async def parse_page_events(self, page: int) -> Optional[List[EventData]]:
+        """Парсит события с одной страницы (None - страниц больше нет)"""
+        cards = await self.parse_listing(page)
+        if not cards:
+            return None
+
+        # Карточки страницы обрабатываются параллельно, но не больше concurrency одновременно
+        return await process_bounded(self._new_cards(cards), self._process_single_event, self.concurrency)
+
+    async def _parse_prioritized_events(self) -> List[EventData]:
+        """Сначала читает все страницы списка, затем загружает события в порядке приоритета"""
+        cards = []
+        page = 1
+        repeated_pages = 0
+        while not self._time_is_up():
+            page_cards = await self.parse_listing(page)
+            if not page_cards:
+                break
+            new_cards = self._new_cards(page_cards)
+            cards.extend(new_cards)
+            page += 1
+            repeated_pages = 0 if new_cards else repeated_pages + 1
+            if repeated_pages >= REPEATED_PAGES_LIMIT:
+                logger.info(f"{repeated_pages} страниц подряд без новых событий, список закончился")
+                break
+
+        logger.info(f"Найдено {len(cards)} событий на {page - 1} страницах")
+        events = await process_bounded(self._prioritized(cards), self._process_single_event, self.concurrency)
+        logger.info(f"Парсинг завершен. Успешно обработано {len(events)} событий")
+        return events
 
     async def parse_events(self) -> List[EventData]:
         """Основной асинхронный метод парсинга событий"""
         logger.info("Начало парсинга событий")
+        if self.prioritize:
+            return await self._parse_prioritized_events()
+
         page = 1
         total_processed = 0
         all_events = []
+        repeated_pages = 0
+
+        while not self._time_is_up():
+            seen_before = len(self._seen_urls)
+            events = await self.parse_page_events(page)
+            if events is None:
+                break
 
-        async with self:
-            while True:
-                events = await self.parse_page_events(page)
-                if not events:
-                    break
+            all_events.extend(events)
+            total_processed += len(events)
+            logger.info(f"Обработано страниц: {page}, событий: {total_processed}")
+            page += 1
 
-                all_events.extend(events)
-                total_processed += len(events)
-                logger.info(f"Обработано страниц: {page}, событий: {total_processed}")
-                page += 1
+            # Страница из одних уже обработанных событий - ещё не конец списка, несколько таких подряд - конец
+            repeated_pages = 0 if len(self._seen_urls) > seen_before else repeated_pages + 1
+            if repeated_pages >= REPEATED_PAGES_LIMIT:
+                logger.info(f"{repeated_pages} страниц подряд без новых событий, список закончился")
+                break
 
         logger.info(f"Парсинг завершен. Успешно обработано {total_processed} событий")
         return all_events
 
 
 async def main():
-    parser = AsyncCultureParser()
-    await parser.parse_events()
+    async with AsyncCultureParser() as parser:
+        await parser.parse_events()
 
 
 if __name__ == "__main__":
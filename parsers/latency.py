@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple, Type, TypeVar
+from urllib.parse import urlsplit
+import logging
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Таймаут, пока по хосту не набралось достаточно замеров, сек.
+DEFAULT_TIMEOUT = 10.0
+MIN_TIMEOUT = 2.0
+MAX_TIMEOUT = 30.0
+# Таймаут - столько p99 времени ответа хоста
+TIMEOUT_FACTOR = 3.0
+# Сколько последних ответов хоста учитывается и сколько нужно для оценки
+WINDOW = 200
+MIN_SAMPLES = 20
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Перцентиль по отсортированным замерам (ближайший ранг)"""
+    index = min(int(fraction * len(samples)), len(samples) - 1)
+    return samples[index]
+
+
+@dataclass
+class HostStats:
+    """Время ответа хоста и счётчики дублирующих запросов"""
+    host: str
+    samples: int
+    p50: Optional[float]
+    p95: Optional[float]
+    timeout: float
+    hedges: int
+    hedge_wins: int
+
+
+class LatencyTracker:
+    """Замеры времени ответа по хостам: адаптивный таймаут и задержка дублирующего запроса"""
+
+    def __init__(self, window: int = WINDOW, min_samples: int = MIN_SAMPLES):
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self._hedges: Dict[str, int] = defaultdict(int)
+        self._hedge_wins: Dict[str, int] = defaultdict(int)
+
+    @staticmethod
+    def host(url: str) -> str:
+        """Хост адреса: замеры ведутся по нему"""
+        return urlsplit(url).netloc
+
+    def observe(self, host: str, seconds: float):
+        """Запоминает время ответа (для истёкшего таймаута - сам таймаут)"""
+        with self._lock:
+            self._samples[host].append(seconds)
+
+    def _percentile(self, host: str, fraction: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(host, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return percentile(samples, fraction)
+
+    def timeout(self, host: str) -> float:
+        """Таймаут запроса к хосту: кратное p99, пока замеров мало - DEFAULT_TIMEOUT"""
+        p99 = self._percentile(host, 0.99)
+        if p99 is None:
+            return DEFAULT_TIMEOUT
+        return min(max(p99 * TIMEOUT_FACTOR, MIN_TIMEOUT), MAX_TIMEOUT)
+
+    def hedge_delay(self, host: str) -> Optional[float]:
+        """Через сколько секунд без ответа отправлять дублирующий запрос (p95; None - замеров мало)"""
+        return self._percentile(host, 0.95)
+
+    def stats(self) -> List[HostStats]:
+        """Сводка по всем хостам"""
+        with self._lock:
+            hosts = sorted(set(self._samples) | set(self._hedges))
+        result = []
+        for host in hosts:
+            with self._lock:
+                samples = sorted(self._samples.get(host, ()))
+            result.append(HostStats(
+                host=host,
+                samples=len(samples),
+                p50=percentile(samples, 0.5) if samples else None,
+                p95=percentile(samples, 0.95) if samples else None,
+                timeout=self.timeout(host),
+                hedges=self._hedges[host],
+                hedge_wins=self._hedge_wins[host],
+            ))
+        return result
+
+    def log_stats(self):
+        """Выводит время ответа хостов и долю выигравших дублирующих запросов"""
+        for stats in self.stats():
+            if not stats.samples:
+                continue
+            line = (f"Хост {stats.host}: ответов {stats.samples}, p50 {stats.p50:.2f} с, p95 {stats.p95:.2f} с, "
+                    f"таймаут {stats.timeout:.1f} с")
+            if stats.hedges:
+                line += f", дублирующих запросов {stats.hedges}, из них быстрее основного {stats.hedge_wins}"
+            logger.info(line)
+
+    async def _timed(self, host: str, fetch: Callable[[float], Awaitable[T]], timeout: float) -> T:
+        """Одна попытка запроса с замером времени"""
+        started = time.monotonic()
+        try:
+            result = await fetch(timeout)
+        except asyncio.TimeoutError:
+            # Таймауты тоже учитываются: иначе у замедлившегося хоста таймаут никогда не вырастет
+            self.observe(host, timeout)
+            raise
+        except asyncio.CancelledError:
+            # Проигравший дублирующему запрос отвечал бы не быстрее, чем уже ждал: без этого замера
+            # в окне остаются только быстрые ответы, и p95/p99 с таймаутом сползают вниз
+            self.observe(host, time.monotonic() - started)
+            raise
+        self.observe(host, time.monotonic() - started)
+        return result
+
+    async def fetch(self, url: str, fetch: Callable[[float], Awaitable[T]], hedge: bool = False) -> T:
+        """Выполняет fetch(таймаут); с hedge после p95 без ответа дублирует запрос и берёт первый успешный ответ"""
+        host = self.host(url)
+        timeout = self.timeout(host)
+        primary = asyncio.ensure_future(self._timed(host, fetch, timeout))
+        attempts = [primary]
+        try:
+            delay = self.hedge_delay(host) if hedge else None
+            if delay is not None:
+                done, _ = await asyncio.wait(attempts, timeout=delay)
+                if not done:
+                    with self._lock:
+                        self._hedges[host] += 1
+                    attempts.append(asyncio.ensure_future(self._timed(host, fetch, timeout)))
+
+            pending = set(attempts)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        if attempt is not primary:
+                            with self._lock:
+                                self._hedge_wins[host] += 1
+                        return attempt.result()
+                    error = attempt.exception()
+            raise error
+        finally:
+            # Проигравший запрос больше не нужен
+            for attempt in attempts:
+                attempt.cancel()
+
+    def call(self, url: str, fetch: Callable[[float], T],
+             timeout_errors: Tuple[Type[BaseException], ...] = (TimeoutError,)) -> T:
+        """Синхронный вариант: только адаптивный таймаут, без дублирующих запросов"""
+        host = self.host(url)
+        timeout = self.timeout(host)
+        started = time.monotonic()
+        try:
+            result = fetch(timeout)
+        except timeout_errors:
+            self.observe(host, timeout)
+            raise
+        self.observe(host, time.monotonic() - started)
+        return result
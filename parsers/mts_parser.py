@@ -2,12 +2,15 @@ import os
 import requests
 from bs4 import BeautifulSoup
 import json
-from urllib.parse import urljoin, unquote
+from urllib.parse import urljoin, unquote, urlsplit
 import re
+import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, Optional, List
 import logging
 from parsers.base_parser import BaseParser, EventData
+from parsers.next_data import extract_next_data, first_value, format_date, iter_lists, names, page_props, to_datetime
+from parsers.single_flight import SingleFlight
 
 # Настройка логирования
 logging.basicConfig(
@@ -20,30 +23,74 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Сколько страниц списка загружается одновременно
+PAGE_WINDOW = 4
+
+# Ключи полей карточки в данных Next.js
+TITLE_KEYS = ('title', 'name')
+URL_KEYS = ('url', 'link', 'href')
+PRICE_KEYS = ('minPrice', 'priceFrom', 'price')
+DATE_KEYS = ('date', 'startDate', 'eventDate', 'dateTime')
+VENUE_KEYS = ('venue', 'place')
+
 
 class MTSParser(BaseParser):
     """Парсер событий с сайта MTS Live"""
 
     BASE_URL = 'https://live.mts.ru'
-    THEATER_URL = f'{BASE_URL}/tula/collections/theater'
-    HEADERS = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-    }
-
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update(self.HEADERS)
-
-    def _make_request(self, url: str) -> Optional[BeautifulSoup]:
-        """Выполняет HTTP-запрос и возвращает BeautifulSoup объект"""
+    THEATER_URL = f'{BASE_URL}/{{city}}/collections/theater'
+    SOURCE_NAME = 'mts'
+    CONCURRENCY_LIMIT = 4
+    PAGINATED = True
+
+    def __init__(self, concurrency: Optional[int] = None, session: Optional[requests.Session] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.concurrency = concurrency or self.CONCURRENCY_LIMIT
+        # Общая сессия переиспользует соединения с live.mts.ru между городами
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.HEADERS)
+        self.session = session
+        self._in_flight = SingleFlight()
+        # Номер сборки сайта из первой страницы: с ним следующие страницы берутся в JSON (None - только HTML)
+        self._build_id: Optional[str] = None
+
+    def _fetch_html(self, url: str, detail: bool = False) -> Optional[str]:
+        """Загружает страницу; одновременные запросы одного адреса разделяют одну загрузку"""
+        if self.replay:
+            return self._replayed_html(url)
+        return self._in_flight.do(url, lambda: self._download(url, detail))
+
+    def _download(self, url: str, detail: bool = False) -> Optional[str]:
+        """Загружает страницу из сети и сохраняет её в архив"""
         try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
-            return BeautifulSoup(response.text, 'html.parser')
+            html = self.latency.call(url, lambda timeout: self._get_text(url, timeout, detail), (requests.Timeout,))
+            self._archive_html(url, html)
+            return html
         except requests.RequestException as e:
             logger.error(f"Ошибка при запросе {url}: {str(e)}")
             return None
 
+    def _get_text(self, url: str, timeout: float, detail: bool = False) -> str:
+        """Один HTTP-запрос страницы с заданным таймаутом"""
+        response = self.session.get(url, timeout=timeout)
+        response.raise_for_status()
+        if detail:
+            self.page_stats.add_download(len(response.content))
+        return response.text
+
+    def _make_request(self, url: str, detail: bool = False) -> Optional[BeautifulSoup]:
+        """Выполняет HTTP-запрос и возвращает BeautifulSoup объект"""
+        html = self._fetch_html(url, detail)
+        if html is None:
+            return None
+
+        started = time.perf_counter()
+        soup = BeautifulSoup(html, 'html.parser')
+        if detail:
+            self.page_stats.add_parse(time.perf_counter() - started)
+        return soup
+
     @staticmethod
     def _sanitize_filename(filename: str) -> str:
         """Очищает название от недопустимых символов для файловой системы"""
@@ -62,7 +109,7 @@ class MTSParser(BaseParser):
             venue_tag = card.find('a', attrs={'aria-disabled': 'false'})
 
             event_link = title_tag.get('href') if title_tag else None
-            full_event_url = urljoin(self.BASE_URL, event_link) if event_link else None
+            full_event_url = urljoin(self.base_url, event_link) if event_link else None
 
             return {
                 'title': title_tag.get('title') if title_tag else None,
@@ -77,8 +124,9 @@ class MTSParser(BaseParser):
 
     def _parse_event_page(self, event_url: str) -> Optional[Dict]:
         """Парсит страницу отдельного события"""
+        soup = None
         try:
-            soup = self._make_request(event_url)
+            soup = self._make_request(event_url, detail=True)
             if not soup:
                 return None
 
@@ -109,6 +157,10 @@ class MTSParser(BaseParser):
         except Exception as e:
             logger.error(f"Ошибка при парсинге страницы события {event_url}: {str(e)}")
             return None
+        finally:
+            # Дерево страницы больше не нужно: освобождаем его сразу, не дожидаясь сборщика мусора
+            if soup is not None:
+                soup.decompose()
 
     @staticmethod
     def _generate_tags(age_limit: Optional[str], event_url: str) -> List[str]:
@@ -132,56 +184,152 @@ class MTSParser(BaseParser):
 
         return tags
 
-    def _save_event(self, event: EventData) -> bool:
-        """Сохраняет данные о событии в JSON файл"""
-        try:
-            if not event.title:
-                return False
+    def listing_url(self, page: int = 1, category: Optional[str] = None) -> str:
+        """Адрес страницы списка; первая страница - без номера"""
+        return self.theater_url if page == 1 else f"{self.theater_url}?page={page}"
+
+    def data_url(self, page: int) -> Optional[str]:
+        """JSON-данные страницы списка, из которых Next.js строит её в браузере (None - сборка неизвестна)"""
+        if not self._build_id:
+            return None
+        return f"{self.base_url}/_next/data/{self._build_id}{urlsplit(self.theater_url).path}.json?page={page}"
 
-            safe_title = self._sanitize_filename(event.title)
-            folder_path = os.path.join('../spectacles', 'mts', safe_title)
-            os.makedirs(folder_path, exist_ok=True)
+    @staticmethod
+    def _card_price(item: Dict) -> str:
+        """Цена карточки в том же виде, что в HTML-списке"""
+        price = first_value(item, PRICE_KEYS)
+        if isinstance(price, dict):
+            price = first_value(price, ('min', 'from', 'value'))
+        if isinstance(price, (int, float)) and not isinstance(price, bool):
+            return 'Бесплатно' if price == 0 else f"от {round(price)} ₽"
+        return price.strip() if isinstance(price, str) and price.strip() else "Цена не указана"
+
+    def _cards_from_data(self, data: Dict) -> Optional[List[Dict]]:
+        """Карточки из данных Next.js: самый длинный список событий со ссылками (None - список не найден)"""
+        best: List[Dict] = []
+        for items in iter_lists(page_props(data)):
+            cards = []
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                title = first_value(item, TITLE_KEYS)
+                url = first_value(item, URL_KEYS)
+                date = first_value(item, DATE_KEYS)
+                # Без даты это не событие, а, например, пункт меню со ссылкой
+                if not isinstance(title, str) or not isinstance(url, str) or '/' not in url or date is None:
+                    continue
+                moment = to_datetime(date)
+                venue = names(first_value(item, VENUE_KEYS))
+                cards.append({
+                    'title': title.strip(),
+                    'price': self._card_price(item),
+                    'date': format_date(moment) if moment else date if isinstance(date, str) else None,
+                    'venue': venue[0] if venue else None,
+                    'event_url': urljoin(self.base_url, url)
+                })
+            if len(cards) > len(best):
+                best = cards
+        return best or None
+
+    def _json_listing(self, page: int) -> Optional[List[Dict]]:
+        """Карточки страницы из JSON-данных Next.js (None - данных нет, нужен HTML)"""
+        url = self.data_url(page)
+        text = self._fetch_html(url) if url else None
+        if text is None:
+            return None
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return None
+        return self._cards_from_data(data) if isinstance(data, dict) else None
 
-            json_path = os.path.join(folder_path, 'event_details.json')
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(event.__dict__, f, ensure_ascii=False, indent=4)
+    def _html_listing(self, page: int) -> Optional[List[Dict]]:
+        """Карточки страницы из HTML: из встроенных данных Next.js или из разметки"""
+        html = self._fetch_html(self.listing_url(page))
+        if html is None:
+            return None
 
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении события {event.title}: {str(e)}")
-            return False
+        data = extract_next_data(html)
+        if data:
+            self._build_id = data.get('buildId') or self._build_id
+            cards = self._cards_from_data(data)
+            if cards is not None:
+                return cards
+
+        soup = BeautifulSoup(html, 'html.parser')
+        cards = []
+        for card in soup.find_all('div', class_='AnnouncementPreview_description__AVWrS'):
+            card_data = self._parse_event_card(card)
+            if card_data and card_data.get('event_url'):
+                cards.append(card_data)
+        soup.decompose()
+        return cards
+
+    def parse_listing(self, page: int = 1, category: Optional[str] = None) -> Optional[List[Dict]]:
+        """Карточки событий со страницы списка (None, если страницу не удалось загрузить)"""
+        cards = self._checkpointed_cards(page)
+        if cards is not None:
+            return cards
+
+        # Первая страница всегда в HTML: из неё берётся номер сборки для JSON-данных следующих страниц
+        cards = self._json_listing(page) if page > 1 else None
+        if cards is None:
+            cards = self._html_listing(page)
+        if cards is None:
+            return None
 
-    def parse_events(self, max_workers: int = 4) -> List[EventData]:
+        self._checkpoint_cards(page, cards)
+        return cards
+
+    def _listing_cards(self) -> List[Dict]:
+        """Карточки всех страниц списка: страницы после первой загружаются окнами по PAGE_WINDOW"""
+        cards = []
+        seen = set()
+        page = 1
+        window = 1
+        with ThreadPoolExecutor(max_workers=PAGE_WINDOW) as executor:
+            while not self._time_is_up():
+                pages = range(page, page + window)
+                for number, page_cards in zip(pages, executor.map(self.parse_listing, pages)):
+                    if page_cards is None:
+                        logger.warning(f"Страница {number} списка не загрузилась, дальше список не читается")
+                        return cards
+                    # За последней страницей сайт отдаёт пустой список или повторяет уже показанные события
+                    new_cards = [card for card in page_cards if card['event_url'] not in seen]
+                    if not new_cards:
+                        logger.info(f"Список: {len(cards)} событий на {number - 1} страницах")
+                        return cards
+                    seen.update(card['event_url'] for card in new_cards)
+                    cards.extend(new_cards)
+                page += window
+                window = PAGE_WINDOW
+        logger.warning(f"Время вышло на странице {page} списка, найдено {len(cards)} событий")
+        return cards
+
+    def parse_events(self, max_workers: Optional[int] = None) -> List[EventData]:
         """Основной метод парсинга событий"""
         logger.info("Начало парсинга событий")
 
-        # Получаем главную страницу
-        soup = self._make_request(self.THEATER_URL)
-        if not soup:
+        # Собираем карточки событий со всех страниц списка
+        cards = self._prioritized(self._new_cards(self._listing_cards()))
+        if not cards:
             return []
-
-        # Собираем все карточки событий
-        event_cards = soup.find_all('div', class_='AnnouncementPreview_description__AVWrS')
-        logger.info(f"Найдено {len(event_cards)} событий для парсинга")
+        logger.info(f"Найдено {len(cards)} событий для парсинга")
 
         events = []
 
         # Используем ThreadPoolExecutor для ускорения парсинга
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        with ThreadPoolExecutor(max_workers=max_workers or self.concurrency) as executor:
             futures = []
 
-            for card in event_cards:
-                card_data = self._parse_event_card(card)
-                if not card_data or not card_data.get('event_url'):
-                    continue
-
+            # После лимита времени карточки не загружаются, а переносятся из прошлого поколения
+            for card_data in cards:
                 futures.append(executor.submit(self._process_single_event, card_data))
 
             for future in as_completed(futures):
                 event = future.result()
                 if event:
                     events.append(event)
-                    self._save_event(event)
 
         logger.info(f"Парсинг завершен. Успешно обработано {len(events)} событий")
         return events
@@ -189,6 +337,10 @@ class MTSParser(BaseParser):
     def _process_single_event(self, card_data: Dict) -> Optional[EventData]:
         """Обрабатывает одно событие"""
         try:
+            handled, event = self._event_without_download(card_data)
+            if handled:
+                return event
+
             # Получаем данные со страницы события
             page_data = self._parse_event_page(card_data['event_url'])
             if not page_data:
@@ -217,7 +369,7 @@ class MTSParser(BaseParser):
             # Добавляем тег на основе даты (можно расширить логику)
             event.tags.append('Событие месяца')
 
-            return event
+            return self._store_event(event, card_data)
         except Exception as e:
             logger.error(f"Ошибка при обработке события: {str(e)}")
             return None
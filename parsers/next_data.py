@@ -0,0 +1,120 @@
+import html as html_lib
+import json
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from catalog.fields import MONTHS
+
+# Данные страницы Next.js: JSON в <script id="__NEXT_DATA__">, без построения DOM
+NEXT_DATA_RE = re.compile(r'<script[^>]*\bid=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', re.DOTALL)
+TAG_RE = re.compile(r'<[^>]+>')
+
+# Даты событий показываются по московскому времени (все города каталога в этом поясе)
+MSK = timezone(timedelta(hours=3))
+MONTH_NAMES = {number: name for name, number in MONTHS.items()}
+
+
+def extract_next_data(html: str) -> Optional[Dict]:
+    """Модель страницы из __NEXT_DATA__ (None - страница без неё или JSON повреждён)"""
+    match = NEXT_DATA_RE.search(html)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(1))
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def page_props(data: Dict) -> Any:
+    """Данные, которые страница получила с сервера"""
+    props = data.get('props')
+    if isinstance(props, dict) and 'pageProps' in props:
+        return props['pageProps']
+    return data
+
+
+def iter_dicts(value: Any) -> Iterator[Dict]:
+    """Все словари вложенной структуры в порядке обхода в глубину"""
+    stack = [value]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            yield current
+            stack.extend(reversed(list(current.values())))
+        elif isinstance(current, list):
+            stack.extend(reversed(current))
+
+
+def iter_lists(value: Any) -> Iterator[List]:
+    """Все списки вложенной структуры"""
+    stack = [value]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            stack.extend(current.values())
+        elif isinstance(current, list):
+            yield current
+            stack.extend(current)
+
+
+def first_value(data: Dict, keys: Sequence[str]) -> Any:
+    """Значение первого непустого ключа из keys"""
+    for key in keys:
+        value = data.get(key)
+        if value not in (None, '', [], {}):
+            return value
+    return None
+
+
+def plain_text(value: Any) -> Optional[str]:
+    """Текст без HTML-разметки и лишних пробелов"""
+    if not isinstance(value, str):
+        return None
+    text = ' '.join(html_lib.unescape(TAG_RE.sub(' ', value)).split())
+    return text or None
+
+
+def to_datetime(value: Any) -> Optional[datetime]:
+    """Момент времени из метки в мс/с или ISO-строки, по московскому времени"""
+    try:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            # Метки больше 10^11 - миллисекунды
+            seconds = value / 1000 if value > 10 ** 11 else value
+            return datetime.fromtimestamp(seconds, MSK)
+        if isinstance(value, str) and value:
+            moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            return moment.astimezone(MSK) if moment.tzinfo else moment
+    except (ValueError, OverflowError, OSError):
+        return None
+    return None
+
+
+def format_date(moment: datetime, with_time: bool = True) -> str:
+    """Дата в виде, который показывает сайт: '7 апреля 2025, 19:00'"""
+    text = f"{moment.day} {MONTH_NAMES[moment.month]} {moment.year}"
+    if with_time and (moment.hour or moment.minute):
+        text += f", {moment.hour:02d}:{moment.minute:02d}"
+    return text
+
+
+def format_date_range(start: Optional[datetime], end: Optional[datetime]) -> Optional[str]:
+    """Разовое событие - одна дата, длящееся - 'начало - конец', как у текстовых дат сайта"""
+    if start and end and end.date() != start.date():
+        return f"{format_date(start, with_time=False)} - {format_date(end, with_time=False)}"
+    moment = start or end
+    return format_date(moment) if moment else None
+
+
+def names(value: Any, keys: Sequence[str] = ('title', 'name')) -> List[str]:
+    """Названия из списка строк или словарей"""
+    if isinstance(value, dict):
+        value = [value]
+    if not isinstance(value, list):
+        return []
+    result = []
+    for item in value:
+        name = item if isinstance(item, str) else first_value(item, keys) if isinstance(item, dict) else None
+        if isinstance(name, str) and name.strip():
+            result.append(name.strip())
+    return result
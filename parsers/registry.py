@@ -0,0 +1,104 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+import logging
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from parsers.base_parser import BaseParser, EventData
+from parsers.afisha_parser import AsyncAfishaParser
+from parsers.culture_parser import AsyncCultureParser
+from parsers.mts_parser import MTSParser
+
+logger = logging.getLogger(__name__)
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+# Одновременных соединений с одним хостом на все парсеры общих клиентов вместе
+HOST_CONCURRENCY = 20
+
+# Общие HTTP-клиенты обхода: для асинхронных и для синхронных парсеров
+SharedSessions = Tuple[aiohttp.ClientSession, requests.Session]
+
+
+@dataclass
+class ParserSpec:
+    """Описание источника событий для планировщика"""
+    name: str
+    factory: Callable[..., BaseParser]
+    concurrency: int
+    refresh_interval: float = HOUR  # Как часто перечитывать списки событий, сек.
+    detail_max_age: Optional[float] = DAY  # Как долго страница события считается актуальной, сек.
+
+    @property
+    def is_async(self) -> bool:
+        """Парсер асинхронный и работает поверх aiohttp"""
+        return hasattr(self.factory, '__aenter__')
+
+    def create(self, sessions: Optional[SharedSessions] = None, **kwargs) -> BaseParser:
+        """Создаёт парсер с параметрами источника, подключая общий HTTP-клиент подходящего типа"""
+        if sessions is not None:
+            kwargs['session'] = sessions[0] if self.is_async else sessions[1]
+        return self.factory(
+            concurrency=self.concurrency,
+            detail_max_age=self.detail_max_age,
+            **kwargs
+        )
+
+
+PARSER_REGISTRY: Dict[str, ParserSpec] = {
+    spec.name: spec for spec in (
+        ParserSpec(name=AsyncAfishaParser.SOURCE_NAME, factory=AsyncAfishaParser, concurrency=10),
+        ParserSpec(name=AsyncCultureParser.SOURCE_NAME, factory=AsyncCultureParser, concurrency=10),
+        ParserSpec(name=MTSParser.SOURCE_NAME, factory=MTSParser, concurrency=4),
+    )
+}
+
+
+def get_specs(names: Optional[List[str]] = None) -> List[ParserSpec]:
+    """Возвращает описания источников по именам (все источники, если имена не заданы)"""
+    if not names:
+        return list(PARSER_REGISTRY.values())
+
+    unknown = [name for name in names if name not in PARSER_REGISTRY]
+    if unknown:
+        raise ValueError(f"Неизвестные источники: {', '.join(unknown)}")
+    return [PARSER_REGISTRY[name] for name in names]
+
+
+async def run_parser(parser: BaseParser) -> List[EventData]:
+    """Запускает парсер независимо от того, асинхронный он или синхронный"""
+    if hasattr(parser, '__aenter__'):
+        async with parser:
+            return await parser.parse_events()
+
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(None, parser.parse_events)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        # Отмена не останавливает поток: парсер перестаёт брать новую работу, а начатые загрузки
+        # дожидаются, чтобы поток не писал в папку поколения, пока её публикуют
+        parser.deadline = time.monotonic()
+        logger.info(f"Источник {parser.SOURCE_NAME}: ожидание загрузок, начатых до лимита времени")
+        try:
+            await future
+        except Exception as e:
+            logger.error(f"Источник {parser.SOURCE_NAME}: ошибка после лимита времени: {str(e)}")
+        raise
+
+
+@asynccontextmanager
+async def shared_sessions() -> AsyncIterator[SharedSessions]:
+    """Общие HTTP-клиенты для всех парсеров обхода"""
+    # Один пул соединений на всех: нагрузку на хост ограничивает limit_per_host, а не число парсеров
+    connector = aiohttp.TCPConnector(limit_per_host=HOST_CONCURRENCY)
+    async with aiohttp.ClientSession(headers=BaseParser.HEADERS, connector=connector) as async_session:
+        with requests.Session() as sync_session:
+            sync_session.headers.update(BaseParser.HEADERS)
+            adapter = HTTPAdapter(pool_maxsize=HOST_CONCURRENCY)
+            sync_session.mount('https://', adapter)
+            sync_session.mount('http://', adapter)
+            yield async_session, sync_session
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict
+
+
+class AsyncSingleFlight:
+    """Объединяет одновременные асинхронные вызовы с одним ключом: выполняется один, результат получают все"""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(call())
+            self._calls[key] = future
+            # Завершённый вызов забывается: следующий запрос адреса снова идёт в сеть
+            future.add_done_callback(lambda _: self._calls.pop(key, None))
+        # Отмена одного ожидающего не должна отменять загрузку для остальных
+        return await asyncio.shield(future)
+
+
+class SingleFlight:
+    """То же для потоков: второй поток с тем же ключом ждёт результата первого"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, call: Callable[[], Any]) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
@@ -0,0 +1,158 @@
+import codecs
+import threading
+from html.parser import HTMLParser
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple, Union
+import aiohttp
+
+# Размер порции при потоковом чтении страницы, байт
+STREAM_CHUNK = 16 * 1024
+
+# Элементы без закрывающего тега: блок такого вида найден, как только открылся
+VOID_ELEMENTS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                           'source', 'track', 'wbr'))
+
+# Блок страницы: тег и классы, которые должны быть у элемента ('' - любой элемент с этим тегом);
+# условие вида "имя=значение" проверяет атрибут, варианты условий разделяются " | ".
+# Повторённый блок - столько же разных элементов. Блок с третьим элементом N - серия до N элементов подряд:
+# она прочитана после N-го элемента или на первом следующем за серией элементе
+Block = Union[Tuple[str, str], Tuple[str, str, int]]
+Condition = Tuple[FrozenSet[str], Tuple[Tuple[str, str], ...]]
+
+
+def _parse_conditions(conditions: str) -> Tuple[Condition, ...]:
+    """Варианты условий блока: классы и атрибуты каждого"""
+    variants = []
+    for variant in conditions.split('|'):
+        tokens = variant.split()
+        variants.append((frozenset(token for token in tokens if '=' not in token),
+                         tuple(tuple(token.split('=', 1)) for token in tokens if '=' in token)))
+    return tuple(variants)
+
+
+class BlockWatcher(HTMLParser):
+    """Разбирает HTML по мере поступления и замечает, когда все нужные блоки прочитаны до конца"""
+
+    def __init__(self, blocks: Sequence[Block]):
+        super().__init__(convert_charrefs=False)
+        # Тег, варианты условий и сколько элементов нужно блоку (у серии - наибольшее число)
+        self._blocks: List[Tuple[str, Tuple[Condition, ...], int]] = [
+            (block[0], _parse_conditions(block[1]), block[2] if len(block) > 2 else 1) for block in blocks
+        ]
+        self._found = set()
+        # Прочитанные элементы серий: номер блока -> число элементов
+        self._counts: Dict[int, int] = {}
+        # Открытые элементы: тег и номер блока, которому элемент соответствует
+        self._stack: List[Tuple[str, Optional[int]]] = []
+
+    @property
+    def complete(self) -> bool:
+        """Все блоки найдены и закрыты"""
+        return len(self._found) == len(self._blocks)
+
+    def _match(self, tag: str, attrs) -> Optional[int]:
+        attrs = dict(attrs)
+        classes = set((attrs.get('class') or '').split())
+        opened = {index for _, index in self._stack}
+        for index, (block_tag, variants, _) in enumerate(self._blocks):
+            if index in self._found or index in opened or tag != block_tag:
+                continue
+            if any(block_classes <= classes and all(attrs.get(name) == value for name, value in block_attrs)
+                   for block_classes, block_attrs in variants):
+                return index
+        return None
+
+    def _close(self, index: int):
+        """Элемент блока прочитан целиком"""
+        self._counts[index] = self._counts.get(index, 0) + 1
+        if self._counts[index] >= self._blocks[index][2]:
+            self._found.add(index)
+
+    def _end_runs(self, index: Optional[int]):
+        """Элемент, не входящий в начатую серию, завершает её, если он не вложен в элемент серии"""
+        opened = {open_index for _, open_index in self._stack}
+        for run in self._counts:
+            if run != index and run not in self._found and run not in opened:
+                self._found.add(run)
+
+    def handle_starttag(self, tag, attrs):
+        index = self._match(tag, attrs)
+        self._end_runs(index)
+        if tag in VOID_ELEMENTS:
+            if index is not None:
+                self._close(index)
+            return
+        self._stack.append((tag, index))
+
+    def handle_startendtag(self, tag, attrs):
+        index = self._match(tag, attrs)
+        self._end_runs(index)
+        if index is not None:
+            self._close(index)
+
+    def handle_endtag(self, tag):
+        # Незакрытые вложенные элементы закрываются вместе с внешним, как в браузере
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if self._stack[depth][0] == tag:
+                closed = [index for _, index in self._stack[depth:] if index is not None]
+                del self._stack[depth:]
+                for index in closed:
+                    self._close(index)
+                return
+
+
+async def read_until_blocks(response: aiohttp.ClientResponse, blocks: Sequence[Block],
+                            chunk_size: int = STREAM_CHUNK) -> Tuple[str, int, bool]:
+    """Читает тело ответа по частям до конца всех блоков: (HTML, прочитано байт, остановлено ли досрочно)"""
+    decoder = codecs.getincrementaldecoder(response.charset or 'utf-8')(errors='replace')
+    watcher = BlockWatcher(blocks)
+    parts = []
+    size = 0
+    async for chunk in response.content.iter_chunked(chunk_size):
+        size += len(chunk)
+        text = decoder.decode(chunk)
+        parts.append(text)
+        watcher.feed(text)
+        if watcher.complete:
+            # Остаток страницы (подвал, скрипты) не читается; соединение закроется при выходе из запроса
+            return ''.join(parts), size, True
+
+    parts.append(decoder.decode(b'', final=True))
+    return ''.join(parts), size, False
+
+
+class PageStats:
+    """Объём загруженных страниц событий и время их разбора"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.downloads = 0
+        self.bytes = 0
+        self.early_stops = 0
+        self.pages = 0
+        self.parse_seconds = 0.0
+        # Страницы, поля которых взяты из встроенных данных без построения DOM
+        self.fast_path = 0
+
+    def add_download(self, size: int, stopped_early: bool = False):
+        """Учитывает загрузку страницы"""
+        with self._lock:
+            self.downloads += 1
+            self.bytes += size
+            self.early_stops += stopped_early
+
+    def add_parse(self, seconds: float, fast_path: bool = False):
+        """Учитывает разбор страницы"""
+        with self._lock:
+            self.pages += 1
+            self.parse_seconds += seconds
+            self.fast_path += fast_path
+
+    def summary(self) -> str:
+        """Средний объём и время разбора страницы"""
+        line = (f"страниц событий {self.downloads}, в среднем {self.bytes / max(self.downloads, 1) / 1024:.1f} КБ, "
+                f"разбор {self.parse_seconds / max(self.pages, 1) * 1000:.1f} мс")
+        if self.fast_path:
+            line += f", без DOM (встроенные данные) {self.fast_path}"
+        if self.early_stops:
+            line += f", чтение остановлено досрочно у {self.early_stops}"
+        return line
@@ -0,0 +1,186 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Виды задач: страница списка событий и страница отдельного события
+LISTING = 'listing'
+DETAIL = 'detail'
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+# Сколько секунд задача принадлежит взявшему её процессу; после истечения её снова выдают
+VISIBILITY_TIMEOUT = 120.0
+MAX_ATTEMPTS = 3
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    city TEXT NOT NULL,
+    source TEXT NOT NULL,
+    url TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_until REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    UNIQUE (kind, city, source, url)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_until);
+'''
+
+
+@dataclass
+class Task:
+    """Задача очереди обхода"""
+    id: int
+    kind: str
+    city: str
+    source: str
+    url: str
+    payload: Dict
+    attempts: int
+
+
+class WorkQueue:
+    """Очередь адресов обхода в SQLite: задачу берут в аренду, подтверждают ack или возвращают release"""
+
+    def __init__(self, path: str, visibility_timeout: float = VISIBILITY_TIMEOUT,
+                 max_attempts: int = MAX_ATTEMPTS):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Каждый процесс открывает своё соединение; autocommit, транзакции открываются явно
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(SCHEMA)
+
+    def put(self, kind: str, city: str, source: str, url: str, payload: Optional[Dict] = None) -> bool:
+        """Добавляет задачу; адрес, уже бывший в очереди, повторно не добавляется"""
+        with self._lock:
+            cursor = self._connection.execute(
+                'INSERT OR IGNORE INTO tasks (kind, city, source, url, payload) VALUES (?, ?, ?, ?, ?)',
+                (kind, city, source, url, json.dumps(payload or {}, ensure_ascii=False))
+            )
+            return cursor.rowcount > 0
+
+    def lease(self, owner: str) -> Optional[Task]:
+        """Выдаёт свободную задачу или задачу с истёкшей арендой (её владелец, вероятно, умер)"""
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE сразу берёт блокировку записи: две аренды одной задачи невозможны
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                while True:
+                    row = self._connection.execute(
+                        'SELECT id, kind, city, source, url, payload, attempts FROM tasks '
+                        'WHERE status = ? OR (status = ? AND lease_until < ?) ORDER BY id LIMIT 1',
+                        (PENDING, LEASED, now)
+                    ).fetchone()
+                    if row is None:
+                        self._connection.execute('COMMIT')
+                        return None
+
+                    task = Task(row[0], row[1], row[2], row[3], row[4], json.loads(row[5]), row[6] + 1)
+                    if task.attempts > self.max_attempts:
+                        logger.warning(f"Задача {task.url} исчерпала попытки и помечена как неудачная")
+                        self._connection.execute('UPDATE tasks SET status = ?, owner = NULL WHERE id = ?',
+                                                 (FAILED, task.id))
+                        continue
+
+                    self._connection.execute(
+                        'UPDATE tasks SET status = ?, owner = ?, lease_until = ?, attempts = ? WHERE id = ?',
+                        (LEASED, owner, now + self.visibility_timeout, task.attempts, task.id)
+                    )
+                    self._connection.execute('COMMIT')
+                    return task
+            except BaseException:
+                self._connection.execute('ROLLBACK')
+                raise
+
+    def ack(self, task: Task, owner: str, result: Optional[Dict] = None) -> bool:
+        """Подтверждает выполнение; False, если аренда уже истекла и задачу отдали другому процессу"""
+        with self._lock:
+            cursor = self._connection.execute(
+                'UPDATE tasks SET status = ?, owner = NULL, result = ? WHERE id = ? AND status = ? AND owner = ?',
+                (DONE, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 task.id, LEASED, owner)
+            )
+            return cursor.rowcount > 0
+
+    def release(self, task: Task, owner: str):
+        """Возвращает задачу в очередь для повторной попытки (или помечает неудачной)"""
+        status = FAILED if task.attempts >= self.max_attempts else PENDING
+        with self._lock:
+            self._connection.execute(
+                'UPDATE tasks SET status = ?, owner = NULL, lease_until = 0 WHERE id = ? AND status = ? AND owner = ?',
+                (status, task.id, LEASED, owner)
+            )
+
+    def is_drained(self) -> bool:
+        """Нет ни свободных задач, ни задач в аренде"""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT COUNT(*) FROM tasks WHERE status IN (?, ?)', (PENDING, LEASED)
+            ).fetchone()
+            return row[0] == 0
+
+    def status(self, kind: str, city: str, source: str, url: str) -> Optional[str]:
+        """Состояние задачи (None, если такой задачи нет)"""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT status FROM tasks WHERE kind = ? AND city = ? AND source = ? AND url = ?',
+                (kind, city, source, url)
+            ).fetchone()
+            return row[0] if row else None
+
+    def results(self, kind: str, city: str, source: str) -> List[Dict]:
+        """Результаты выполненных задач источника города в порядке добавления"""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT result FROM tasks WHERE kind = ? AND city = ? AND source = ? AND status = ? '
+                'AND result IS NOT NULL ORDER BY id',
+                (kind, city, source, DONE)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        """Число задач в каждом состоянии"""
+        with self._lock:
+            return dict(self._connection.execute('SELECT status, COUNT(*) FROM tasks GROUP BY status'))
+
+    def retain(self, cities: List[str]):
+        """Оставляет задачи только продолжаемых городов, остальные удаляет перед новым обходом"""
+        with self._lock:
+            placeholders = ', '.join('?' * len(cities))
+            self._connection.execute(f'DELETE FROM tasks WHERE city NOT IN ({placeholders})', cities)
+
+    def requeue_unfinished(self):
+        """Возвращает в очередь задачи в аренде (не дожидаясь её истечения) и неудачные задачи"""
+        with self._lock:
+            self._connection.execute(
+                'UPDATE tasks SET status = ?, owner = NULL, lease_until = 0, attempts = 0 WHERE status IN (?, ?)',
+                (PENDING, LEASED, FAILED)
+            )
+
+    def clear(self):
+        """Удаляет все задачи"""
+        with self._lock:
+            self._connection.execute('DELETE FROM tasks')
+
+    def close(self):
+        self._connection.close()
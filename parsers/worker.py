@@ -0,0 +1,157 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+import logging
+from parsers.archive import HtmlArchive
+from parsers.base_parser import BaseParser
+from parsers.cities import get_city
+from parsers.latency import LatencyTracker
+from parsers.registry import PARSER_REGISTRY, SharedSessions, shared_sessions
+from parsers.work_queue import DETAIL, LISTING, Task, WorkQueue
+
+logger = logging.getLogger(__name__)
+
+# Сколько задач один процесс выполняет одновременно (запросы ждут сеть, а не процессор)
+WORKER_SLOTS = 4
+# Пауза перед повторным опросом, когда свободных задач нет, но чужие ещё в работе
+IDLE_DELAY = 0.5
+
+# Город -> (папка нового поколения, папка опубликованного поколения)
+CrawlRoots = Dict[str, Tuple[str, str]]
+
+
+@dataclass
+class WorkerOptions:
+    """Настройки обхода для процесса-обходчика: только простые значения, они пересылаются в процесс"""
+    # Лимит передаётся длительностью: часы monotonic у разных процессов не совпадают
+    time_left: Optional[float] = None
+    archive_root: Optional[str] = None
+    replay: bool = False
+    # Срок актуальности страниц событий вместо заданного источником (None - срок источника)
+    detail_max_age: Optional[float] = None
+    hedge: bool = False
+    stream_details: bool = False
+
+
+class CrawlWorker:
+    """Процесс обхода: берёт задачи из общей очереди и выполняет их парсерами своих источников"""
+
+    def __init__(self, queue: WorkQueue, roots: CrawlRoots, sessions: SharedSessions,
+                 deadline: Optional[float] = None, options: Optional[WorkerOptions] = None,
+                 archive: Optional[HtmlArchive] = None):
+        self.queue = queue
+        self.roots = roots
+        self.sessions = sessions
+        self.deadline = deadline
+        self.options = options or WorkerOptions()
+        self.archive = archive
+        self.latency = LatencyTracker()
+        self.owner = f"worker-{os.getpid()}"
+        self._parsers: Dict[Tuple[str, str], BaseParser] = {}
+
+    def _parser(self, task: Task) -> BaseParser:
+        """Парсер источника города; создаётся один раз на процесс"""
+        key = (task.city, task.source)
+        if key not in self._parsers:
+            output_root, previous_root = self.roots[task.city]
+            parser = PARSER_REGISTRY[task.source].create(
+                self.sessions, city=get_city(task.city), output_root=output_root, previous_root=previous_root
+            )
+            parser.deadline = self.deadline
+            parser.archive = self.archive
+            parser.replay = self.options.replay
+            parser.latency = self.latency
+            parser.hedge = self.options.hedge
+            parser.stream_details = self.options.stream_details
+            if self.options.detail_max_age is not None:
+                parser.detail_max_age = self.options.detail_max_age
+            if self.options.replay:
+                parser.detail_max_age = None
+            self._parsers[key] = parser
+        return self._parsers[key]
+
+    @staticmethod
+    async def _call(method, *args):
+        """Вызывает метод парсера: корутину напрямую, синхронный - в пуле потоков"""
+        if asyncio.iscoroutinefunction(method):
+            return await method(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+
+    async def _execute(self, task: Task) -> Optional[Dict]:
+        """Выполняет задачу; None - задачу нужно повторить"""
+        parser = self._parser(task)
+
+        if task.kind == LISTING:
+            page = task.payload.get('page', 1)
+            category = task.payload.get('category')
+            cards = await self._call(parser.parse_listing, page, category)
+            if cards is None:
+                return None
+
+            added = 0
+            for card_data in cards:
+                added += self.queue.put(DETAIL, task.city, task.source, card_data['event_url'], {'card': card_data})
+            # Следующая страница ставится в очередь, пока страницы добавляют новые события:
+            # за последней страницей сайт отдаёт пустой список или повторяет последнюю
+            if added and parser.PAGINATED:
+                self.queue.put(LISTING, task.city, task.source, parser.listing_url(page + 1, category),
+                               {'page': page + 1, 'category': category})
+            return {'cards': len(cards)}
+
+        event = await self._call(parser._process_single_event, task.payload['card'])
+        return event.__dict__ if event else None
+
+    def _time_is_up(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    async def _slot(self):
+        """Цикл одного слота: аренда, выполнение, подтверждение"""
+        while not self._time_is_up():
+            task = self.queue.lease(self.owner)
+            if task is None:
+                if self.queue.is_drained():
+                    return
+                await asyncio.sleep(IDLE_DELAY)
+                continue
+
+            try:
+                result = await self._execute(task)
+            except Exception as e:
+                logger.error(f"Ошибка задачи {task.kind} {task.url}: {str(e)}")
+                result = None
+
+            if result is None:
+                self.queue.release(task, self.owner)
+            elif not self.queue.ack(task, self.owner, result):
+                logger.warning(f"Аренда задачи {task.url} истекла до подтверждения")
+
+    async def run(self, slots: int = WORKER_SLOTS):
+        await asyncio.gather(*(self._slot() for _ in range(slots)))
+
+
+async def run_worker(queue_path: str, roots: CrawlRoots, options: Optional[WorkerOptions] = None,
+                     slots: int = WORKER_SLOTS):
+    """Работает, пока очередь не опустеет или не истечёт время"""
+    options = options or WorkerOptions()
+    deadline = None if options.time_left is None else time.monotonic() + options.time_left
+    queue = WorkQueue(queue_path)
+    # Каждый процесс открывает архив сам: соединения SQLite не передаются между процессами
+    archive = HtmlArchive(options.archive_root) if options.archive_root else None
+    try:
+        async with shared_sessions() as sessions:
+            worker = CrawlWorker(queue, roots, sessions, deadline, options, archive)
+            await worker.run(slots)
+            worker.latency.log_stats()
+    finally:
+        queue.close()
+        if archive is not None:
+            archive.close()
+
+
+def worker_main(queue_path: str, roots: CrawlRoots, options: Optional[WorkerOptions] = None):
+    """Точка входа процесса-обходчика"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(processName)s - %(levelname)s - %(message)s')
+    asyncio.run(run_worker(queue_path, roots, options))
+    logger.info(f"Процесс обхода {os.getpid()} завершён")
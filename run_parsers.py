@@ -1,35 +1,528 @@
+import argparse
 import asyncio
-from parsers.afisha_parser import AsyncAfishaParser
-from parsers.culture_parser import AsyncCultureParser
-from parsers.mts_parser import MTSParser
+import dataclasses
+import json
+import multiprocessing
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from catalog.generations import CatalogGenerations
+from parsers.archive import HtmlArchive
+from parsers.base_parser import BaseParser, EventData
+from parsers.checkpoint import CrawlCheckpoint
+from parsers.latency import LatencyTracker
+from parsers.cities import CITIES, City, city_root, get_cities, get_city
+from parsers.registry import HOUR, PARSER_REGISTRY, ParserSpec, SharedSessions, get_specs, run_parser, shared_sessions
+from parsers.work_queue import DETAIL, DONE, LISTING, WorkQueue
+from parsers.worker import CrawlRoots, WorkerOptions, worker_main
 import logging
 
+logger = logging.getLogger(__name__)
 
-async def run_async_parser(parser):
-    async with parser:
-        return await parser.parse_events()
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_ROOT = os.path.join(BASE_DIR, 'spectacles')
+# Время последнего обхода каждого источника в каждом городе, чтобы соблюдать интервалы между запусками
+STATE_PATH = os.path.join(OUTPUT_ROOT, 'crawl_state.json')
+# Очередь адресов для процессов-обходчиков (--workers)
+QUEUE_PATH = os.path.join(OUTPUT_ROOT, 'crawl_queue.db')
+# Прогресс незавершённых обходов, с которого продолжает следующий запуск
+CHECKPOINT_PATH = os.path.join(OUTPUT_ROOT, 'crawl_checkpoint.db')
+# Сжатые копии загруженных страниц для повторного разбора без сети (--reextract)
+ARCHIVE_PATH = os.path.join(OUTPUT_ROOT, 'archive')
+# События, которые не успели загрузиться за время обхода (--budget)
+SKIPPED_PATH = os.path.join(OUTPUT_ROOT, 'crawl_skipped.json')
+FAVOURITES_PATH = os.path.join(BASE_DIR, 'favourites')
+# Запас времени в конце --budget: загрузки в работе завершаются, остальные события переносятся, сек.
+DRAIN_TIME = 15.0
 
+CrawlResults = Dict[str, Optional[List[EventData]]]
 
-def run_sync_parser(parser):
-    return parser.parse_events()
 
+@dataclass
+class CrawlContext:
+    """Общие настройки одного обхода, передаваемые каждому парсеру"""
+    deadline: Optional[float] = None
+    checkpoint: Optional[CrawlCheckpoint] = None
+    memory_report: Optional[Dict[str, int]] = None
+    archive: Optional[HtmlArchive] = None
+    # Повторный разбор страниц из архива вместо загрузки
+    replay: bool = False
+    # Срок актуальности страниц событий вместо заданного источником, сек. (None - срок источника)
+    detail_max_age: Optional[float] = None
+    # Загрузка страниц событий по приоритету; избранное поднимается выше остальных событий
+    prioritize: bool = False
+    favourites: Set[str] = dataclasses.field(default_factory=set)
+    # За сколько секунд до deadline парсеры перестают начинать новые загрузки
+    drain: float = 0.0
+    # '<город>/<источник>' -> карточки, до которых не дошла очередь (None - без отчёта)
+    skipped_report: Optional[Dict[str, List[Dict]]] = None
+    # Время ответа хостов для адаптивных таймаутов; общее для всех парсеров и обходов
+    latency: LatencyTracker = dataclasses.field(default_factory=LatencyTracker)
+    # Дублировать запросы, не получившие ответа за p95 времени ответа хоста
+    hedge: bool = False
+    # Читать страницы событий потоком до последнего нужного блока
+    stream_details: bool = False
+    # Разделы списка для источников с разделами (пусто - разделы источника по умолчанию)
+    categories: List[str] = dataclasses.field(default_factory=list)
+    sessions: Optional[SharedSessions] = None
 
-async def main():
-    parsers = [
-        AsyncAfishaParser(),
-        AsyncCultureParser(),
-        MTSParser()
-    ]
+    def configure(self, parser: BaseParser):
+        """Передаёт парсеру лимит времени, контрольные точки и архив"""
+        parser.deadline = None if self.deadline is None else self.deadline - self.drain
+        parser.prioritize = self.prioritize
+        parser.favourites = self.favourites
+        parser.latency = self.latency
+        parser.hedge = self.hedge
+        parser.stream_details = self.stream_details
+        parser.select_categories(self.categories)
+        parser.checkpoint = self.checkpoint
+        parser.archive = self.archive
+        parser.replay = self.replay
+        if self.detail_max_age is not None:
+            parser.detail_max_age = self.detail_max_age
+        if self.replay:
+            # Повторный разбор заново извлекает все события, а не переносит прежние
+            parser.detail_max_age = None
+
+
+def open_archive(root: str = ARCHIVE_PATH) -> Optional[HtmlArchive]:
+    """Открывает архив страниц; без zstandard обход идёт без архива"""
+    try:
+        return HtmlArchive(root)
+    except ImportError:
+        logger.warning("Пакет zstandard не установлен, загруженные страницы не архивируются")
+        return None
+
+
+def load_state() -> Dict[str, float]:
+    """Загружает время последних обходов источников: '<город>/<источник>' -> время"""
+    try:
+        with open(STATE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state: Dict[str, float]):
+    """Сохраняет время последних обходов источников"""
+    os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
+    tmp_path = f"{STATE_PATH}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, STATE_PATH)
+
+
+@contextmanager
+def traced_peak(label: str, report: Optional[Dict[str, int]]):
+    """Записывает в report пик памяти блока по tracemalloc (report=None - без замера)"""
+    if report is None:
+        yield
+        return
+
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    try:
+        yield
+    finally:
+        report[label] = tracemalloc.get_traced_memory()[1] - baseline
+
+
+def log_memory_report(report: Dict[str, int]):
+    """Выводит пики памяти источников, от большего к меньшему"""
+    for label, peak in sorted(report.items(), key=lambda item: item[1], reverse=True):
+        logger.info(f"Пик памяти {label}: {peak / 1024 / 1024:.1f} МБ")
+
+
+def load_favourite_names() -> Set[str]:
+    """Имена папок избранных событий"""
+    try:
+        return {entry.name for entry in os.scandir(FAVOURITES_PATH) if entry.is_dir()}
+    except OSError:
+        return set()
+
+
+def save_skipped_report(report: Dict[str, List[Dict]]):
+    """Сохраняет список событий, не загруженных за отведённое время"""
+    os.makedirs(os.path.dirname(SKIPPED_PATH), exist_ok=True)
+    tmp_path = f"{SKIPPED_PATH}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, SKIPPED_PATH)
+
+
+def _state_key(city: City, spec: ParserSpec) -> str:
+    """Ключ источника города в состоянии планировщика"""
+    return f"{city.slug}/{spec.name}"
+
+
+def begin_city(city: City, checkpoint: Optional[CrawlCheckpoint] = None
+               ) -> Tuple[CatalogGenerations, str, Optional[str], bool]:
+    """Папка нового поколения города: папка прерванного обхода, если он есть, иначе новая"""
+    generations = CatalogGenerations(city_root(OUTPUT_ROOT, city))
+    staging_dir = checkpoint.staging_dir(city.slug) if checkpoint else None
+    resumed = staging_dir is not None
+    if resumed:
+        logger.info(f"{city.name}: продолжается прерванный обход {os.path.basename(staging_dir)}")
+    else:
+        staging_dir = generations.begin()
+        if checkpoint:
+            checkpoint.begin(city.slug, staging_dir)
+    return generations, staging_dir, generations.current(), resumed
+
+
+def abort_city(city: City, generations: CatalogGenerations, staging_dir: str,
+               checkpoint: Optional[CrawlCheckpoint] = None):
+    """Обход прерван: с контрольными точками папка остаётся для продолжения, без них удаляется"""
+    if checkpoint:
+        logger.warning(f"{city.name}: обход прерван, прогресс сохранён для следующего запуска")
+    else:
+        generations.discard(staging_dir)
+
+
+async def crawl_source(spec: ParserSpec, output_root: str, previous_root: str,
+                       context: Optional[CrawlContext] = None,
+                       city: Optional[City] = None) -> Optional[List[EventData]]:
+    """Обходит один источник с учётом общего лимита времени"""
+    context = context or CrawlContext()
+    city = city or get_city()
+    parser = spec.create(context.sessions, city=city, output_root=output_root, previous_root=previous_root)
+    context.configure(parser)
+    timeout = None if context.deadline is None else max(context.deadline - time.monotonic(), 0)
+
+    try:
+        with traced_peak(f"{city.slug}/{spec.name}", context.memory_report):
+            events = await asyncio.wait_for(run_parser(parser), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Источник {spec.name} ({city.name}): лимит времени исчерпан, обход прерван")
+        # Сохранённое до прерывания остаётся в поколении; синхронный парсер к этому моменту уже остановлен
+        events = parser.saved_events()
+    except Exception as e:
+        logger.error(f"Источник {spec.name} ({city.name}): ошибка при обходе: {str(e)}")
+        return None
+
+    if parser.stopped_by_deadline():
+        # Непрочитанные страницы списка брошены: их события остаются в прежней версии
+        events = events + parser.carry_over_unreached()
+    if parser.unchanged_cards:
+        logger.info(f"Источник {spec.name} ({city.name}): карточек без изменений {parser.unchanged_cards}, "
+                    f"их страницы не загружались")
+    if parser.page_stats.downloads:
+        logger.info(f"Источник {spec.name} ({city.name}): {parser.page_stats.summary()}")
+    if parser.skipped:
+        kept = sum(1 for card in parser.skipped if card['kept_previous'])
+        logger.warning(f"Источник {spec.name} ({city.name}): не успели загрузиться {len(parser.skipped)} "
+                       f"событий, прежняя версия оставлена у {kept}")
+        if context.skipped_report is not None:
+            context.skipped_report[_state_key(city, spec)] = parser.skipped
+    return events
+
+
+async def crawl_once(specs: List[ParserSpec], context: Optional[CrawlContext] = None,
+                     city: Optional[City] = None) -> CrawlResults:
+    """Однократно обходит источники города параллельно и публикует новое поколение его каталога"""
+    context = context or CrawlContext()
+    city = city or get_city()
+    checkpoint = context.checkpoint
+    specs = [spec for spec in specs if city.supports(spec.name)]
+    generations, staging_dir, previous_generation, _ = begin_city(city, checkpoint)
+    previous_root = generations.current_dir()
+
+    crawls = [crawl_source(spec, staging_dir, previous_root, context, city) for spec in specs]
+    try:
+        if context.memory_report is None:
+            results = await asyncio.gather(*crawls)
+        else:
+            # Пик памяти процесса общий: для замера по источникам они обходятся по очереди
+            results = [await crawl for crawl in crawls]
+    except BaseException:
+        abort_city(city, generations, staging_dir, checkpoint)
+        raise
 
-    results = await asyncio.gather(
-        run_async_parser(parsers[0]),
-        run_async_parser(parsers[1]),
-        asyncio.get_event_loop().run_in_executor(None, run_sync_parser, parsers[2])
+    crawl_results = {spec.name: events for spec, events in zip(specs, results)}
+    publish_city(city, generations, staging_dir, previous_generation, crawl_results, checkpoint)
+    return crawl_results
+
+
+def publish_city(city: City, generations: CatalogGenerations, staging_dir: str,
+                 previous_generation: Optional[str], crawl_results: CrawlResults,
+                 checkpoint: Optional[CrawlCheckpoint] = None):
+    """Публикует собранное поколение города (или отбрасывает его, если ни один источник не обойдён)"""
+    logger.info(f"Спаршено ({city.name}): " + ", ".join(
+        f"{name}={len(events) if events is not None else 'ошибка'}" for name, events in crawl_results.items()
+    ))
+
+    if all(events is None for events in crawl_results.values()):
+        logger.warning(f"{city.name}: ни один источник не обойдён, поколение каталога не публикуется")
+        generations.discard(staging_dir)
+        if checkpoint:
+            checkpoint.finish(city.slug)
+        return
+
+    # Необойдённые и упавшие источники переходят в новое поколение без изменений
+    carry_over = [name for name in PARSER_REGISTRY if city.supports(name) and crawl_results.get(name) is None]
+    generation = generations.publish(staging_dir, carry_over=carry_over)
+    if checkpoint:
+        # Контрольная точка снимается только после публикации: при её ошибке запуск можно продолжить с --resume
+        checkpoint.finish(city.slug)
+
+    if previous_generation:
+        diff = generations.diff(previous_generation, generation)
+        logger.info(f"Изменения каталога ({city.name}): добавлено {len(diff['added'])}, удалено {len(diff['removed'])}, "
+                    f"изменено {len(diff['changed'])}")
+
+
+async def crawl_cities(jobs: Dict[City, List[ParserSpec]],
+                       context: Optional[CrawlContext] = None) -> Dict[str, CrawlResults]:
+    """Обходит несколько городов одновременно поверх общих HTTP-клиентов"""
+    context = context or CrawlContext()
+    async with shared_sessions() as sessions:
+        city_context = dataclasses.replace(context, sessions=sessions)
+        crawls = [crawl_once(specs, city_context, city) for city, specs in jobs.items()]
+        if context.memory_report is None:
+            results = await asyncio.gather(*crawls)
+        else:
+            results = [await crawl for crawl in crawls]
+    return {city.slug: city_results for city, city_results in zip(jobs, results)}
+
+
+async def crawl_with_workers(jobs: Dict[City, List[ParserSpec]], workers: int,
+                             context: Optional[CrawlContext] = None) -> Dict[str, CrawlResults]:
+    """Обходит города процессами-обходчиками через общую очередь адресов"""
+    context = context or CrawlContext()
+    checkpoint = context.checkpoint
+    runs = {}
+    roots: CrawlRoots = {}
+    resumed_cities = []
+    for city in jobs:
+        generations, staging_dir, previous_generation, resumed = begin_city(city, checkpoint)
+        runs[city] = (generations, staging_dir, previous_generation)
+        roots[city.slug] = (staging_dir, generations.current_dir())
+        if resumed:
+            resumed_cities.append(city.slug)
+
+    # Очередь сама служит контрольной точкой: задачи продолжаемых городов остаются в ней
+    queue = WorkQueue(QUEUE_PATH)
+    queue.retain(resumed_cities)
+    # Процессы прошлого запуска мертвы: их аренды можно не ждать, неудачные задачи - повторить
+    queue.requeue_unfinished()
+
+    # Первые страницы списков каждого источника (по одной на раздел): по ним видно, обойдён ли источник
+    first_pages: Dict[Tuple[City, str], List[str]] = {}
+    for city, specs in jobs.items():
+        for spec in specs:
+            parser = spec.create(city=city)
+            parser.select_categories(context.categories)
+            first_pages[city, spec.name] = []
+            for category in parser.categories or [None]:
+                url = parser.listing_url(1, category)
+                first_pages[city, spec.name].append(url)
+                queue.put(LISTING, city.slug, spec.name, url, {'page': 1, 'category': category})
+
+    time_left = None if context.deadline is None else max(context.deadline - time.monotonic(), 0)
+    options = WorkerOptions(
+        time_left=time_left,
+        archive_root=context.archive.root if context.archive is not None else None,
+        replay=context.replay,
+        detail_max_age=context.detail_max_age,
+        hedge=context.hedge,
+        stream_details=context.stream_details,
     )
+    spawn = multiprocessing.get_context('spawn')
+    processes = [
+        spawn.Process(target=worker_main, args=(QUEUE_PATH, roots, options), name=f'crawl-worker-{number}')
+        for number in range(workers)
+    ]
+    try:
+        for process in processes:
+            process.start()
+        loop = asyncio.get_running_loop()
+        for process in processes:
+            await loop.run_in_executor(None, process.join)
+    except BaseException:
+        for process in processes:
+            process.terminate()
+        for city, (generations, staging_dir, _) in runs.items():
+            abort_city(city, generations, staging_dir, checkpoint)
+        raise
+
+    logger.info(f"Очередь обхода: {queue.counts()}")
+    results = {}
+    for city, specs in jobs.items():
+        generations, staging_dir, previous_generation = runs[city]
+        crawl_results: CrawlResults = {}
+        for spec in specs:
+            listed = all(queue.status(LISTING, city.slug, spec.name, url) == DONE
+                         for url in first_pages[city, spec.name])
+            crawl_results[spec.name] = (
+                [EventData(**event) for event in queue.results(DETAIL, city.slug, spec.name)] if listed else None
+            )
+        publish_city(city, generations, staging_dir, previous_generation, crawl_results, checkpoint)
+        results[city.slug] = crawl_results
+    queue.close()
+    return results
+
+
+def _seconds_until_due(city: City, spec: ParserSpec, state: Dict[str, float], now: float) -> float:
+    """Сколько секунд осталось до следующего обхода источника в городе"""
+    return max(state.get(_state_key(city, spec), 0) + spec.refresh_interval - now, 0)
+
+
+async def crawl_loop(specs: List[ParserSpec],
+                     max_time: Optional[float] = None,
+                     once: bool = False,
+                     on_crawl_done: Optional[Callable[[Dict[str, CrawlResults]], None]] = None,
+                     cities: Optional[List[City]] = None,
+                     workers: int = 0,
+                     resume: bool = True,
+                     memory_report: bool = False,
+                     archive: bool = True,
+                     reextract: bool = False,
+                     detail_max_age: Optional[float] = None,
+                     budget: Optional[float] = None,
+                     hedge: bool = False,
+                     stream_details: bool = False,
+                     categories: Optional[List[str]] = None):
+    """Планировщик: обходит каждый источник каждого города со своим интервалом, пока не истечёт max_time"""
+    if budget is not None:
+        # Обновление к сроку: один проход, страницы по приоритету, остаток - из прошлого поколения
+        max_time, once = budget, True
+        if workers:
+            logger.warning("Обход по приоритету выполняется в этом процессе, --workers не используется")
+            workers = 0
+    deadline = None if max_time is None else time.monotonic() + max_time
+    cities = cities or get_cities()
+    state = load_state()
+    if reextract:
+        # Повторный разбор всегда собирает новое поколение целиком и один раз
+        resume, once, archive = False, True, True
+    checkpoint = CrawlCheckpoint(CHECKPOINT_PATH) if resume else None
+    html_archive = open_archive() if archive else None
+    if reextract and html_archive is None:
+        logger.error("Повторный разбор невозможен без архива страниц")
+        return
+    if memory_report and workers:
+        logger.warning("Отчёт о памяти по источникам недоступен при обходе процессами-обходчиками")
+        memory_report = False
+    if memory_report:
+        tracemalloc.start()
+    # Замеры времени ответа переживают отдельные обходы: таймауты уточняются от обхода к обходу
+    latency = LatencyTracker()
+    pairs = [(city, spec) for city in cities for spec in specs if city.supports(spec.name)]
+    if not pairs:
+        logger.warning("Выбранные источники не поддерживают выбранные города")
+        return
+
+    while True:
+        now = time.time()
+        jobs: Dict[City, List[ParserSpec]] = {}
+        for city, spec in pairs:
+            if once or _seconds_until_due(city, spec, state, now) == 0:
+                jobs.setdefault(city, []).append(spec)
+
+        if jobs:
+            context = CrawlContext(deadline, checkpoint, archive=html_archive, replay=reextract,
+                                   detail_max_age=detail_max_age, latency=latency, hedge=hedge,
+                                   stream_details=stream_details, categories=categories or [])
+            if budget is not None:
+                context.prioritize = True
+                context.favourites = load_favourite_names()
+                context.drain = min(DRAIN_TIME, budget / 4)
+                context.skipped_report = {}
+            if workers:
+                results = await crawl_with_workers(jobs, workers, context)
+            else:
+                context.memory_report = {} if memory_report else None
+                results = await crawl_cities(jobs, context)
+                if context.memory_report:
+                    log_memory_report(context.memory_report)
+                latency.log_stats()
+            if context.skipped_report is not None:
+                save_skipped_report(context.skipped_report)
+            if not reextract:
+                finished_at = time.time()
+                for city, city_specs in jobs.items():
+                    for spec in city_specs:
+                        state[_state_key(city, spec)] = finished_at
+                save_state(state)
+
+            if on_crawl_done:
+                on_crawl_done(results)
+
+        if once:
+            return
+
+        now = time.time()
+        wait = min(_seconds_until_due(city, spec, state, now) for city, spec in pairs)
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= wait:
+                logger.info("Лимит времени планировщика исчерпан")
+                return
+
+        logger.info(f"Следующий обход через {int(wait)} с")
+        await asyncio.sleep(wait)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Разбирает аргументы командной строки"""
+    arg_parser = argparse.ArgumentParser(description="Запуск парсеров афиши")
+    arg_parser.add_argument('--sources', nargs='+', choices=sorted(PARSER_REGISTRY),
+                            help="Источники для обхода (по умолчанию все)")
+    arg_parser.add_argument('--cities', nargs='+', choices=sorted(CITIES),
+                            help="Города для обхода (по умолчанию основной город)")
+    arg_parser.add_argument('--loop', action='store_true',
+                            help="Работать постоянно, обходя каждый источник со своим интервалом")
+    arg_parser.add_argument('--workers', type=int, default=0,
+                            help="Число процессов-обходчиков с общей очередью адресов (0 - обход в этом процессе)")
+    arg_parser.add_argument('--no-resume', action='store_true',
+                            help="Не продолжать прерванный обход и не сохранять прогресс")
+    arg_parser.add_argument('--detail-max-age', type=float, default=None, metavar='HOURS',
+                            help="Перечитывать страницы событий с неизменными карточками не чаще, чем раз в HOURS часов "
+                                 "(0 - перечитывать всегда; по умолчанию срок источника)")
+    arg_parser.add_argument('--budget', type=float, default=None, metavar='SECONDS',
+                            help="Обновить каталог за SECONDS секунд: страницы событий загружаются по приоритету "
+                                 "(ближайшие показы, изменившиеся, избранные), не успевшие остаются в прежней версии")
+    arg_parser.add_argument('--hedge', action='store_true',
+                            help="Дублировать запрос, если ответа нет дольше обычного (p95 времени ответа хоста)")
+    arg_parser.add_argument('--stream-details', action='store_true',
+                            help="Дочитывать страницы событий только до последнего нужного блока")
+    categories = sorted({name for spec in PARSER_REGISTRY.values() for name in spec.factory.CATEGORIES})
+    arg_parser.add_argument('--categories', nargs='+', choices=categories,
+                            help="Разделы списка для источников с разделами (по умолчанию - только театр)")
+    arg_parser.add_argument('--no-archive', action='store_true',
+                            help="Не сохранять загруженные страницы в архив")
+    arg_parser.add_argument('--reextract', action='store_true',
+                            help="Заново разобрать страницы из архива без сети и опубликовать новое поколение")
+    arg_parser.add_argument('--memory-report', action='store_true',
+                            help="Замерить пик памяти каждого источника (источники обходятся по очереди)")
+    arg_parser.add_argument('--max-time', type=float, default=None,
+                            help="Ограничение общего времени работы, сек.")
+    arg_parser.add_argument('--rollback', nargs='?', const='', default=None, metavar='GENERATION',
+                            help="Откатить каталог города к указанному (по умолчанию предыдущему) поколению")
+    return arg_parser.parse_args(argv)
+
+
+async def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    cities = get_cities(args.cities)
+    if args.rollback is not None:
+        for city in cities:
+            CatalogGenerations(city_root(OUTPUT_ROOT, city)).rollback(args.rollback or None)
+        return
 
-    logging.info(f"Спаршено: Afisha={len(results[0])}, Culture={len(results[1])}, MTS={len(results[2])}")
+    specs = get_specs(args.sources)
+    await crawl_loop(specs, max_time=args.max_time, once=not args.loop, cities=cities,
+                     workers=args.workers, resume=not args.no_resume,
+                     memory_report=args.memory_report, archive=not args.no_archive,
+                     reextract=args.reextract,
+                     detail_max_age=None if args.detail_max_age is None else args.detail_max_age * HOUR,
+                     budget=args.budget, hedge=args.hedge, stream_details=args.stream_details,
+                     categories=args.categories)
 
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+import json
+import os
+
+
+def make_generation(generations, events, source='afisha'):
+    """Собирает поколение в staging: events - папка события -> данные"""
+    staging_dir = generations.begin()
+    for folder, data in events.items():
+        event_dir = os.path.join(staging_dir, source, folder)
+        os.makedirs(event_dir)
+        with open(os.path.join(event_dir, 'event_details.json'), 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+    return staging_dir
+
+
+def event(title, price='500 ₽', date='7 апреля 2025, 19:00'):
+    return {'title': title, 'price': price, 'date': date}
+
+
+class FakeContent:
+    def __init__(self, body):
+        self.body = body
+
+    async def iter_chunked(self, size):
+        for start in range(0, len(self.body), size):
+            yield self.body[start:start + size]
+
+
+class FakeResponse:
+    """Ответ aiohttp с заданным телом: целиком или по частям"""
+    charset = 'utf-8'
+
+    def __init__(self, body):
+        self.body = body
+        self.content = FakeContent(body)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    async def read(self):
+        return self.body
+
+    async def text(self):
+        return self.body.decode(self.charset)
+
+
+class FakeSession:
+    """Сессия aiohttp, отдающая страницы из словаря адрес -> HTML и считающая запросы"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def get(self, url, timeout=None):
+        self.requests.append(url)
+        return FakeResponse(self.pages[url].encode('utf-8'))
@@ -0,0 +1,59 @@
+import json
+import os
+from unittest import mock
+from account_store import AccountStore, SessionCache
+
+
+def write_legacy_account(path, username, password):
+    with open(os.path.join(path, f'{username}.json'), 'w', encoding='utf-8') as f:
+        json.dump({'username': username, 'password': password}, f)
+
+
+def test_add_and_check(tmp_path):
+    store = AccountStore(str(tmp_path))
+    assert store.add('anna', 'hash1')
+    assert not store.add('anna', 'hash2')
+    assert store.check('anna', 'hash1')
+    assert not store.check('anna', 'hash2')
+    assert not store.check('boris', 'hash1')
+
+
+def test_accounts_survive_reopen(tmp_path):
+    AccountStore(str(tmp_path)).add('anna', 'hash1')
+    assert AccountStore(str(tmp_path)).check('anna', 'hash1')
+
+
+def test_check_rejects_bad_input(tmp_path):
+    store = AccountStore(str(tmp_path))
+    store.add('anna', 'hash1')
+    assert not store.check('anna', None)
+    assert not store.check('anna', 123)
+    assert not store.check('anna', 'хеш')
+    assert not store.check(None, 'hash1')
+
+
+def test_legacy_json_imported_once(tmp_path):
+    write_legacy_account(str(tmp_path), 'anna', 'hash1')
+    assert AccountStore(str(tmp_path)).check('anna', 'hash1')
+
+    with mock.patch.object(AccountStore, '_import_json_accounts') as import_json:
+        store = AccountStore(str(tmp_path))
+    import_json.assert_not_called()
+    assert store.check('anna', 'hash1')
+
+
+def test_session_lifecycle():
+    sessions = SessionCache()
+    token = sessions.create('anna')
+    assert sessions.get_user(token) == 'anna'
+    sessions.remove(token)
+    assert sessions.get_user(token) is None
+    assert sessions.get_user(None) is None
+
+
+def test_session_expires():
+    sessions = SessionCache(ttl=10)
+    with mock.patch('account_store.time.monotonic', return_value=100.0):
+        token = sessions.create('anna')
+    with mock.patch('account_store.time.monotonic', return_value=111.0):
+        assert sessions.get_user(token) is None
@@ -0,0 +1,47 @@
+import asyncio
+from parsers.afisha_parser import AsyncAfishaParser
+from tests.helpers import FakeSession
+
+
+def listing(*slugs):
+    cards = ''.join(f'<div class="events-elem"><a class="title" href="/events/{slug}/">{slug}</a></div>'
+                    for slug in slugs)
+    return f'<html><body>{cards}</body></html>'
+
+
+def crawl_category(pages, category='theatre'):
+    parser = AsyncAfishaParser(session=FakeSession({}))
+    parser.session.pages = {parser.listing_url(number, category): html for number, html in pages.items()}
+    return parser, asyncio.run(parser._parse_category(category))
+
+
+def test_listing_url_and_categories():
+    parser = AsyncAfishaParser()
+    assert parser.listing_url() == f'{parser.base_url}/events/teatr'
+    assert parser.listing_url(3, 'concerts') == f'{parser.base_url}/events/kontserty?page=3'
+
+    # Неизвестные разделы пропускаются; если не осталось ни одного, выбор не меняется
+    parser.select_categories(['concerts', 'cinema', 'children'])
+    assert parser.categories == ['concerts', 'children']
+    parser.select_categories(['cinema'])
+    assert parser.categories == ['concerts', 'children']
+
+
+def test_category_stops_when_site_repeats_last_page():
+    pages = {1: listing('a', 'b'), 2: listing('c', 'd'), 3: listing('c', 'd'), 4: listing('c', 'd'),
+             5: listing('c', 'd')}
+    parser, cards = crawl_category(pages, 'concerts')
+
+    assert [card['event_url'] for card in cards] == [f'{parser.base_url}/events/{slug}/' for slug in 'abcd']
+    assert {card['category'] for card in cards} == {'concerts'}
+    # Первая страница отдельно, затем окно из PAGE_WINDOW страниц
+    assert len(parser.session.requests) == 5
+
+
+def test_category_stops_on_empty_or_missing_page():
+    _, cards = crawl_category({1: listing('a'), 2: listing(), 3: listing('b'), 4: listing('c'), 5: listing('d')})
+    assert [card['title'] for card in cards] == ['a']
+
+    # Страница не загрузилась: остаются карточки уже прочитанных страниц
+    _, cards = crawl_category({1: listing('a', 'b')})
+    assert [card['title'] for card in cards] == ['a', 'b']
@@ -0,0 +1,45 @@
+import asyncio
+import os
+import pytest
+from parsers.archive import HtmlArchive
+from parsers.async_parser import AsyncHttpParser
+from tests.helpers import FakeSession
+
+# Архив сжимает страницы zstd; без zstandard обход идёт без архива
+pytest.importorskip('zstandard')
+
+URL = 'https://example.org/events/1'
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = HtmlArchive(str(tmp_path / 'archive'))
+    yield archive
+    archive.close()
+
+
+def test_put_latest_and_history(archive):
+    first = archive.put(URL, '<h1>Старая</h1>', fetched_at=100)
+    again = archive.put(URL, '<h1>Старая</h1>', fetched_at=200)
+    newest = archive.put(URL, '<h1>Новая</h1>', fetched_at=300)
+
+    # Неизменившаяся страница хранится один раз
+    assert first == again != newest
+    assert sum(len(files) for _, _, files in os.walk(archive.objects_path)) == 2
+    assert archive.latest(URL) == '<h1>Новая</h1>'
+    assert archive.latest(URL, before=250) == '<h1>Старая</h1>'
+    assert archive.latest('https://example.org/нет') is None
+    assert archive.history(URL) == [(100, first), (200, first), (300, newest)]
+
+
+def test_replay_reads_archive_without_network(tmp_path, archive):
+    archive.put(URL, '<h1>A</h1>')
+    session = FakeSession({})
+    parser = AsyncHttpParser(session=session, output_root=str(tmp_path))
+    parser.archive = archive
+    parser.replay = True
+
+    assert asyncio.run(parser._fetch_html(URL, detail=True)) == '<h1>A</h1>'
+    assert asyncio.run(parser._fetch_html('https://example.org/нет')) is None
+    assert session.requests == []
+    assert len(archive.history(URL)) == 1
@@ -0,0 +1,45 @@
+from catalog.changes import DELETE, INSERT, UPDATE, ChangeFeed, field_diff
+from catalog.generations import CatalogGenerations
+from tests.helpers import event, make_generation
+
+
+def test_field_diff():
+    assert field_diff(event('A'), event('A', price='700 ₽')) == {'price': {'old': '500 ₽', 'new': '700 ₽'}}
+    assert field_diff(event('A'), event('B')) == {}
+
+
+def test_feed_since_and_compact(tmp_path):
+    feed = ChangeFeed(str(tmp_path))
+    assert feed.since() == {'changes': [], 'last_seq': 0, 'reset': False}
+
+    feed.append('g1', [(INSERT, 'afisha/a', None, event('A')), (INSERT, 'afisha/b', None, event('B'))])
+    feed.append('g2', [(UPDATE, 'afisha/a', {'price': {'old': '500 ₽', 'new': '700 ₽'}}, event('A', '700 ₽')),
+                       (DELETE, 'afisha/b', None, None)])
+    assert feed.append('g3', [(INSERT, 'afisha/c', None, event('C'))]) == 5
+
+    result = feed.since(2, limit=1)
+    assert [(change['seq'], change['op'], change['diff']) for change in result['changes']] == [
+        (3, UPDATE, {'price': {'old': '500 ₽', 'new': '700 ₽'}})]
+    assert result['last_seq'] == 3 and not result['reset']
+
+    # Перекрытая вставка и старое удаление сжимаются; отставший клиент получает reset
+    assert feed.compact(keep_generations=1) == 3
+    assert [change['seq'] for change in feed.since()['changes']] == [3, 5]
+    assert feed.since(0)['reset'] and not feed.since(4)['reset']
+    assert feed.last_seq() == 5
+    feed.close()
+
+
+def test_publish_records_generation_changes(tmp_path):
+    generations = CatalogGenerations(str(tmp_path))
+    generations.publish(make_generation(generations, {'a': event('A'), 'b': event('B')}))
+    first = generations.changes_since()
+    assert sorted((change['op'], change['key']) for change in first['changes']) == [
+        (INSERT, 'afisha/a'), (INSERT, 'afisha/b')]
+
+    generations.publish(make_generation(generations, {'a': event('A', price='700 ₽'), 'c': event('C')}))
+    changes = {change['key']: change for change in generations.changes_since(first['last_seq'])['changes']}
+    assert {key: change['op'] for key, change in changes.items()} == {
+        'afisha/a': UPDATE, 'afisha/b': DELETE, 'afisha/c': INSERT}
+    assert changes['afisha/a']['diff'] == {'price': {'old': '500 ₽', 'new': '700 ₽'}}
+    assert changes['afisha/c']['event'] == event('C')
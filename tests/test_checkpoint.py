@@ -0,0 +1,74 @@
+import os
+from unittest import mock
+import pytest
+import run_parsers
+from parsers.base_parser import BaseParser, EventData
+from parsers.checkpoint import CrawlCheckpoint
+from parsers.cities import get_city
+
+
+class AfishaParser(BaseParser):
+    SOURCE_NAME = 'afisha'
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    checkpoint = CrawlCheckpoint(str(tmp_path / 'checkpoint.db'))
+    yield checkpoint
+    checkpoint.close()
+
+
+def test_progress_is_kept_until_finish(tmp_path, checkpoint):
+    staging_dir = str(tmp_path / 'staging')
+    os.makedirs(staging_dir)
+    checkpoint.begin('tula', staging_dir)
+    checkpoint.mark_page('tula', 'afisha/theatre', 1, [{'title': 'A'}])
+    checkpoint.mark_detail('tula', 'afisha', 'https://a/1')
+
+    assert checkpoint.staging_dir('tula') == staging_dir
+    assert checkpoint.page_cards('tula', 'afisha/theatre', 1) == [{'title': 'A'}]
+    assert checkpoint.page_cards('tula', 'afisha/theatre', 2) is None
+    assert checkpoint.detail_done('tula', 'afisha', 'https://a/1')
+
+    checkpoint.finish('tula')
+    assert checkpoint.staging_dir('tula') is None
+    assert checkpoint.page_cards('tula', 'afisha/theatre', 1) is None
+    assert not checkpoint.detail_done('tula', 'afisha', 'https://a/1')
+
+
+def test_removed_staging_dir_is_forgotten(tmp_path, checkpoint):
+    checkpoint.begin('tula', str(tmp_path / 'удалена'))
+    assert checkpoint.staging_dir('tula') is None
+
+
+def test_resumed_crawl_reuses_staging_and_saved_events(tmp_path, monkeypatch, checkpoint):
+    monkeypatch.setattr(run_parsers, 'OUTPUT_ROOT', str(tmp_path / 'spectacles'))
+    city = get_city()
+    _, staging_dir, _, resumed = run_parsers.begin_city(city, checkpoint)
+    assert not resumed
+
+    parser = AfishaParser(output_root=staging_dir)
+    parser.checkpoint = checkpoint
+    card = {'title': 'A', 'event_url': 'https://a/1'}
+    parser._store_event(EventData(title='A', price='500 ₽'), card)
+
+    # Следующий запуск продолжает ту же папку и не загружает сохранённое событие заново
+    _, resumed_dir, _, resumed = run_parsers.begin_city(city, checkpoint)
+    assert resumed and resumed_dir == staging_dir
+    assert parser._event_without_download(card) == (True, EventData(title='A', price='500 ₽'))
+
+
+def test_failed_publish_keeps_checkpoint(tmp_path, monkeypatch, checkpoint):
+    monkeypatch.setattr(run_parsers, 'OUTPUT_ROOT', str(tmp_path / 'spectacles'))
+    city = get_city()
+    generations, staging_dir, previous, _ = run_parsers.begin_city(city, checkpoint)
+
+    with mock.patch.object(generations, 'publish', side_effect=OSError('No space left on device')):
+        with pytest.raises(OSError):
+            run_parsers.publish_city(city, generations, staging_dir, previous, {'afisha': []}, checkpoint)
+    # Запуск можно продолжить: контрольная точка и папка staging на месте
+    assert checkpoint.staging_dir(city.slug) == staging_dir
+
+    run_parsers.publish_city(city, generations, staging_dir, previous, {'afisha': []}, checkpoint)
+    assert checkpoint.staging_dir(city.slug) is None
+    assert generations.current() is not None
@@ -0,0 +1,28 @@
+import os
+import pytest
+from parsers.afisha_parser import AsyncAfishaParser
+from parsers.cities import DEFAULT_CITY, city_root, get_cities, get_city
+from parsers.culture_parser import AsyncCultureParser
+from parsers.mts_parser import MTSParser
+
+
+def test_get_city():
+    assert get_city().slug == DEFAULT_CITY
+    assert [city.slug for city in get_cities(['moscow', 'spb'])] == ['moscow', 'spb']
+    with pytest.raises(ValueError):
+        get_city('paris')
+
+
+def test_city_root():
+    # Основной город остаётся в корне каталога, остальные - в своих папках
+    assert city_root('spectacles', get_city()) == 'spectacles'
+    assert city_root('spectacles', get_city('moscow')) == os.path.join('spectacles', 'cities', 'moscow')
+
+
+def test_parsers_use_city_slugs():
+    moscow = get_city('moscow')
+    assert MTSParser(city=moscow).listing_url().startswith('https://live.mts.ru/moscow/')
+    assert '/afisha/moskva/' in AsyncCultureParser(city=moscow).listing_url()
+    assert not moscow.supports('afisha')
+    with pytest.raises(ValueError):
+        AsyncAfishaParser(city=moscow)
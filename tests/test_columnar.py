@@ -0,0 +1,74 @@
+import os
+from datetime import datetime
+from catalog.columnar import ColumnarSnapshot, write_snapshot
+from catalog.fields import parse_age, parse_date_range, parse_price
+from catalog.generations import CatalogGenerations
+from tests.helpers import make_generation
+
+
+def test_parse_fields():
+    assert parse_price('от 500 до 1 500 ₽') == (500, 1500)
+    assert parse_price('Бесплатно') == (0, 0)
+    # Несколько цен через пробел - разные числа, а не одно склеенное
+    assert parse_price('500 1000 2000 руб') == (500, 2000)
+    assert parse_price('от 1\xa0000 000 ₽') == (1000000, 1000000)
+    assert parse_price(None) == (None, None)
+    assert parse_age('Драма • 16+') == 16
+    assert parse_age('без ограничений') is None
+
+    assert parse_date_range('7 апреля 2025, 19:00') == (datetime(2025, 4, 7, 19), datetime(2025, 4, 7, 19))
+    # Начало периода, перешедшего через Новый год, - в предыдущем году
+    start, end = parse_date_range('С 15 декабря по 4 апреля 2025')
+    assert (start.year, start.month, end.year, end.month) == (2024, 12, 2025, 4)
+    assert parse_date_range(None) == (None, None)
+
+
+def test_snapshot_round_trip(tmp_path):
+    generations = CatalogGenerations(str(tmp_path))
+    staging_dir = make_generation(generations, {
+        'Чайка': {'title': 'Чайка', 'date': '7 апреля 2025, 19:00', 'price': 'от 500 до 1500 ₽',
+                  'age_limit': '16+', 'place_name': 'МХТ', 'tags': ['Драма', 'Классика'], 'image': 'a.jpg'},
+        'Без цены': {'title': 'Без цены'},
+    })
+    culture_dir = os.path.join(staging_dir, 'culture', 'Выставка')
+    os.makedirs(culture_dir)
+    with open(os.path.join(culture_dir, 'event_details.json'), 'w', encoding='utf-8') as f:
+        f.write('{"title": "Выставка", "place_name": "МХТ", "price": "Бесплатно"}')
+
+    snapshot = ColumnarSnapshot(write_snapshot(staging_dir), path_prefix='generation')
+    try:
+        assert len(snapshot) == 3
+        assert [event['title'] for event in snapshot] == ['Без цены', 'Чайка', 'Выставка']
+
+        event = snapshot[1]
+        assert event['id'] == 1 and event['source_slug'] == 'afisha'
+        assert event['tags'] == ['Драма', 'Классика']
+        assert (event['price_min'], event['price_max'], event['age']) == (500, 1500, 16)
+        assert event['start_ts'] == int(datetime(2025, 4, 7, 19).timestamp())
+        assert event['path'] == os.path.join('generation', 'afisha', 'Чайка')
+
+        # Неизвестные значения не путаются с нулём, а одна площадка хранится один раз
+        empty = snapshot[0]
+        assert empty['price_min'] is None and empty['start_ts'] is None and empty['tags'] == []
+        assert snapshot[2]['price_min'] == 0 and snapshot[2]['place_name'] == 'МХТ'
+
+        assert snapshot.index_of(os.path.join('generation', 'culture', 'Выставка')) == 2
+        assert snapshot.index_of('generation/afisha/нет такого') is None
+        assert snapshot.details(1)['image'] == 'a.jpg'
+        assert [event['title'] for event in snapshot[1:]] == ['Чайка', 'Выставка']
+    finally:
+        snapshot.close()
+
+
+def test_snapshot_with_several_prices_on_a_card(tmp_path):
+    generations = CatalogGenerations(str(tmp_path))
+    staging_dir = make_generation(generations, {
+        'Концерт': {'title': 'Концерт', 'price': '500 1000 2000 руб'},
+        'Опечатка': {'title': 'Опечатка', 'price': '99999999999999999999 ₽'},
+    }, source='mts')
+
+    snapshot = ColumnarSnapshot(write_snapshot(staging_dir))
+    try:
+        assert [(event['price_min'], event['price_max']) for event in snapshot] == [(500, 2000), (None, None)]
+    finally:
+        snapshot.close()
@@ -0,0 +1,105 @@
+import asyncio
+import functools
+import json
+import os
+import time
+from datetime import datetime, timedelta
+import pytest
+from catalog.generations import CatalogGenerations
+from parsers.base_parser import BaseParser, EventData
+from parsers.cities import get_city
+from parsers.registry import ParserSpec, run_parser
+from run_parsers import CrawlContext, crawl_source
+from tests import helpers
+
+
+class SlowParser(BaseParser):
+    """Синхронный парсер, который дописывает начатую загрузку уже после лимита времени"""
+    SOURCE_NAME = 'afisha'
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.finished = False
+
+    def parse_events(self):
+        while not self._time_is_up():
+            time.sleep(0.01)
+        time.sleep(0.2)
+        self.finished = True
+        return []
+
+
+def test_timeout_waits_for_sync_parser_thread(tmp_path):
+    parser = SlowParser(output_root=str(tmp_path))
+    parser.deadline = time.monotonic() + 0.05
+
+    async def crawl():
+        await asyncio.wait_for(run_parser(parser), 0.05)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(crawl())
+    # Поток закончил работу до возврата: публикация не пересечётся с его записью
+    assert parser.finished
+
+
+class PartialParser(SlowParser):
+    """Сохраняет одно событие и бросает остальные страницы списка по лимиту времени"""
+
+    def __init__(self, concurrency=1, detail_max_age=None, linger=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.linger = linger
+
+    def parse_events(self):
+        event = EventData(**helpers.event('A'))
+        self._save_event(event)
+        while not self._time_is_up():
+            time.sleep(0.01)
+        time.sleep(self.linger)
+        return [event]
+
+
+def crawl_partial(tmp_path, linger):
+    generations = CatalogGenerations(str(tmp_path / 'spectacles'))
+    staging_dir = helpers.make_generation(generations, {'A': helpers.event('A'), 'B': helpers.event('B')})
+    with open(os.path.join(staging_dir, 'afisha', 'B', BaseParser.CARD_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'event_url': 'https://example.org/b'}, f)
+    generations.publish(staging_dir)
+
+    spec = ParserSpec(name='afisha', factory=functools.partial(PartialParser, linger=linger), concurrency=1)
+    context = CrawlContext(deadline=time.monotonic() + 0.2, drain=0.1, skipped_report={})
+    staging_dir = generations.begin()
+    events = asyncio.run(crawl_source(spec, staging_dir, generations.current_dir(), context))
+    return staging_dir, events, context.skipped_report
+
+
+@pytest.mark.parametrize('linger', [0.0, 0.3])
+def test_unreached_events_carried_over_and_reported(tmp_path, linger):
+    # linger=0.3 - парсер не укладывается в общий лимит и прерывается по таймауту
+    staging_dir, events, report = crawl_partial(tmp_path, linger)
+
+    assert sorted(event.title for event in events) == ['A', 'B']
+    assert os.path.exists(os.path.join(staging_dir, 'afisha', 'B', 'event_details.json'))
+    assert report[f"{get_city().slug}/afisha"] == [
+        {'title': 'B', 'event_url': 'https://example.org/b', 'kept_previous': True}]
+
+
+def test_cards_ordered_by_priority(tmp_path):
+    previous_root = str(tmp_path / 'previous')
+    previous = PartialParser(output_root=previous_root)
+    later = (datetime.now() + timedelta(days=20)).strftime('%d.%m.%Y 19:00')
+    for title in ('Позже', 'Избранное'):
+        card = {'title': title, 'event_url': f'https://example.org/{title}', 'date': later}
+        previous._store_event(EventData(title=title, date=later), card)
+
+    parser = PartialParser(output_root=str(tmp_path / 'staging'), previous_root=previous_root)
+    parser.prioritize = True
+    parser.favourites = {'Избранное'}
+    cards = [
+        {'title': 'Позже', 'event_url': 'https://example.org/Позже', 'date': later},
+        {'title': 'Избранное', 'event_url': 'https://example.org/Избранное', 'date': later},
+        {'title': 'Новое', 'event_url': 'https://example.org/Новое', 'date': later},
+        {'title': 'Завтра', 'event_url': 'https://example.org/Завтра',
+         'date': (datetime.now() + timedelta(days=1)).strftime('%d.%m.%Y 19:00')},
+    ]
+    # Ближайшие показы, затем новые и изменившиеся карточки, затем избранное, затем остальное
+    assert [card['title'] for card in parser._prioritized(cards)] == ['Завтра', 'Новое', 'Избранное', 'Позже']
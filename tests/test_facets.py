@@ -0,0 +1,44 @@
+from catalog.facets import FacetIndex, price_bucket
+from catalog.generations import CatalogGenerations
+from catalog.store import CatalogStore
+from tests.helpers import event, make_generation
+
+EVENTS = [
+    {'source_slug': 'afisha', 'place_name': 'МХТ', 'tags': ['драма'], 'age_limit': '16+', 'price': '500 ₽'},
+    {'source_slug': 'afisha', 'place_name': 'Ленком', 'tags': ['комедия'], 'age_limit': '12+', 'price': '1500 ₽'},
+    {'source_slug': 'culture', 'place_name': 'МХТ', 'tags': ['драма', 'классика'], 'price': 'Бесплатно'},
+]
+
+
+def test_price_bucket():
+    assert price_bucket(None) is None
+    assert price_bucket(0) == 'Бесплатно'
+    assert price_bucket(499) == 'до 500 ₽'
+    assert price_bucket(2000) == 'от 2000 ₽'
+
+
+def test_query_intersects_facets_and_counts_alternatives():
+    index = FacetIndex(EVENTS)
+    assert index.query()['total'] == 3
+
+    result = index.query({'venue': ['МХТ'], 'tags': ['драма']})
+    assert result['ids'] == [0, 2]
+    # Счётчики фасета не учитывают его собственное условие
+    assert result['counts']['venue'] == {'МХТ': 2, 'Ленком': 0}
+    assert result['counts']['source'] == {'afisha': 1, 'culture': 1}
+
+    assert index.query({'source': ['afisha', 'culture'], 'venue': ['Ленком']})['ids'] == [1]
+
+
+def test_store_query_carries_catalog_version(tmp_path):
+    generations = CatalogGenerations(str(tmp_path / 'spectacles'))
+    store = CatalogStore(str(tmp_path), generations, ['afisha'])
+    generations.publish(make_generation(generations, {'A': event('A')}))
+    assert store.query_facets()['version'] == 1
+
+    generations.publish(make_generation(generations, {'A': event('A'), 'B': event('B')}))
+    store.reload()
+    version, events = store.snapshot()
+    result = store.query_facets()
+    assert result['version'] == version == 2
+    assert result['total'] == len(events) == 2
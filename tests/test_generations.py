@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import sys
+from catalog.generations import CatalogGenerations
+from tests.helpers import event, make_generation
+
+
+def test_publish_switches_current(tmp_path):
+    generations = CatalogGenerations(str(tmp_path))
+    assert generations.current() is None
+
+    generation = generations.publish(make_generation(generations, {'A': event('A')}))
+    assert generations.current() == generation
+    assert generations.list_generations() == [generation]
+    assert os.path.isfile(os.path.join(generations.current_dir(), 'afisha', 'A', 'event_details.json'))
+    assert not os.listdir(generations.staging_path)
+
+
+def test_diff_and_rollback(tmp_path):
+    generations = CatalogGenerations(str(tmp_path))
+    first = generations.publish(make_generation(generations, {'A': event('A'), 'B': event('B')}))
+    second = generations.publish(make_generation(generations, {'A': event('A', price='700 ₽'), 'C': event('C')}))
+
+    assert generations.diff(first, second) == {'added': ['afisha/C'], 'removed': ['afisha/B'],
+                                              'changed': ['afisha/A']}
+    assert generations.rollback() == first
+    assert generations.current() == first
+    assert generations.rollback('missing') is None
+
+
+def test_carry_over_keeps_previous_source(tmp_path):
+    generations = CatalogGenerations(str(tmp_path))
+    generations.publish(make_generation(generations, {'A': event('A')}, source='mts'))
+    staging_dir = make_generation(generations, {'B': event('B')})
+    generation = generations.publish(staging_dir, carry_over=['mts'])
+
+    assert set(generations.manifest(generation)) == {'afisha/B', 'mts/A'}
+
+
+def test_prune_keeps_current_and_held(tmp_path):
+    generations = CatalogGenerations(str(tmp_path), keep=2)
+    first = generations.publish(make_generation(generations, {'A': event('A')}))
+    generations.hold('reader', [first])
+    for title in ('B', 'C', 'D'):
+        generations.publish(make_generation(generations, {title: event(title)}))
+
+    remaining = generations.list_generations()
+    assert first in remaining
+    assert len(remaining) == 3
+
+    generations.hold('reader', [])
+    generations.publish(make_generation(generations, {'E': event('E')}))
+    assert first not in generations.list_generations()
+    assert len(generations.list_generations()) == 2
+
+
+def test_hold_of_finished_process_is_dropped(tmp_path):
+    generations = CatalogGenerations(str(tmp_path))
+    first = generations.publish(make_generation(generations, {'A': event('A')}))
+    finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                              capture_output=True, text=True, check=True)
+    os.makedirs(generations.holds_path, exist_ok=True)
+    hold_path = os.path.join(generations.holds_path, 'catalog-store-crashed')
+    with open(hold_path, 'w', encoding='utf-8') as f:
+        json.dump({'pid': int(finished.stdout), 'generations': [first]}, f)
+
+    assert generations.held() == set()
+    assert not os.path.exists(hold_path)
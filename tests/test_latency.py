@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from parsers.latency import DEFAULT_TIMEOUT, MAX_TIMEOUT, MIN_TIMEOUT, LatencyTracker, percentile
+
+HOST = 'example.org'
+URL = f'https://{HOST}/events/1'
+
+
+def tracker_with(samples):
+    tracker = LatencyTracker(min_samples=10)
+    for seconds in samples:
+        tracker.observe(HOST, seconds)
+    return tracker
+
+
+def test_percentile():
+    samples = [float(value) for value in range(1, 101)]
+    assert percentile(samples, 0.5) == 51
+    assert percentile(samples, 0.99) == 100
+    assert percentile([3.0], 0.95) == 3
+
+
+def test_adaptive_timeout():
+    # Пока замеров мало - таймаут по умолчанию
+    assert tracker_with([0.1] * 5).timeout(HOST) == DEFAULT_TIMEOUT
+    assert tracker_with([0.1] * 5).hedge_delay(HOST) is None
+    assert tracker_with([1.0] * 20).timeout(HOST) == 3.0
+    # Таймаут ограничен снизу и сверху
+    assert tracker_with([0.01] * 20).timeout(HOST) == MIN_TIMEOUT
+    assert tracker_with([60.0] * 20).timeout(HOST) == MAX_TIMEOUT
+
+
+def test_hedged_request_wins_over_slow_primary():
+    tracker = tracker_with([0.01] * 20)
+    attempts = []
+
+    async def fetch(timeout):
+        attempts.append(timeout)
+        # Первый запрос "завис", дублирующий отвечает сразу
+        await asyncio.sleep(1 if len(attempts) == 1 else 0)
+        return len(attempts)
+
+    assert asyncio.run(tracker.fetch(URL, fetch, hedge=True)) == 2
+    stats, = tracker.stats()
+    assert (stats.hedges, stats.hedge_wins) == (1, 1)
+    # Отменённый основной запрос записан временем, которое он уже прождал, а не пропущен
+    assert stats.samples == 22
+    assert max(tracker._samples[HOST]) >= 0.01
+
+
+def test_timeouts_are_observed():
+    tracker = LatencyTracker(min_samples=1)
+
+    async def fetch(timeout):
+        raise asyncio.TimeoutError()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(tracker.fetch(URL, fetch))
+    # Истёкший таймаут засчитывается как время ответа, и таймаут хоста растёт
+    assert tracker.stats()[0].p50 == DEFAULT_TIMEOUT
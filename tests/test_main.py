@@ -0,0 +1,40 @@
+from unittest import mock
+import eel
+import pytest
+import main
+from catalog.generations import CatalogGenerations
+from catalog.store import CatalogStore
+from tests.helpers import event, make_generation
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    generations = CatalogGenerations(str(tmp_path / 'spectacles'))
+    generations.publish(make_generation(generations, {f'Событие {i:03}': event(f'Событие {i:03}') for i in range(250)}))
+    store = CatalogStore(str(tmp_path), generations, main.SPECTACLE_SOURCES)
+    monkeypatch.setattr(main, 'catalog', store)
+    return store
+
+
+def test_stream_events_in_growing_chunks(catalog, monkeypatch):
+    received = []
+    monkeypatch.setattr(eel, 'receive_events_chunk', lambda *args: received.append(args), raising=False)
+    monkeypatch.setattr(eel, 'sleep', lambda seconds: None)
+
+    main._stream_events(7)
+
+    assert [(request_id, len(chunk), done, version) for request_id, chunk, done, version in received] == [
+        (7, main.STREAM_FIRST_CHUNK, False, 1),
+        (7, main.STREAM_CHUNK, False, 1),
+        (7, 250 - main.STREAM_FIRST_CHUNK - main.STREAM_CHUNK, True, 1),
+    ]
+    assert received[0][1][0]['title'] == 'Событие 000'
+
+
+def test_warm_up_builds_catalog_and_indexes(catalog):
+    with mock.patch.object(main, 'favourite_names') as favourites, mock.patch.object(main, 'get_accounts') as accounts:
+        main.warm_up()
+    assert catalog.version == 1
+    assert set(catalog._indexes) >= {'facets', 'time'}
+    favourites.assert_called_once()
+    accounts.assert_called_once()
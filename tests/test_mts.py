@@ -0,0 +1,84 @@
+import json
+import requests
+from parsers.mts_parser import MTSParser
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.content = text.encode('utf-8')
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """Сессия requests, отдающая страницы из словаря адрес -> текст и считающая запросы"""
+
+    def __init__(self, pages=None):
+        self.pages = pages or {}
+        self.requests = []
+
+    def get(self, url, timeout=None):
+        self.requests.append(url)
+        if url not in self.pages:
+            raise requests.HTTPError(f'404 {url}')
+        return FakeResponse(self.pages[url])
+
+
+def item(slug, **fields):
+    return {'title': slug, 'url': f'/tula/event/{slug}', 'date': '2025-04-07T16:00:00Z', **fields}
+
+
+def data(*items, build_id='b1'):
+    return {'buildId': build_id, 'props': {'pageProps': {'menu': [{'title': 'Афиша', 'url': '/tula'}],
+                                                         'events': list(items)}}}
+
+
+def test_card_price():
+    assert MTSParser._card_price({'minPrice': 1500}) == 'от 1500 ₽'
+    assert MTSParser._card_price({'minPrice': 1000000.0}) == 'от 1000000 ₽'
+    assert MTSParser._card_price({'price': {'min': 0}}) == 'Бесплатно'
+    assert MTSParser._card_price({'price': ' от 700 ₽ '}) == 'от 700 ₽'
+    assert MTSParser._card_price({}) == 'Цена не указана'
+
+
+def test_cards_from_data():
+    parser = MTSParser(session=FakeSession())
+    cards = parser._cards_from_data(data(item('gamlet', minPrice=500, venue={'title': 'Театр драмы'})))
+    # Пункт меню без даты карточкой не считается
+    assert cards == [{'title': 'gamlet', 'price': 'от 500 ₽', 'date': '7 апреля 2025, 19:00',
+                      'venue': 'Театр драмы', 'event_url': f'{parser.base_url}/tula/event/gamlet'}]
+    assert parser._cards_from_data({'props': {'pageProps': {'menu': []}}}) is None
+
+
+def test_pages_after_first_are_read_as_json():
+    parser = MTSParser(session=FakeSession())
+    assert parser.data_url(2) is None
+    first_page = (f'<script id="__NEXT_DATA__" type="application/json">'
+                  f'{json.dumps(data(item("a"), item("b")))}</script>')
+    parser.session.pages = {parser.listing_url(): first_page}
+    assert len(parser.parse_listing(1)) == 2
+
+    # Номер сборки взят из первой страницы
+    assert parser.data_url(2) == f'{parser.base_url}/_next/data/b1/tula/collections/theater.json?page=2'
+    # За последней страницей сайт повторяет её события
+    for number in range(2, 6):
+        parser.session.pages[parser.data_url(number)] = json.dumps(data(item('c')))
+
+    cards = parser._listing_cards()
+    assert [card['title'] for card in cards] == ['a', 'b', 'c']
+    assert not any('?page=' in url and '_next' not in url for url in parser.session.requests)
+
+
+def test_html_fallback_without_next_data():
+    parser = MTSParser(session=FakeSession())
+    card = ('<div class="AnnouncementPreview_description__AVWrS">'
+            '<a data-type="nazvanie_meropriyatiya" title="Гамлет" href="/tula/event/gamlet"></a>'
+            '<a data-type="cena">от 500 ₽</a><time>7 апреля</time></div>')
+    parser.session.pages = {parser.listing_url(): card, parser.listing_url(2): card}
+
+    assert parser.parse_listing(1)[0]['title'] == 'Гамлет'
+    # Без номера сборки следующие страницы тоже читаются из HTML
+    assert parser.parse_listing(2)[0]['price'] == 'от 500 ₽'
+    assert parser.session.requests == [parser.listing_url(), parser.listing_url(2)]
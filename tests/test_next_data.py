@@ -0,0 +1,72 @@
+import json
+from parsers.culture_parser import AsyncCultureParser
+from parsers.next_data import extract_next_data, format_date_range, plain_text, to_datetime
+
+EVENT_URL = 'https://www.culture.ru/events/4242/gamlet'
+
+
+def page(data):
+    return (f'<html><body><div id="__next"></div>'
+            f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(data, ensure_ascii=False)}</script>'
+            f'</body></html>')
+
+
+def test_extract_next_data():
+    assert extract_next_data(page({'props': {'pageProps': {'a': 1}}})) == {'props': {'pageProps': {'a': 1}}}
+    assert extract_next_data('<html><body>Без данных</body></html>') is None
+    assert extract_next_data('<script id="__NEXT_DATA__">{повреждён</script>') is None
+
+
+def test_next_price():
+    assert AsyncCultureParser._next_price({'price': 1000000.0}) == '1000000 ₽'
+    assert AsyncCultureParser._next_price({'price': {'min': 0}}) == 'Бесплатно'
+    assert AsyncCultureParser._next_price({'isFree': True, 'price': 500}) == 'Бесплатно'
+
+
+def test_value_helpers():
+    assert plain_text('<p>Пьеса&nbsp;в  <b>двух</b> актах</p>') == 'Пьеса в двух актах'
+    start = to_datetime('2025-04-07T16:00:00Z')
+    assert (start.hour, start.day) == (19, 7)
+    # Метка в миллисекундах и в секундах - один и тот же момент
+    assert to_datetime(1744041600000) == to_datetime(1744041600)
+    assert format_date_range(start, None) == '7 апреля 2025, 19:00'
+    assert format_date_range(start, to_datetime('2025-05-01T16:00:00Z')) == '7 апреля 2025 - 1 мая 2025'
+
+
+def test_event_from_next_data():
+    parser = AsyncCultureParser()
+    event = {'id': 4242, 'title': 'Гамлет', 'description': '<p>Трагедия</p>', 'startDate': '2025-04-07T16:00:00Z',
+             'price': {'min': 300}, 'ageRestriction': 16, 'tags': [{'name': 'Драма'}],
+             'places': [{'title': 'Театр драмы', 'address': {'fullAddress': 'Тула, пр. Ленина, 34а'}}],
+             'image': {'url': '/_next/image?url=https%3A%2F%2Fcdn.culture.ru%2Fa.jpg&w=640'}, 'saleLink': 'x'}
+    similar = {'id': 7, 'title': 'Чайка', 'description': 'Комедия'}
+    html = page({'props': {'pageProps': {'event': event, 'similar': [similar]}}})
+
+    assert parser._event_from_next_data(html, EVENT_URL) == {
+        'age_limit': '16+',
+        'date': '7 апреля 2025, 19:00',
+        'price': '300 ₽',
+        'ticket_link': EVENT_URL,
+        'full_description': 'Трагедия',
+        'tags': ['Драма'],
+        'image': 'https://cdn.culture.ru/a.jpg',
+        'place_name': 'Театр драмы',
+        'place_address': 'Тула, пр. Ленина, 34а',
+    }
+    # Несколько событий и ни одно не совпало с адресом: данные не распознаны, нужен разбор DOM
+    assert parser._event_from_next_data(html, 'https://www.culture.ru/events/1/drugoe') is None
+    assert parser._event_from_next_data('<html></html>', EVENT_URL) is None
+
+
+def test_cards_from_next_data():
+    parser = AsyncCultureParser()
+    items = [{'title': ' Гамлет ', 'url': '/events/1/gamlet'}, {'title': 'Чайка', 'url': '/events/2/chayka'},
+             {'title': 'Гамлет', 'url': '/events/1/gamlet'}]
+    menu = [{'title': 'Музеи', 'url': '/museums'}]
+    html = page({'props': {'pageProps': {'menu': menu, 'events': {'items': items}}}})
+
+    assert parser._cards_from_next_data(html) == [
+        {'title': 'Гамлет', 'event_url': f'{parser.base_url}/events/1/gamlet'},
+        {'title': 'Чайка', 'event_url': f'{parser.base_url}/events/2/chayka'},
+    ]
+    assert parser._cards_from_next_data(page({'props': {'pageProps': {'menu': menu}}})) is None
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import os
+import time
+from unittest import mock
+import pytest
+from parsers.async_parser import AsyncHttpParser
+from parsers.base_parser import BaseParser, EventData, process_bounded
+from tests.helpers import FakeSession
+
+URL = 'https://example.org/events/1'
+
+
+class AfishaParser(BaseParser):
+    SOURCE_NAME = 'afisha'
+
+
+def test_event_without_download(tmp_path):
+    parser = BaseParser(output_root=str(tmp_path))
+    card = {'title': 'A', 'event_url': URL}
+    assert parser._event_without_download(card) == (False, None)
+
+    parser.deadline = time.monotonic() - 1
+    # Прежней версии нет: событие пропускается без загрузки и попадает в отчёт
+    assert parser._event_without_download(card) == (True, None)
+    assert parser.skipped == [{'title': 'A', 'event_url': URL, 'kept_previous': False}]
+
+
+def test_concurrent_fetches_share_one_download(tmp_path):
+    session = FakeSession({URL: '<h1>A</h1>'})
+    parser = AsyncHttpParser(session=session, output_root=str(tmp_path))
+    parser.archive = mock.Mock()
+
+    async def fetch_twice():
+        return await asyncio.gather(parser._fetch_html(URL, detail=True), parser._fetch_html(URL, detail=True))
+
+    assert asyncio.run(fetch_twice()) == ['<h1>A</h1>', '<h1>A</h1>']
+    assert session.requests == [URL]
+    parser.archive.put.assert_called_once_with(URL, '<h1>A</h1>')
+    assert parser.page_stats.downloads == 1
+
+
+def test_process_bounded_limits_in_flight_work():
+    in_flight = 0
+    peak = 0
+
+    async def worker(item):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        return item if item % 2 else None
+
+    results = asyncio.run(process_bounded(iter(range(20)), worker, 3))
+    assert peak == 3
+    # Пустые результаты отбрасываются
+    assert sorted(results) == list(range(1, 20, 2))
+
+
+def previous_generation(tmp_path, card, fetched_at):
+    """Опубликованное поколение с событием A, сохранённым по карточке card"""
+    previous = AfishaParser(output_root=str(tmp_path / 'previous'))
+    previous._store_event(EventData(title='A', price='500 ₽'), card)
+    card_path = previous._card_path('A')
+    with open(card_path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    state['fetched_at'] = fetched_at
+    with open(card_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    return str(tmp_path / 'previous')
+
+
+@pytest.mark.parametrize('card_change, age, detail_max_age, reused', [
+    ({}, 60, 3600, True),
+    ({'price': '700 ₽'}, 60, 3600, False),  # Карточка изменилась
+    ({}, 7200, 3600, False),  # Страница устарела
+    ({}, 60, None, False),  # Источник всегда перечитывает страницы
+])
+def test_unchanged_card_reuses_previous_event(tmp_path, card_change, age, detail_max_age, reused):
+    card = {'title': 'A', 'event_url': URL, 'price': '500 ₽'}
+    previous_root = previous_generation(tmp_path, card, time.time() - age)
+    parser = AfishaParser(output_root=str(tmp_path / 'staging'), previous_root=previous_root,
+                          detail_max_age=detail_max_age)
+
+    event = parser._load_fresh_event(dict(card, **card_change))
+    assert (event is not None) == reused
+    assert parser.unchanged_cards == int(reused)
+    # Перенесённое событие попадает в новое поколение вместе с отпечатком карточки
+    assert os.path.exists(parser._card_path('A')) == reused
@@ -0,0 +1,75 @@
+import asyncio
+import os
+import tracemalloc
+import pytest
+import run_parsers
+from catalog.generations import CatalogGenerations
+from parsers.base_parser import BaseParser, EventData
+from parsers.cities import get_city
+from parsers.registry import HOUR, PARSER_REGISTRY, ParserSpec, get_specs
+from run_parsers import _seconds_until_due, crawl_once, parse_args
+
+
+class StaticParser(BaseParser):
+    """Синхронный парсер, сохраняющий заранее заданные события"""
+    SOURCE_NAME = 'afisha'
+
+    def __init__(self, concurrency=1, detail_max_age=None, **kwargs):
+        super().__init__(detail_max_age=detail_max_age, **kwargs)
+
+    def parse_events(self):
+        events = [EventData(title='Вишнёвый сад', price='500 ₽'), EventData(title='Чайка')]
+        for event in events:
+            self._save_event(event)
+        return events
+
+
+def test_get_specs():
+    assert get_specs() == list(PARSER_REGISTRY.values())
+    assert [spec.name for spec in get_specs(['mts', 'afisha'])] == ['mts', 'afisha']
+    with pytest.raises(ValueError):
+        get_specs(['unknown'])
+
+
+def test_seconds_until_due():
+    city = get_city()
+    spec = ParserSpec(name='afisha', factory=StaticParser, concurrency=1, refresh_interval=HOUR)
+    # Источник ещё не обходился - обход нужен сразу
+    assert _seconds_until_due(city, spec, {}, 1.7e9) == 0
+    state = {f"{city.slug}/afisha": 1000.0}
+    assert _seconds_until_due(city, spec, state, 1000.0 + 600) == HOUR - 600
+    assert _seconds_until_due(city, spec, state, 1000.0 + 2 * HOUR) == 0
+
+
+def test_parse_args():
+    args = parse_args(['--sources', 'afisha', '--max-time', '60'])
+    assert args.sources == ['afisha'] and args.max_time == 60
+    assert not args.loop
+    with pytest.raises(SystemExit):
+        parse_args(['--sources', 'unknown'])
+
+
+def test_crawl_once_saves_events(tmp_path, monkeypatch):
+    monkeypatch.setattr(run_parsers, 'OUTPUT_ROOT', str(tmp_path))
+    spec = ParserSpec(name='afisha', factory=StaticParser, concurrency=1)
+
+    results = asyncio.run(crawl_once([spec]))
+
+    assert [event.title for event in results['afisha']] == ['Вишнёвый сад', 'Чайка']
+    generations = CatalogGenerations(str(tmp_path))
+    assert sorted(os.listdir(os.path.join(generations.current_dir(), 'afisha'))) == ['Вишнёвый сад', 'Чайка']
+
+
+def test_traced_peak():
+    with run_parsers.traced_peak('off', None):
+        pass
+
+    report = {}
+    tracemalloc.start()
+    try:
+        with run_parsers.traced_peak('tula/afisha', report):
+            data = bytearray(1 << 20)
+        del data
+    finally:
+        tracemalloc.stop()
+    assert report['tula/afisha'] >= 1 << 20
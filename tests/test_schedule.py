@@ -0,0 +1,67 @@
+from datetime import datetime
+import pytest
+from catalog.schedule import TimeIndex, expand_sessions, period_bounds
+
+
+NOW = datetime(2025, 4, 9, 15, 30)
+
+
+def ts(*args):
+    return int(datetime(*args).timestamp())
+
+
+def test_expand_sessions():
+    assert expand_sessions(ts(2025, 4, 7, 19), ts(2025, 4, 7, 19), NOW) == [ts(2025, 4, 7, 19)]
+    assert expand_sessions(ts(2025, 4, 7, 10), ts(2025, 4, 9, 18), NOW) == [
+        ts(2025, 4, 7, 10), ts(2025, 4, 8), ts(2025, 4, 9)]
+    # Дни считаются по календарю: показ с 20:00 до 10:00 через день занимает и третий день
+    assert expand_sessions(ts(2025, 4, 7, 20), ts(2025, 4, 9, 10), NOW) == [
+        ts(2025, 4, 7, 20), ts(2025, 4, 8), ts(2025, 4, 9)]
+
+
+def test_long_run_is_expanded_around_index_build_time():
+    sessions = expand_sessions(ts(2024, 1, 1), ts(2026, 12, 31), NOW)
+    # Начало прошлых лет не разворачивается: окно - со вчерашнего дня на год вперёд
+    assert sessions[:3] == [ts(2024, 1, 1), ts(2025, 4, 8), ts(2025, 4, 9)]
+    assert sessions[-1] == ts(2026, 4, 10)
+
+    index = TimeIndex([{'date': 'С 1 января 2024 по 31 декабря 2026'}], now=NOW)
+    assert index.event_ids_between(*period_bounds('today', NOW)) == [0]
+    assert index.event_ids_between(*period_bounds('week', NOW)) == [0]
+
+
+def test_sessions_ordered_by_time():
+    index = TimeIndex([
+        {'start_ts': ts(2025, 4, 9, 19), 'end_ts': ts(2025, 4, 9, 19)},
+        {'start_ts': ts(2025, 4, 7, 19), 'end_ts': ts(2025, 4, 7, 19)},
+        {'date': 'без даты'},
+    ], now=NOW)
+    assert index.event_ids_between(ts(2025, 4, 7), ts(2025, 4, 10)) == [1, 0]
+    assert index.event_ids_between(ts(2025, 4, 8), ts(2025, 4, 9)) == []
+
+
+def test_running_exhibition_is_today_after_midnight():
+    exhibition = {'start_ts': ts(2025, 4, 1, 10), 'end_ts': ts(2025, 4, 30, 18)}
+    index = TimeIndex([exhibition], now=NOW)
+    assert index.event_ids_between(*period_bounds('today', datetime(2025, 4, 9, 15))) == [0]
+
+
+def test_weekend_on_saturday_includes_saturday():
+    saturday_show = {'start_ts': ts(2025, 4, 12, 12), 'end_ts': ts(2025, 4, 12, 12)}
+    exhibition = {'start_ts': ts(2025, 4, 1, 10), 'end_ts': ts(2025, 4, 12, 18)}
+    index = TimeIndex([saturday_show, exhibition], now=NOW)
+
+    start, end = period_bounds('weekend', datetime(2025, 4, 12, 15))
+    assert (start, end) == (ts(2025, 4, 12), ts(2025, 4, 14))
+    assert set(index.event_ids_between(start, end)) == {0, 1}
+    # В воскресенье выходные всё ещё начинаются с субботы
+    assert period_bounds('weekend', datetime(2025, 4, 13, 9))[0] == ts(2025, 4, 12)
+    assert period_bounds('weekend', datetime(2025, 4, 9, 9)) == (ts(2025, 4, 12), ts(2025, 4, 14))
+
+
+def test_period_bounds_day_granular():
+    assert period_bounds('today', NOW) == (ts(2025, 4, 9), ts(2025, 4, 10))
+    assert period_bounds('tomorrow', NOW) == (ts(2025, 4, 10), ts(2025, 4, 11))
+    assert period_bounds('week', NOW) == (ts(2025, 4, 9), ts(2025, 4, 16))
+    with pytest.raises(ValueError):
+        period_bounds('year', NOW)
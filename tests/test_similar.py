@@ -0,0 +1,60 @@
+import os
+from unittest import mock
+import pytest
+from catalog.generations import CatalogGenerations
+from catalog.similar import SimilarIndex
+from catalog.store import CatalogStore
+from tests.helpers import make_generation
+
+# Рекомендации строятся только при установленных NumPy и SciPy
+pytest.importorskip('numpy')
+pytest.importorskip('scipy')
+
+EVENTS = {
+    'Чайка': {'title': 'Чайка', 'tags': ['Драма', 'Чехов'], 'full_description': 'Пьеса Чехова о театре'},
+    'Вишнёвый сад': {'title': 'Вишнёвый сад', 'tags': ['Драма', 'Чехов'], 'full_description': 'Пьеса Чехова'},
+    'Щелкунчик': {'title': 'Щелкунчик', 'tags': ['Балет'], 'full_description': 'Балет Чайковского'},
+    'Лебединое озеро': {'title': 'Лебединое озеро', 'tags': ['Балет'], 'full_description': 'Балет Чайковского'},
+    'Выставка': {'title': 'Выставка', 'tags': [], 'full_description': ''},
+}
+
+
+def test_similar_events(tmp_path):
+    generations = CatalogGenerations(str(tmp_path / 'spectacles'))
+    generations.publish(make_generation(generations, EVENTS))
+    store = CatalogStore(str(tmp_path), generations, ['afisha'])
+    paths = {event['title']: event['path'] for event in store.summaries()}
+
+    assert store.similar(paths['Чайка'], limit=1)[0]['title'] == 'Вишнёвый сад'
+    assert [event['title'] for event in store.similar(paths['Щелкунчик'], limit=1)] == ['Лебединое озеро']
+    # Событие без общих слов ни на что не похоже
+    assert store.similar(paths['Выставка']) == []
+    assert store.similar('нет/такого/события') == []
+
+
+def test_similar_uses_one_snapshot_across_reload(tmp_path):
+    generations = CatalogGenerations(str(tmp_path / 'spectacles'))
+    generations.publish(make_generation(generations, EVENTS))
+    store = CatalogStore(str(tmp_path), generations, ['afisha'])
+    path = next(event['path'] for event in store.summaries() if event['title'] == 'Чайка')
+    generations.publish(make_generation(generations, {'Другое': {'title': 'Другое', 'tags': ['Драма']}}))
+
+    def open_during_reload(events):
+        # Каталог подменяется, пока открывается индекс прежнего поколения
+        store.reload()
+        return SimilarIndex.open(os.path.dirname(events.path), len(events))
+
+    with mock.patch.object(store, '_open_similar', side_effect=open_during_reload):
+        assert store.similar(path, limit=1)[0]['title'] == 'Вишнёвый сад'
+    store.close_retired(force=True)
+
+
+def test_index_missing_or_stale(tmp_path):
+    generations = CatalogGenerations(str(tmp_path))
+    generation_dir = generations.generation_dir(generations.publish(make_generation(generations, EVENTS)))
+    index = SimilarIndex.open(generation_dir, len(EVENTS))
+    assert index is not None
+    index.close()
+    # Индекс другого числа событий не используется
+    assert SimilarIndex.open(generation_dir, len(EVENTS) + 1) is None
+    assert SimilarIndex.open(os.path.join(str(tmp_path), 'нет'), 0) is None
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+import pytest
+from parsers.base_parser import BaseParser, EventData
+from parsers.culture_parser import REPEATED_PAGES_LIMIT, AsyncCultureParser
+from parsers.single_flight import AsyncSingleFlight, SingleFlight
+from tests.helpers import FakeSession
+
+
+def test_async_calls_with_one_key_share_a_result():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'page'
+
+    async def run():
+        results = await asyncio.gather(*(flight.do('a', call) for _ in range(5)), flight.do('b', call))
+        # Завершённый вызов забыт: следующий запрос выполняется заново
+        results.append(await flight.do('a', call))
+        return results
+
+    assert asyncio.run(run()) == ['page'] * 7
+    assert len(calls) == 3
+
+
+def test_async_waiter_cancellation_keeps_the_call():
+    flight = AsyncSingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.02)
+        return 'page'
+
+    async def run():
+        first = asyncio.ensure_future(flight.do('a', call))
+        second = asyncio.ensure_future(flight.do('a', call))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == 'page'
+
+
+def test_threads_share_result_and_error():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        started.set()
+        release.wait(1)
+        return 'page'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('a', call)))
+    leader.start()
+    started.wait(1)
+    follower = threading.Thread(target=lambda: results.append(flight.do('a', call)))
+    follower.start()
+    # Даём второму потоку дойти до ожидания результата первого
+    time.sleep(0.05)
+    release.set()
+    leader.join()
+    follower.join()
+    assert results == ['page', 'page'] and len(calls) == 1
+
+    def fail():
+        raise ValueError('нет ответа')
+
+    with pytest.raises(ValueError):
+        flight.do('a', fail)
+
+
+def test_duplicate_cards_are_dropped(tmp_path):
+    parser = BaseParser(output_root=str(tmp_path))
+    first = parser._new_cards([{'event_url': 'a'}, {'event_url': 'b'}, {'event_url': 'a'}])
+    assert [card['event_url'] for card in first] == ['a', 'b']
+    # Перекрывающиеся страницы списка не дают повторной загрузки
+    assert parser._new_cards([{'event_url': 'b'}, {'event_url': 'c'}]) == [{'event_url': 'c'}]
+
+
+class RepeatedLastPage(dict):
+    """Страницы списка, за последней из которых сайт бесконечно повторяет её"""
+
+    def __init__(self, pages):
+        super().__init__(pages)
+        self.last = list(pages.values())[-1]
+
+    def __missing__(self, url):
+        return self.last
+
+
+def listing(*slugs):
+    return ''.join(f'<div class="CHPy6"><a href="/events/{slug}"><div class="p1Gbz">{slug}</div></a></div>'
+                   for slug in slugs)
+
+
+@pytest.mark.parametrize('prioritize', [False, True])
+def test_pages_of_seen_cards_end_the_listing(prioritize):
+    parser = AsyncCultureParser(session=FakeSession({}))
+    parser.prioritize = prioritize
+    parser.session.pages = RepeatedLastPage({parser.listing_url(1): listing('a', 'b'),
+                                             parser.listing_url(2): listing('b', 'c')})
+
+    async def process(card):
+        return EventData(title=card['title'])
+
+    with mock.patch.object(parser, '_process_single_event', side_effect=process):
+        events = asyncio.run(parser.parse_events())
+    assert sorted(event.title for event in events) == ['a', 'b', 'c']
+    # Повтор последней страницы читается REPEATED_PAGES_LIMIT раз, а не бесконечно
+    assert len(parser.session.requests) == 2 + REPEATED_PAGES_LIMIT
@@ -0,0 +1,141 @@
+import threading
+from datetime import datetime
+from unittest import mock
+from catalog.columnar import ColumnarSnapshot
+from catalog.generations import CatalogGenerations
+from catalog.schedule import TimeIndex
+from catalog.store import SUMMARY_FIELDS, CatalogStore, summarize
+from tests.helpers import event, make_generation
+
+
+def make_store(tmp_path):
+    generations = CatalogGenerations(str(tmp_path / 'spectacles'))
+    return generations, CatalogStore(str(tmp_path), generations, ['afisha', 'culture', 'mts'])
+
+
+def test_reads_published_snapshot(tmp_path):
+    generations, store = make_store(tmp_path)
+    generations.publish(make_generation(generations, {'A': event('A'), 'B': event('B')}))
+
+    assert isinstance(store.events, ColumnarSnapshot)
+    assert sorted(summary['title'] for summary in store.summaries()) == ['A', 'B']
+    assert set(summarize(store.events[0])) >= {'title', 'path', 'price'}
+
+
+def test_first_load_happens_once(tmp_path):
+    generations, store = make_store(tmp_path)
+    generations.publish(make_generation(generations, {'A': event('A')}))
+
+    barrier = threading.Barrier(8)
+
+    def read():
+        barrier.wait()
+        len(store.events)
+
+    with mock.patch.object(CatalogStore, '_load', wraps=store._load) as load:
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert load.call_count == 1
+    assert store.version == 1
+
+
+def test_readers_do_not_wait_for_reload(tmp_path):
+    generations, store = make_store(tmp_path)
+    generations.publish(make_generation(generations, {'A': event('A')}))
+    store.facets()
+    generations.publish(make_generation(generations, {'B': event('B')}))
+
+    building = threading.Event()
+    release = threading.Event()
+
+    def slow_snapshot(*args, **kwargs):
+        building.set()
+        release.wait(5)
+        return ColumnarSnapshot(*args, **kwargs)
+
+    with mock.patch('catalog.store.ColumnarSnapshot', side_effect=slow_snapshot):
+        reload = threading.Thread(target=store.reload)
+        reload.start()
+        assert building.wait(5)
+        # Пока новый снимок строится, запросы отвечают по прежнему без ожидания блокировки
+        assert store.query_facets()['version'] == 1
+        assert [summary['title'] for summary in store.summaries()] == ['A']
+        release.set()
+        reload.join()
+    assert store.version == 2 and store.events[0]['title'] == 'B'
+
+
+def test_reload_if_published(tmp_path):
+    generations, store = make_store(tmp_path)
+    generations.publish(make_generation(generations, {'A': event('A')}))
+    assert len(store.events) == 1
+    assert not store.reload_if_published()
+
+    generations.publish(make_generation(generations, {'B': event('B')}))
+    assert store.reload_if_published()
+    assert store.events[0]['title'] == 'B'
+
+
+def test_previous_snapshot_closed_and_released(tmp_path):
+    generations, store = make_store(tmp_path)
+    first = generations.publish(make_generation(generations, {'A': event('A')}))
+    old_snapshot = store.events
+    assert generations.held() == {first}
+
+    second = generations.publish(make_generation(generations, {'B': event('B')}))
+    store.reload()
+    # Прежний снимок ещё открыт для читателей, взявших его до подмены
+    assert old_snapshot[0]['title'] == 'A'
+    assert generations.held() == {first, second}
+
+    assert store.close_retired(force=True) == 1
+    assert old_snapshot._mmap.closed
+    assert generations.held() == {second}
+
+
+def test_stores_keep_separate_holds(tmp_path):
+    generations, first_store = make_store(tmp_path)
+    second_store = CatalogStore(str(tmp_path), generations, ['afisha'])
+    first = generations.publish(make_generation(generations, {'A': event('A')}))
+    first_store.events
+    second_store.events
+
+    generations.publish(make_generation(generations, {'B': event('B')}))
+    first_store.reload()
+    first_store.close_retired(force=True)
+    # Второй читатель ещё держит прежнее поколение, его отметку перезагрузка первого не трогает
+    assert first in generations.held()
+    assert second_store.events[0]['title'] == 'A'
+
+
+def test_summaries_and_lazy_details(tmp_path):
+    generations, store = make_store(tmp_path)
+    data = dict(event('A'), full_description='Описание', gallery_images=['1.jpg'])
+    generations.publish(make_generation(generations, {'A': data}))
+
+    summary, = store.summaries()
+    assert set(summary) == set(SUMMARY_FIELDS)
+    assert 'full_description' not in summary
+    # Полные данные читаются только по запросу страницы события
+    assert store.details(summary['path'])['full_description'] == 'Описание'
+    assert store.details('spectacles/generations/нет/afisha/A') is None
+
+
+def test_time_query_uses_one_snapshot_across_reload(tmp_path):
+    generations, store = make_store(tmp_path)
+    generations.publish(make_generation(generations, {'A': event('A'), 'B': event('B', date='8 апреля 2025, 19:00')}))
+    store.events
+    generations.publish(make_generation(generations, {'C': event('C')}))
+
+    def build_during_reload(events):
+        # Каталог подменяется, пока строится индекс прежнего снимка
+        store.reload()
+        return TimeIndex(events, now=datetime(2025, 4, 7))
+
+    with mock.patch('catalog.store.TimeIndex', side_effect=build_during_reload):
+        summaries = store.query_time_range(int(datetime(2025, 4, 7).timestamp()),
+                                           int(datetime(2025, 4, 9).timestamp()))
+    assert [summary['title'] for summary in summaries] == ['A', 'B']
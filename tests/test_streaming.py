@@ -0,0 +1,100 @@
+import asyncio
+import os
+from unittest import mock
+import pytest
+from parsers.afisha_parser import AsyncAfishaParser
+from parsers.culture_parser import AsyncCultureParser
+from parsers.streaming import BlockWatcher, read_until_blocks
+from tests.helpers import FakeResponse, FakeSession
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), 'pages')
+
+
+def saved_page(name):
+    with open(os.path.join(PAGES_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def test_block_watcher_waits_for_every_block():
+    watcher = BlockWatcher([('h1', ''), ('div', 'redactor content'), ('a', 'data-fancybox=gallery')] +
+                           [('img', 'photo')] * 2)
+    watcher.feed('<h1>A</h1><div class="redactor content"><p>текст')
+    assert not watcher.complete
+    watcher.feed('</p></div><a data-fancybox="gallery" href="1.jpg">1</a><img class="photo">')
+    # Повторённый блок ждёт второго элемента
+    assert not watcher.complete
+    watcher.feed('<img class="photo extra" src="2.jpg">')
+    assert watcher.complete
+
+
+def test_run_of_blocks_ends_on_following_element():
+    blocks = [('h1', ''), ('a', 'btn target=_blank | js-ticket'), ('a', 'data-fancybox=gallery', 3)]
+    watcher = BlockWatcher(blocks)
+    watcher.feed('<h1>A</h1><a class="js-ticket" href="/t">Билеты</a>')
+    watcher.feed('<div class="gallery"><a data-fancybox="gallery" href="1.jpg"><img src="1-small.jpg"></a>')
+    # Вложенное изображение не завершает серию, а одного элемента из трёх мало
+    assert not watcher.complete
+    watcher.feed('</div><footer>')
+    assert watcher.complete
+
+    watcher = BlockWatcher(blocks)
+    watcher.feed('<h1>A</h1><a class="btn" target="_blank" href="/t">Купить</a>' +
+                 '<a data-fancybox="gallery" href="1.jpg"></a>' * 3)
+    assert watcher.complete
+
+
+def test_read_until_blocks_stops_after_last_block():
+    body = ('<h1>A</h1><div class="price">500 ₽</div>' + '<p>подвал</p>' * 2000).encode('utf-8')
+    html, size, stopped_early = asyncio.run(
+        read_until_blocks(FakeResponse(body), [('h1', ''), ('div', 'price')], chunk_size=1024))
+    assert stopped_early and size == 1024
+    assert '500 ₽' in html
+
+    html, size, stopped_early = asyncio.run(
+        read_until_blocks(FakeResponse(body), [('h1', ''), ('div', 'place')], chunk_size=1024))
+    assert not stopped_early and size == len(body)
+
+
+@pytest.mark.parametrize('parser_class, page', [
+    (AsyncAfishaParser, 'afisha_event.html'),
+    (AsyncCultureParser, 'culture_event.html'),
+])
+def test_streamed_extraction_matches_full_page(tmp_path, parser_class, page):
+    url = 'https://example.org/events/sad'
+
+    def extract(stream_details):
+        parser = parser_class(session=FakeSession({url: saved_page(page)}), output_root=str(tmp_path))
+        parser.stream_details = stream_details
+        parser.archive = mock.Mock()
+        return parser, asyncio.run(parser._parse_event_page(url))
+
+    full_parser, full = extract(False)
+    streamed_parser, streamed = extract(True)
+
+    assert full['full_description'] and full['image'] and full['place_name'] and full['ticket_link']
+    assert streamed == full
+    assert streamed_parser.page_stats.early_stops == 1
+    assert streamed_parser.page_stats.bytes < full_parser.page_stats.bytes
+    # Недочитанная страница не архивируется, целая - архивируется
+    streamed_parser.archive.put.assert_not_called()
+    full_parser.archive.put.assert_called_once()
+
+
+def test_streamed_page_with_one_gallery_image_stops_early(tmp_path):
+    url = 'https://example.org/events/sad'
+    page = ''.join(line for line in saved_page('afisha_event.html').splitlines(keepends=True)
+                   if not line.startswith(('<a data-fancybox="events-gallery" href="/upload/gallery/2',
+                                           '<a data-fancybox="events-gallery" href="/upload/gallery/3',
+                                           '<a data-fancybox="events-gallery" href="/upload/gallery/4')))
+
+    def extract(stream_details):
+        parser = AsyncAfishaParser(session=FakeSession({url: page}), output_root=str(tmp_path))
+        parser.stream_details = stream_details
+        return parser, asyncio.run(parser._parse_event_page(url))
+
+    full_parser, full = extract(False)
+    streamed_parser, streamed = extract(True)
+    assert len(full['gallery_images']) == 1 and full['ticket_link']
+    assert streamed == full
+    assert streamed_parser.page_stats.early_stops == 1
+    assert streamed_parser.page_stats.bytes < full_parser.page_stats.bytes
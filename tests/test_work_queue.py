@@ -0,0 +1,64 @@
+import pytest
+from parsers.work_queue import DETAIL, DONE, FAILED, LEASED, LISTING, PENDING, WorkQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.db'), visibility_timeout=60, max_attempts=2)
+    yield queue
+    queue.close()
+
+
+def test_put_ignores_known_urls(queue):
+    assert queue.put(LISTING, 'tula', 'afisha', 'https://a/1', {'page': 1})
+    assert not queue.put(LISTING, 'tula', 'afisha', 'https://a/1', {'page': 1})
+    # Тот же адрес другого вида задачи - другая задача
+    assert queue.put(DETAIL, 'tula', 'afisha', 'https://a/1')
+    assert queue.counts() == {PENDING: 2}
+
+
+def test_lease_ack(queue):
+    queue.put(LISTING, 'tula', 'afisha', 'https://a/1', {'page': 1})
+    task = queue.lease('worker-1')
+    assert (task.url, task.payload, task.attempts) == ('https://a/1', {'page': 1}, 1)
+    # Задача в аренде другому процессу не выдаётся
+    assert queue.lease('worker-2') is None
+    assert queue.status(LISTING, 'tula', 'afisha', 'https://a/1') == LEASED
+
+    assert not queue.ack(task, 'worker-2')
+    assert queue.ack(task, 'worker-1', {'title': 'A'})
+    assert queue.results(LISTING, 'tula', 'afisha') == [{'title': 'A'}]
+    assert queue.is_drained()
+
+
+def test_expired_lease_is_reissued(queue):
+    queue.visibility_timeout = -1
+    queue.put(DETAIL, 'tula', 'afisha', 'https://a/1')
+    first = queue.lease('worker-1')
+    second = queue.lease('worker-2')
+    assert second.id == first.id and second.attempts == 2
+    # Опоздавший владелец не может подтвердить задачу, выданную другому
+    assert not queue.ack(first, 'worker-1')
+    assert queue.ack(second, 'worker-2')
+
+
+def test_release_retries_then_fails(queue):
+    queue.put(DETAIL, 'tula', 'afisha', 'https://a/1')
+    queue.release(queue.lease('worker-1'), 'worker-1')
+    assert queue.status(DETAIL, 'tula', 'afisha', 'https://a/1') == PENDING
+
+    queue.release(queue.lease('worker-1'), 'worker-1')
+    assert queue.status(DETAIL, 'tula', 'afisha', 'https://a/1') == FAILED
+    assert queue.lease('worker-1') is None
+
+    queue.requeue_unfinished()
+    assert queue.lease('worker-1').attempts == 1
+
+
+def test_retain_keeps_resumed_cities(queue):
+    queue.put(DETAIL, 'tula', 'afisha', 'https://a/1')
+    queue.put(DETAIL, 'moscow', 'mts', 'https://m/1')
+    queue.retain(['moscow'])
+    assert queue.lease('worker-1').city == 'moscow'
+    assert queue.status(DETAIL, 'tula', 'afisha', 'https://a/1') is None
+    assert DONE not in queue.counts()
@@ -15,6 +15,7 @@ if (eventPath) {
     eel.load_event(eventPath)(function(data) {
         if (data) {
             displayEventData(data);
+            loadSimilarEvents(eventPath);
         } else {
             console.error('Событие не найдено.');
         }
@@ -113,4 +114,33 @@ function displayEventData(data) {
     } else {
         document.getElementById('additional-info-container').style.display = 'none';
     }
-}
\ No newline at end of file
+}
+
+// Пятый блок: похожие события, посчитанные при публикации каталога
+function loadSimilarEvents(path) {
+    const container = document.getElementById('similar-container');
+    eel.load_similar_events(path)(function(events) {
+        if (!events || events.length === 0) {
+            container.style.display = 'none';
+            return;
+        }
+
+        const similarEvents = document.getElementById('similar-events');
+        events.forEach(event => {
+            const card = document.createElement('a');
+            card.className = 'similar-event';
+            card.href = `event.html?id=${event.id}&path=${encodeURIComponent(event.path)}`;
+
+            const img = document.createElement('img');
+            img.src = event.main_image;
+            img.alt = event.title;
+
+            const title = document.createElement('span');
+            title.textContent = event.title;
+
+            card.appendChild(img);
+            card.appendChild(title);
+            similarEvents.appendChild(card);
+        });
+    });
+}
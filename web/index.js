@@ -1,4 +1,6 @@
 let events = [];
+// Версия каталога, из которой получен список events: номера событий действительны только в ней
+let eventsVersion = null;
 let isFavoritesView = false; // Флаг для отслеживания режима избранного
 
 // Функция для проверки, находится ли спектакль в избранном
@@ -19,8 +21,18 @@ async function applyFilters() {
     const priceMax = document.getElementById('price-max').value;
     const sort = document.getElementById('sort').value;
 
+    // Фасетные условия считаются в Python по битовым индексам
+    const selection = theater === 'all' ? {} : { venue: [theater] };
+    const facetResult = await eel.query_facets(selection)();
+    if (facetResult.version !== eventsVersion) {
+        // Каталог обновился: номера из фасетов относятся к другому списку, фильтры применятся после загрузки
+        loadEvents();
+        return;
+    }
+    const matchedIds = new Set(facetResult.ids);
+
     let filteredEvents = events.filter(event => {
-        return (theater === 'all' || event.place_name === theater) &&
+        return matchedIds.has(event.id) &&
                (!priceMin || parsePrice(event.price)[1] >= parseFloat(priceMin)) &&
                (!priceMax || parsePrice(event.price)[1] <= parseFloat(priceMax));
     });
@@ -72,7 +84,13 @@ async function displayEvents(events) {
         favouritesHintContainer.appendChild(hint);
     }
 
-    // Отображаем события
+    await appendEventCards(events);
+}
+
+// Функция для добавления карточек событий в конец списка
+async function appendEventCards(events) {
+    const eventsContainer = document.getElementById('events');
+
     for (const event of events) {
         const isFavourite = await eel.check_if_favourite(event.path)();
         const eventElement = document.createElement('div');
@@ -130,19 +148,84 @@ function parsePrice(price) {
     return [prices[0], prices[1] || prices[0]];
 }
 
-// Загрузка данных при старте
-eel.load_events()(function(data) {
-    events = data;
-    applyFilters(); // Отображаем события с учетом фильтров
-
-    // Заполнение выпадающего списка театров
+// Заполнение выпадающего списка театров с числом событий в каждом
+async function fillTheaterSelect() {
     const theaterSelect = document.getElementById('theater');
-    const theaters = [...new Set(data.map(event => event.place_name))];
-    theaters.forEach(theater => {
+    const selected = theaterSelect.value;
+    const facets = await eel.query_facets({})();
+    const theaters = Object.entries(facets.counts.venue).sort((a, b) => b[1] - a[1]);
+
+    // Оставляем только пункт "Все"
+    theaterSelect.length = 1;
+
+    theaters.forEach(([theater, count]) => {
         const option = document.createElement('option');
         option.value = theater;
-        option.textContent = theater;
+        option.textContent = `${theater} (${count})`;
         theaterSelect.appendChild(option);
     });
-});
 
+    if (theaters.some(([theater]) => theater === selected)) {
+        theaterSelect.value = selected;
+    }
+}
+
+// Идентификатор текущей потоковой загрузки: порции от прежних загрузок игнорируются
+let streamRequestId = null;
+// Очередь отрисовки, чтобы порции появлялись строго по порядку
+let renderQueue = Promise.resolve();
+
+// Установлены ли фильтры, отличные от значений по умолчанию
+function hasActiveFilters() {
+    return isFavoritesView ||
+           document.getElementById('theater').value !== 'all' ||
+           document.getElementById('price-min').value ||
+           document.getElementById('price-max').value ||
+           document.getElementById('sort').value !== 'none';
+}
+
+// Загрузка событий из Python порциями: первая карточка появляется, не дожидаясь всего каталога
+function loadEvents() {
+    events = [];
+    eventsVersion = null;
+    streamRequestId = `${Date.now()}-${Math.random()}`;
+    document.getElementById('events').innerHTML = '';
+    eel.stream_events(streamRequestId)();
+}
+
+// Вызывается из Python с очередной порцией событий
+eel.expose(receive_events_chunk);
+function receive_events_chunk(requestId, chunk, done, version) {
+    if (requestId !== streamRequestId) {
+        return;
+    }
+
+    events.push(...chunk);
+    eventsVersion = version;
+    if (!hasActiveFilters()) {
+        renderQueue = renderQueue.then(() => appendEventCards(chunk));
+    }
+
+    if (done) {
+        fillTheaterSelect();
+        if (hasActiveFilters()) {
+            applyFilters(); // Сортировка и фильтры применяются к полному списку
+        }
+    }
+}
+
+// Вызывается из Python, когда фоновый обход обновил каталог
+eel.expose(on_catalog_updated);
+function on_catalog_updated(version) {
+    console.log(`Каталог обновлен до версии ${version}`);
+    loadEvents();
+}
+
+// Проверка сессии и загрузка данных при старте
+eel.check_session(localStorage.getItem('sessionToken'))(function(username) {
+    if (!username) {
+        window.location.href = 'login.html';
+        return;
+    }
+    loadEvents();
+});
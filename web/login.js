@@ -61,17 +61,19 @@ async function login() {
     // Шифруем пароль
     const encryptedPassword = encryptPassword(password);
 
-    // Проверяем, существует ли пользователь
+    // Проверяем логин и пароль, получаем токен сессии
     try {
-        const isValid = await eel.check_user(username, encryptedPassword)();
-        if (isValid) {
+        const token = await eel.login_user(username, encryptedPassword)();
+        if (token) {
+            localStorage.setItem('sessionToken', token);
+            localStorage.setItem('currentUser', username);
             alert('Авторизация прошла успешно');
             window.location.href = 'index.html'; // Переход на index.html
         } else {
             alert('Ошибка: Неверный логин или пароль.');
         }
     } catch (error) {
-        console.error("Ошибка при вызове check_user:", error);
+        console.error("Ошибка при вызове login_user:", error);
         alert('Произошла ошибка при авторизации.');
     }
 }